@@ -45,6 +45,7 @@ private:
     static bool ParseEventDesc(const class JsonValue &node, PmuEventDesc &desc);
     bool ParseTargets(const std::string &body, TargetUpdateRequest &req);
     static bool ParseSingleTarget(const class JsonValue &node, TargetSpec &spec);
+    static bool ParseDataObject(const class JsonValue &node, DataObjectRequest &req);
 
     ControlPlaneConfig cfg_;
     std::atomic<bool> running_{false};
@@ -270,7 +270,39 @@ bool ControlPlane::HandleDataObjectRequest(const std::string &body) {
     std::string err;
     if (!ParseJson(body, root, err) || !root.IsObject())
         return false;
+    // Either a single object or {"objects": [...]} for batched registration.
+    // A batch is validated as a whole before any entry is applied.
+    std::vector<DataObjectRequest> batch;
     const auto &obj = root.AsObject();
+    auto objects_it = obj.find("objects");
+    if (objects_it != obj.end()) {
+        if (!objects_it->second || !objects_it->second->IsArray())
+            return false;
+        for (const auto &item : objects_it->second->AsArray()) {
+            if (!item)
+                continue;
+            DataObjectRequest req;
+            if (!ParseDataObject(*item, req))
+                return false;
+            batch.push_back(std::move(req));
+        }
+        if (batch.empty())
+            return false;
+    } else {
+        DataObjectRequest req;
+        if (!ParseDataObject(root, req))
+            return false;
+        batch.push_back(std::move(req));
+    }
+    for (const auto &req : batch)
+        on_data_object_(req);
+    return true;
+}
+
+bool ControlPlane::ParseDataObject(const JsonValue &node, DataObjectRequest &req) {
+    if (!node.IsObject())
+        return false;
+    const auto &obj = node.AsObject();
     auto pid_it = obj.find("pid");
     auto addr_it = obj.find("address");
     auto name_it = obj.find("name");
@@ -280,7 +312,6 @@ bool ControlPlane::HandleDataObjectRequest(const std::string &body) {
         return false;
     if (!pid_it->second->IsNumber() || !addr_it->second->IsNumber() || !name_it->second->IsString())
         return false;
-    DataObjectRequest req;
     req.pid = static_cast<uint32_t>(pid_it->second->AsNumber());
     req.address = static_cast<uint64_t>(addr_it->second->AsNumber());
     req.name = name_it->second->AsString();
@@ -290,10 +321,7 @@ bool ControlPlane::HandleDataObjectRequest(const std::string &body) {
     auto size_it = obj.find("size");
     if (size_it != obj.end() && size_it->second && size_it->second->IsNumber())
         req.size = static_cast<uint64_t>(size_it->second->AsNumber());
-    if (req.pid == 0 || req.address == 0 || req.name.empty())
-        return false;
-    on_data_object_(req);
-    return true;
+    return req.pid != 0 && req.address != 0 && !req.name.empty();
 }
 
 bool ControlPlane::HandleTargetRequest(const std::string &body) {
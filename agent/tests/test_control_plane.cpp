@@ -0,0 +1,101 @@
+#include <arpa/inet.h>
+#include <netinet/in.h>
+#include <sys/socket.h>
+#include <unistd.h>
+
+#include <atomic>
+#include <cassert>
+#include <chrono>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include "micro_sentinel/control_plane.h"
+
+using namespace micro_sentinel;
+
+namespace {
+
+constexpr uint16_t kTestPort = 19281;
+
+// Sends one POST and returns the HTTP status, or -1 if the agent is not listening.
+int Post(const std::string &path, const std::string &body) {
+    int fd = ::socket(AF_INET, SOCK_STREAM, 0);
+    assert(fd >= 0);
+    sockaddr_in addr{};
+    addr.sin_family = AF_INET;
+    addr.sin_port = htons(kTestPort);
+    addr.sin_addr.s_addr = inet_addr("127.0.0.1");
+    if (connect(fd, reinterpret_cast<sockaddr *>(&addr), sizeof(addr)) < 0) {
+        ::close(fd);
+        return -1;
+    }
+    std::string request = "POST " + path + " HTTP/1.1\r\nContent-Length: " + std::to_string(body.size()) +
+                          "\r\n\r\n" + body;
+    ::send(fd, request.data(), request.size(), 0);
+    char buffer[256] = {};
+    ssize_t n = ::recv(fd, buffer, sizeof(buffer) - 1, 0);
+    ::close(fd);
+    if (n <= 0)
+        return -1;
+    std::string response(buffer, static_cast<size_t>(n));
+    auto space = response.find(' ');
+    return space == std::string::npos ? -1 : std::stoi(response.substr(space + 1, 3));
+}
+
+int PostData(const std::string &body) {
+    return Post("/api/v1/symbols/data", body);
+}
+
+} // namespace
+
+void RunControlPlaneTests() {
+    ControlPlaneConfig cfg;
+    cfg.listen_port = kTestPort;
+    ControlPlane plane(cfg);
+    std::vector<DataObjectRequest> applied;
+    plane.SetDataObjectCallback([&](const DataObjectRequest &req) { applied.push_back(req); });
+    plane.Start();
+    for (int i = 0; i < 100 && PostData("{}") < 0; ++i)
+        std::this_thread::sleep_for(std::chrono::milliseconds(10));
+    // Requests are handled one at a time on the server thread, so `applied`
+    // is stable once a response has been read.
+
+    // Single-object body.
+    assert(PostData("{\"pid\":10,\"address\":4096,\"name\":\"slab\",\"type\":\"kv\",\"size\":64}") == 200);
+    assert(applied.size() == 1);
+    assert(applied[0].pid == 10 && applied[0].address == 4096 && applied[0].name == "slab");
+    assert(applied[0].type == "kv" && applied[0].size == 64);
+
+    // Batch: every entry is applied, in order.
+    applied.clear();
+    assert(PostData("{\"objects\":[{\"pid\":11,\"address\":8192,\"name\":\"a\",\"size\":128},"
+                    "{\"pid\":12,\"address\":12288,\"name\":\"b\"}]}") == 200);
+    assert(applied.size() == 2);
+    assert(applied[0].pid == 11 && applied[0].name == "a" && applied[0].size == 128);
+    assert(applied[1].pid == 12 && applied[1].address == 12288 && applied[1].name == "b");
+
+    // All or nothing: one invalid entry rejects the batch before any is applied.
+    applied.clear();
+    assert(PostData("{\"objects\":[{\"pid\":13,\"address\":4096,\"name\":\"ok\"},"
+                    "{\"pid\":14,\"address\":0,\"name\":\"zero\"}]}") == 400);
+    assert(PostData("{\"objects\":[{\"pid\":13,\"address\":4096,\"name\":\"ok\"},"
+                    "{\"pid\":14,\"name\":\"missing address\"}]}") == 400);
+    assert(PostData("{\"objects\":[{\"pid\":13,\"address\":4096,\"name\":\"ok\"},\"text\"]}") == 400);
+    assert(PostData("{\"objects\":[]}") == 400);
+    assert(PostData("{\"objects\":{\"pid\":13}}") == 400);
+    assert(applied.empty());
+
+    // Stop() joins the server thread, which is blocked in accept(); keep
+    // connecting until it has seen the stop flag.
+    std::atomic<bool> stopped{false};
+    std::thread stopper([&] {
+        plane.Stop();
+        stopped.store(true);
+    });
+    while (!stopped.load()) {
+        Post("/api/v1/mode", "{}");
+        std::this_thread::sleep_for(std::chrono::milliseconds(5));
+    }
+    stopper.join();
+}
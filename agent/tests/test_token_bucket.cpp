@@ -20,6 +20,7 @@ void RunJsonTests();
 void RunSkewAdjusterTests();
 void RunTargetManagerTests();
 void RunRemoteDramAnalyzerTests();
+void RunControlPlaneTests();
 
 int main() {
     AggregatorConfig agg_cfg;
@@ -132,6 +133,7 @@ int main() {
     RunTargetManagerTests();
     RunRemoteDramAnalyzerTests();
     RunJsonTests();
+    RunControlPlaneTests();
 
     std::cout << "All tests passed" << std::endl;
     return 0;
@@ -35,6 +35,7 @@ import csv
 import json
 import re
 import statistics
+import sys
 import urllib.parse
 import urllib.request
 from dataclasses import dataclass
@@ -42,6 +43,14 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# Allow running as either a module (-m) or a script (python3 path/to/script.py).
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from experiments.workloads.common import access_trace
+from experiments.workloads.common import annotations as client_annotations
+
 
 def _load_json(path: Path) -> Any:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -281,6 +290,13 @@ def analyze_one(
     out["suite"] = suite
     out["plan"] = plan
 
+    annotation_summary = client_annotations.summarize_dir(artifact_dir)
+    if annotation_summary is not None:
+        out["client_annotations"] = annotation_summary
+    trace_summary = access_trace.summarize_dir(artifact_dir)
+    if trace_summary is not None:
+        out["server_access_trace"] = trace_summary
+
     duration = _as_int(plan.get("duration")) or 0
     mode = str(plan.get("mode") or "")
     workload = str(plan.get("workload") or "")
@@ -20,12 +20,22 @@ from __future__ import annotations
 import argparse
 import json
 import re
+import sys
 import urllib.parse
 import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple, Any
 
+# Allow running as either a module (-m) or a script (python3 path/to/script.py).
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from experiments.workloads.common import access_trace
+from experiments.workloads.common import annotations as client_annotations
+from experiments.workloads.common import flow_id as ms_flow_id
+
 
 @dataclass
 class TruthFlow:
@@ -112,11 +122,50 @@ def _extract_suite(plan: Optional[Dict[str, object]]) -> Optional[str]:
     return str(suite) if suite else None
 
 
-def _parse_truth(path: Path) -> Tuple[List[TruthFlow], str]:
+def _recompute_flow_ids(raw: List[Any]) -> Dict[str, int]:
+    """Re-hash every logged 4-tuple in one batch and use the result as flow_id.
+
+    Catches clients whose flow id drifted from the BPF hash, and gives IPv6
+    flows from older clients (which logged the flow index) their real id.
+    """
+    entries = []
+    for entry in raw:
+        tup = entry.get("tuple") if isinstance(entry, dict) else None
+        if isinstance(tup, dict) and all(tup.get(k) is not None for k in ("src_ip", "dst_ip", "src_port", "dst_port")):
+            entries.append((entry, tup))
+    check = {"tuples": len(entries), "mismatched": 0, "invalid": 0}
+    if not entries:
+        return check
+    valid = []
+    for entry, tup in entries:
+        try:
+            ms_flow_id.address_words(str(tup["src_ip"]))
+            ms_flow_id.address_words(str(tup["dst_ip"]))
+            valid.append((entry, tup))
+        except ValueError:
+            check["invalid"] += 1
+    ids = ms_flow_id.flow_ids(
+        [str(tup["src_ip"]) for _, tup in valid],
+        [str(tup["dst_ip"]) for _, tup in valid],
+        [int(tup["src_port"]) for _, tup in valid],
+        [int(tup["dst_port"]) for _, tup in valid],
+        [int(tup.get("proto", 6)) for _, tup in valid],
+        [int(tup.get("direction", 0)) for _, tup in valid],
+    )
+    for (entry, _), fid in zip(valid, ids):
+        fid = int(fid)
+        if entry.get("flow_id") != fid:
+            check["mismatched"] += 1
+            entry["flow_id"] = fid
+    return check
+
+
+def _parse_truth(path: Path) -> Tuple[List[TruthFlow], str, Dict[str, int]]:
     raw = _load_json(path)
     flows: List[TruthFlow] = []
     if not isinstance(raw, list):
-        return flows, "unknown"
+        return flows, "unknown", {}
+    flow_id_check = _recompute_flow_ids(raw)
 
     # Prefer wall-clock Unix time if present; otherwise fall back to monotonic time.
     time_domain = "monotonic_ns"
@@ -164,7 +213,7 @@ def _parse_truth(path: Path) -> Tuple[List[TruthFlow], str]:
         if intervals:
             intervals.sort()
             flows.append(TruthFlow(flow_id=flow_id, intervals=_merge_intervals(intervals)))
-    return flows, time_domain
+    return flows, time_domain, flow_id_check
 
 
 def _merge_intervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
@@ -273,12 +322,19 @@ def analyze_single_artifact(
         report["mode"] = plan.get("mode")
         report["workload"] = plan.get("workload")
 
+    annotation_summary = client_annotations.summarize_dir(artifact_dir)
+    if annotation_summary is not None:
+        report["client_annotations"] = annotation_summary
+    trace_summary = access_trace.summarize_dir(artifact_dir)
+    if trace_summary is not None:
+        report["server_access_trace"] = trace_summary
+
     truth_path = _find_truth_file(artifact_dir)
     if not truth_path:
         report["error"] = "ground truth file not found in artifact dir"
         return report
 
-    truth, truth_time_domain = _parse_truth(truth_path)
+    truth, truth_time_domain, flow_id_check = _parse_truth(truth_path)
     t0, t1 = _truth_range_ns(truth)
     if t0 <= 0 or t1 <= 0 or t1 <= t0:
         report["error"] = "invalid ground truth time range"
@@ -289,6 +345,7 @@ def analyze_single_artifact(
     report["truth_flows"] = len(truth)
     report["time_range_ns"] = {"start": t0, "end": t1}
     report["truth_time_domain"] = truth_time_domain
+    report["truth_flow_id_check"] = flow_id_check
     report["window_ns"] = window_ns
 
     conf = _parse_agent_conf(agent_conf)
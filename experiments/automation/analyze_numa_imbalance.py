@@ -15,6 +15,11 @@ This script:
 - Computes a "remote ratio" as the share of `norm_cost` attributed to the
   `--membind` node (if present), both overall and for logical REMOTE_DRAM
   (event id 7) when present.
+- For builtin KV runs with per-worker shard placement (`numa_actions[].placement`),
+  reads the placement map (each shard with its worker's pid) from the server
+  truth snapshot and reports the remote ratio that layout should produce
+  (`expected_remote_ratio`, weighted by the clients' key distribution) next
+  to the measured one.
 - Extracts KV client p99 latency from `run_result.json` if available.
 
 Outputs:
@@ -39,6 +44,7 @@ import csv
 import json
 import re
 import statistics
+import sys
 import urllib.parse
 import urllib.request
 from dataclasses import dataclass
@@ -46,6 +52,14 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# Allow running as either a module (-m) or a script (python3 path/to/script.py).
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from experiments.workloads.common.histogram import client_p99_us
+from experiments.workloads.common.zipf import zipf_cdf
+
 
 MS_EVT_REMOTE_DRAM = 7
 
@@ -251,6 +265,7 @@ def _parse_numactl_nodes(numa_policy: Any) -> Tuple[Optional[int], Optional[int]
 def _extract_kv_p99_latency(run_result: Dict[str, Any]) -> Optional[float]:
     # `ResultRecorder` stores per-command metrics as JSON if present.
     p99s: List[float] = []
+    client_metrics: List[Dict[str, Any]] = []
     for cmd in run_result.get("commands") or []:
         if not isinstance(cmd, dict):
             continue
@@ -259,17 +274,114 @@ def _extract_kv_p99_latency(run_result: Dict[str, Any]) -> Optional[float]:
         metrics = cmd.get("metrics")
         if not isinstance(metrics, dict):
             continue
+        client_metrics.append(metrics)
         lat = metrics.get("latency_us")
         if isinstance(lat, dict) and "p99" in lat:
             v = _as_float(lat.get("p99"))
             if v is not None:
                 p99s.append(v)
+    merged_p99 = client_p99_us(client_metrics)
+    if merged_p99 is not None:
+        return merged_p99
     if not p99s:
         return None
     # Conservative aggregation across clients: take max p99.
     return float(max(p99s))
 
 
+def _load_placement(artifact_dir: Path, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Placement map from the kv-server truth snapshot, if the run used --placement."""
+    for cmd in plan.get("commands") or []:
+        if not isinstance(cmd, dict) or cmd.get("name") != "kv-server":
+            continue
+        for artifact in cmd.get("extra_artifacts") or []:
+            local = artifact.get("local") if isinstance(artifact, dict) else None
+            if not local or not str(local).endswith(".json"):
+                continue
+            # The recorded path is absolute at run time; fall back to the copy
+            # under this artifact dir if the tree was moved.
+            name = Path(local).name
+            for path in (Path(local), artifact_dir / "truth" / name, artifact_dir / name):
+                if not path.exists():
+                    continue
+                try:
+                    truth = _load_json(path)
+                except Exception:
+                    continue
+                placement = truth.get("placement") if isinstance(truth, dict) else None
+                if isinstance(placement, dict) and placement.get("shards"):
+                    return placement
+    return None
+
+
+def _client_key_distribution(plan: Dict[str, Any]) -> Tuple[str, float]:
+    """(distribution, zipf theta) from the first kv-client command line."""
+    for cmd in plan.get("commands") or []:
+        if not isinstance(cmd, dict) or not str(cmd.get("name") or "").startswith("kv-client"):
+            continue
+        argv = [str(a) for a in cmd.get("argv") or []]
+        dist, theta = "uniform", 1.0
+        for flag, value in zip(argv, argv[1:]):
+            if flag == "--key-distribution":
+                dist = value
+            elif flag == "--zipf-theta":
+                theta = _as_float(value) or theta
+        return dist, theta
+    return "uniform", 1.0
+
+
+def _shard_mem_node(shard: Dict[str, Any]) -> Optional[int]:
+    # Without an explicit node the shard sits where its worker first touched it.
+    if shard.get("mem_node") is not None:
+        return int(shard["mem_node"])
+    cpu_nodes = shard.get("cpu_nodes") or []
+    return int(cpu_nodes[0]) if len(cpu_nodes) == 1 else None
+
+
+def _expected_remote_ratio(placement: Dict[str, Any], distribution: Tuple[str, float]) -> Optional[float]:
+    """Share of key accesses a worker serves from another node's memory.
+
+    Every worker serves any key and SO_REUSEPORT spreads connections evenly,
+    so this is the mean over workers of the access weight of the shards whose
+    memory node is not one of the worker's CPU nodes.
+    """
+    shards = [s for s in placement.get("shards") or [] if isinstance(s, dict)]
+    if not shards:
+        return None
+    key_space = max(int(s["keys"][1]) for s in shards)
+    if key_space <= 0:
+        return None
+    dist, theta = distribution
+    cdf = zipf_cdf(key_space, theta) if dist == "zipf" else None
+    weights: List[Tuple[float, int]] = []
+    for shard in shards:
+        lo, hi = int(shard["keys"][0]), int(shard["keys"][1])
+        node = _shard_mem_node(shard)
+        if node is None:
+            return None
+        if hi <= lo:
+            continue
+        if cdf is not None:
+            weight = (float(cdf[hi - 1]) - (float(cdf[lo - 1]) if lo else 0.0)) / float(cdf[-1])
+        else:
+            weight = (hi - lo) / key_space
+        weights.append((weight, node))
+    per_worker = []
+    for shard in shards:
+        local = {int(n) for n in shard.get("cpu_nodes") or []}
+        per_worker.append(sum(weight for weight, node in weights if node not in local))
+    return float(statistics.mean(per_worker))
+
+
+def _placement_cpu_nodes(placement: Dict[str, Any]) -> Optional[List[int]]:
+    """The CPU nodes shared by every worker, or None if workers run on different nodes."""
+    sets = {tuple(sorted(int(n) for n in s.get("cpu_nodes") or [])) for s in placement.get("shards") or []}
+    if len(sets) != 1:
+        return None
+    nodes = list(next(iter(sets)))
+    return nodes or None
+
+
 @dataclass(frozen=True)
 class GroupKey:
     suite: str
@@ -408,6 +520,34 @@ def analyze_one(
     remote_rows = [r for r in rows if int(r.get("pmu_event") or 0) == MS_EVT_REMOTE_DRAM]
     out["remote_ratio_remote_dram"] = _ratio_for_mem_node(remote_rows, mem_node) if remote_rows else None
 
+    placement = _load_placement(artifact_dir, plan)
+    if placement is not None:
+        shards = placement.get("shards") or []
+        out["placement"] = [
+            {
+                "worker": s.get("worker"),
+                "pid": s.get("pid"),
+                "keys": s.get("keys"),
+                "cpu_nodes": s.get("cpu_nodes"),
+                "mem_node": _shard_mem_node(s),
+            }
+            for s in shards
+            if isinstance(s, dict)
+        ]
+        expected = _expected_remote_ratio(placement, _client_key_distribution(plan))
+        out["expected_remote_ratio"] = expected
+        # Measured side: cost on nodes other than the workers' own. Only
+        # well-defined when every worker runs on the same node(s).
+        local_nodes = _placement_cpu_nodes(placement)
+        measured = None
+        if local_nodes is not None and total_cost > 0:
+            remote_cost = sum(
+                float(r.get("norm_cost") or 0.0) for r in nodes if int(r.get("numa_node") or 0) not in local_nodes
+            )
+            measured = remote_cost / total_cost
+        out["remote_ratio_placement"] = measured
+        out["remote_ratio_error"] = measured - expected if measured is not None and expected is not None else None
+
     out["kv_latency_p99_us"] = _extract_kv_p99_latency(rr)
 
     return out
@@ -479,6 +619,8 @@ def analyze(
                 "values_remote_ratio_all": [],
                 "values_remote_ratio_remote_dram": [],
                 "values_latency_p99_us": [],
+                "values_expected_remote_ratio": [],
+                "values_remote_ratio_placement": [],
             },
         )
         if report.get("remote_ratio_all") is not None:
@@ -487,6 +629,10 @@ def analyze(
             sum_entry["values_remote_ratio_remote_dram"].append(float(report["remote_ratio_remote_dram"]))
         if report.get("kv_latency_p99_us") is not None:
             sum_entry["values_latency_p99_us"].append(float(report["kv_latency_p99_us"]))
+        if report.get("expected_remote_ratio") is not None:
+            sum_entry["values_expected_remote_ratio"].append(float(report["expected_remote_ratio"]))
+        if report.get("remote_ratio_placement") is not None:
+            sum_entry["values_remote_ratio_placement"].append(float(report["remote_ratio_placement"]))
 
         for row in report.get("by_node") or []:
             if not isinstance(row, dict):
@@ -512,6 +658,8 @@ def analyze(
         r_all = [float(v) for v in agg.get("values_remote_ratio_all") or []]
         r_rd = [float(v) for v in agg.get("values_remote_ratio_remote_dram") or []]
         lat = [float(v) for v in agg.get("values_latency_p99_us") or []]
+        expected = [float(v) for v in agg.get("values_expected_remote_ratio") or []]
+        r_pl = [float(v) for v in agg.get("values_remote_ratio_placement") or []]
         summaries.append(
             {
                 **{k: v for k, v in agg.items() if not k.startswith("values_")},
@@ -524,6 +672,10 @@ def analyze(
                 "n_latency_p99_us": len(lat),
                 "latency_p99_us_mean": _mean(lat),
                 "latency_p99_us_stdev": _stdev(lat),
+                "expected_remote_ratio_mean": _mean(expected),
+                "n_remote_ratio_placement": len(r_pl),
+                "remote_ratio_placement_mean": _mean(r_pl),
+                "remote_ratio_placement_stdev": _stdev(r_pl),
             }
         )
 
@@ -581,6 +733,10 @@ def _write_csv_summary(path: Path, report: Dict[str, Any]) -> None:
         "n_latency_p99_us",
         "latency_p99_us_mean",
         "latency_p99_us_stdev",
+        "expected_remote_ratio_mean",
+        "n_remote_ratio_placement",
+        "remote_ratio_placement_mean",
+        "remote_ratio_placement_stdev",
     ]
     with path.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=fields)
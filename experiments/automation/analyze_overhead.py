@@ -28,11 +28,19 @@ from __future__ import annotations
 import argparse
 import json
 import statistics
+import sys
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# Allow running as either a module (-m) or a script (python3 path/to/script.py).
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from experiments.workloads.common.histogram import client_p99_us
+
 
 def _load_json(path: Path) -> Any:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -239,7 +247,12 @@ def _extract_workload_metric(
 
         if throughputs:
             extra["clients"] = len(throughputs)
-            if lat_p99:
+            # Percentiles don't average: merge the client histograms when
+            # every client shipped one, else fall back to the mean p99.
+            merged_p99 = client_p99_us(m for _name, m in client_metrics)
+            if merged_p99 is not None:
+                extra["latency_p99_us"] = merged_p99
+            elif lat_p99:
                 extra["latency_p99_us"] = float(statistics.mean(lat_p99))
             if errors:
                 extra["errors"] = int(sum(errors))
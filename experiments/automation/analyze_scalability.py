@@ -33,11 +33,19 @@ import argparse
 import csv
 import json
 import statistics
+import sys
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+# Allow running as either a module (-m) or a script (python3 path/to/script.py).
+_REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from experiments.workloads.common.histogram import client_p99_us
+
 
 def _load_json(path: Path) -> Any:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -198,7 +206,10 @@ def _extract_kv_metrics(run_result: Dict[str, Any]) -> Dict[str, Any]:
     if throughputs:
         out["throughput_ops_per_s"] = float(sum(throughputs))
         out["clients"] = len(throughputs)
-    if lat_p99:
+    merged_p99 = client_p99_us(m for _name, m in client_metrics)
+    if merged_p99 is not None:
+        out["latency_p99_us"] = merged_p99
+    elif lat_p99:
         out["latency_p99_us"] = float(statistics.mean(lat_p99))
     if errors:
         out["errors"] = int(sum(errors))
@@ -19,6 +19,8 @@ from pathlib import Path
 import os
 from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from experiments.workloads.common.histogram import is_serialized, merge_clients
+
 
 def load_json(path: Path) -> Any:
     return json.loads(path.read_text(encoding="utf-8"))
@@ -62,7 +64,9 @@ def extract_suite(plan: Optional[Dict[str, Any]]) -> str:
 def flatten_numeric(obj: Any, prefix: str = "") -> Dict[str, float]:
     """Flatten nested dict/list into {key: float} for numeric leaves.
 
-    Keys use dotted paths, with list indices as [i].
+    Keys use dotted paths, with list indices as [i]. Serialized latency
+    histograms are skipped; their percentiles are already flattened from the
+    accompanying summary.
     """
 
     out: Dict[str, float] = {}
@@ -83,6 +87,8 @@ def flatten_numeric(obj: Any, prefix: str = "") -> Dict[str, float]:
                 return
 
     def rec(cur: Any, cur_prefix: str) -> None:
+        if is_serialized(cur):
+            return
         if isinstance(cur, dict):
             for kk, vv in cur.items():
                 if not isinstance(kk, str):
@@ -278,6 +284,7 @@ def extract_recorded_metrics(run: ArtifactRun) -> Dict[str, Any]:
 
     # Command metrics: flatten each client/server metrics dict.
     cmds = rr.get("commands")
+    client_metrics: List[Dict[str, Any]] = []
     if isinstance(cmds, list):
         for cmd in cmds:
             if not isinstance(cmd, dict):
@@ -286,10 +293,18 @@ def extract_recorded_metrics(run: ArtifactRun) -> Dict[str, Any]:
             role = str(cmd.get("role") or "")
             metrics = cmd.get("metrics")
             if isinstance(metrics, dict):
+                if role == "client":
+                    client_metrics.append(metrics)
                 flat = flatten_numeric(metrics)
                 for kk, vv in flat.items():
                     base[f"cmd.{role}.{name}.{kk}"] = vv
 
+    # Latency over all client requests, when every client shipped a histogram.
+    merged = merge_clients(client_metrics, require_all=True)
+    if merged is not None:
+        for kk, vv in merged.summary().items():
+            base[f"clients.latency_merged_us.{kk}"] = vv
+
     # Agent Prometheus metrics (if fetched).
     monitor_logs = rr.get("monitor_logs")
     agent_metrics_rel = None
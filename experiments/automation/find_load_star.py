@@ -10,6 +10,10 @@ This utility automates Section 5.1.2 style calibration:
 Usage examples:
   python3 -m experiments.automation.find_load_star --workload nfv_service_chain --duration 60
   python3 -m experiments.automation.find_load_star --workload kv --knob connections_per_instance --min 16 --max 2048
+  python3 -m experiments.automation.find_load_star --workload kv --knob rate --min 1000 --max 500000
+
+The `rate` knob (kv, load_balancer) switches the builtin client to open-loop
+load, so L* is an offered request rate that can be reused as-is across modes.
 """
 
 from __future__ import annotations
@@ -76,6 +80,10 @@ def _knob_bounds_from_config(workload: str, knob: str, cfg: Dict) -> Tuple[Optio
             if knob == "connections_per_instance":
                 return start, 1, 4096
             return start, 1, 128
+        if workload in {"kv", "load_balancer"} and knob == "rate":
+            clients = cfg.get("clients") or {}
+            start = int(float(clients["rate"])) if clients.get("rate") is not None else None
+            return start, 100, 10_000_000
         if workload == "load_balancer" and knob == "flows":
             clients = cfg.get("clients") or {}
             start = int(clients.get("flows")) if clients.get("flows") is not None else None
@@ -96,13 +104,15 @@ def _knob_bounds_from_config(workload: str, knob: str, cfg: Dict) -> Tuple[Optio
 
 def _build_workload_overrides(workload: str, knob: str, value: int) -> Dict:
     """Build the overrides structure expected by execute_workload()."""
+    if workload in {"kv", "load_balancer"} and knob == "rate":
+        return {"workload": {"clients": {"load_shape": "open-loop", "rate": int(value)}}}
     if workload == "kv":
         if knob not in {"connections_per_instance", "instances"}:
-            raise ValueError("kv supports knobs: connections_per_instance, instances")
+            raise ValueError("kv supports knobs: connections_per_instance, instances, rate")
         return {"workload": {"clients": {knob: int(value)}}}
     if workload == "load_balancer":
         if knob != "flows":
-            raise ValueError("load_balancer supports knob: flows")
+            raise ValueError("load_balancer supports knobs: flows, rate")
         return {"workload": {"clients": {"flows": int(value)}}}
     if workload == "nfv_service_chain":
         if knob != "rate_pps":
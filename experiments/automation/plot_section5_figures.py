@@ -58,6 +58,8 @@ if str(_REPO_ROOT) not in sys.path:
     sys.path.insert(0, str(_REPO_ROOT))
 
 from experiments.automation.artifact_metrics import extract_recorded_metrics, load_artifact_run, walk_artifacts
+from experiments.workloads.common import timeseries
+from experiments.workloads.common.histogram import client_p99_us
 
 
 def _load_json(path: Path) -> Any:
@@ -271,6 +273,7 @@ def _extract_overhead_points(artifact_root: Path, suite: str = "overhead") -> Li
 
         throughput: Optional[float] = None
         latency_p99_us: Optional[float] = None
+        client_metrics: List[Dict[str, Any]] = []
 
         # Client metrics live in run_result.commands[].metrics.
         for cmd in rr.get("commands") or []:
@@ -279,6 +282,7 @@ def _extract_overhead_points(artifact_root: Path, suite: str = "overhead") -> Li
             metrics = cmd.get("metrics")
             if not isinstance(metrics, dict):
                 continue
+            client_metrics.append(metrics)
 
             t = _as_float(metrics.get("throughput_ops_per_s"))
             if t is not None:
@@ -297,6 +301,11 @@ def _extract_overhead_points(artifact_root: Path, suite: str = "overhead") -> Li
                 if pps is not None:
                     throughput = pps
 
+        # Prefer the true p99 over all client requests when every client shipped a histogram.
+        merged_p99 = client_p99_us(client_metrics)
+        if merged_p99 is not None:
+            latency_p99_us = merged_p99
+
         if throughput is None and latency_p99_us is None:
             continue
         points.append(OverheadPoint(workload=workload, mode=mode, throughput=throughput, latency_p99_us=latency_p99_us))
@@ -333,6 +342,105 @@ def _write_recorded_metrics_csv(artifact_root: Path, out_csv: Path, *, suite: st
             w.writerow(r)
 
 
+@dataclass(frozen=True)
+class OverheadTimeline:
+    workload: str
+    mode: str
+    artifact_dir: Path
+    # (seconds since the first complete interval, throughput/s, p99 us)
+    points: List[Tuple[float, float, float]]
+
+
+def _extract_overhead_timelines(artifact_root: Path, suite: str = "overhead") -> List[OverheadTimeline]:
+    """Per-run timelines from the generators' `--interval-ms` streams.
+
+    All `*.series.jsonl` files of a run (one per client instance) are summed
+    per wall-clock interval; intervals any client covered only partially are
+    dropped.
+    """
+    timelines: List[OverheadTimeline] = []
+    for artifact_dir in _collect_artifacts_for_suite(artifact_root, suite):
+        series_files = sorted(artifact_dir.glob("*.series.jsonl"))
+        if not series_files:
+            continue
+        try:
+            rr_path = artifact_dir / "run_result.json"
+            rr = _load_json(rr_path) if rr_path.exists() else {}
+            plan = rr.get("plan") if isinstance(rr.get("plan"), dict) else _load_json(artifact_dir / "plan.json")
+            intervals = timeseries.load(*series_files)
+        except Exception:
+            continue
+        complete = [rec for rec in intervals if not rec["partial"] and rec["ms"] > 0]
+        if not complete:
+            continue
+        t0 = complete[0]["t_unix_ns"]
+        points = [
+            (
+                (rec["t_unix_ns"] - t0) / 1e9,
+                rec["ops"] / (rec["ms"] / 1000.0),
+                rec["latency"].percentile(99.0) / 1_000.0 if rec["latency"].count else float("nan"),
+            )
+            for rec in complete
+        ]
+        timelines.append(
+            OverheadTimeline(
+                workload=str(plan.get("workload") or ""),
+                mode=str(plan.get("mode") or ""),
+                artifact_dir=artifact_dir,
+                points=points,
+            )
+        )
+    return timelines
+
+
+def _plot_5_1_overhead_timeline(artifact_root: Path, out_dir: Path) -> None:
+    """Throughput / p99 over time per workload and mode (mean across repetitions)."""
+    import matplotlib.pyplot as plt
+
+    timelines = _extract_overhead_timelines(artifact_root, suite="overhead")
+    if not timelines:
+        print("No interval time series found for suite=overhead; skipping timeline figure")
+        return
+
+    section_dir = out_dir / "5_1_overhead"
+    section_dir.mkdir(parents=True, exist_ok=True)
+    with (section_dir / "timeline.csv").open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["workload", "mode", "artifact_dir", "t_s", "throughput_per_s", "latency_p99_us"])
+        for tl in timelines:
+            for t, thr, p99 in tl.points:
+                writer.writerow([tl.workload, tl.mode, str(tl.artifact_dir), f"{t:.3f}", thr, p99])
+
+    # workload -> mode -> t -> [(throughput, p99)]
+    grouped: Dict[str, Dict[str, Dict[float, List[Tuple[float, float]]]]] = {}
+    for tl in timelines:
+        by_t = grouped.setdefault(tl.workload, {}).setdefault(tl.mode, {})
+        for t, thr, p99 in tl.points:
+            by_t.setdefault(round(t, 3), []).append((thr, p99))
+
+    workloads = sorted(grouped)
+    fig, axes = plt.subplots(len(workloads), 2, figsize=(10.5, 2.8 * len(workloads)), squeeze=False)
+    for row, w in enumerate(workloads):
+        ax_thr, ax_lat = axes[row]
+        for mode in sorted(grouped[w]):
+            ts = sorted(grouped[w][mode])
+            thr = [mean(v[0] for v in grouped[w][mode][t]) for t in ts]
+            lat = [mean(v[1] for v in grouped[w][mode][t]) for t in ts]
+            ax_thr.plot(ts, thr, label=mode, linewidth=1.0)
+            ax_lat.plot(ts, lat, label=mode, linewidth=1.0)
+        ax_thr.set_ylabel(f"{w}\nops/s")
+        ax_lat.set_ylabel("P99 (us)")
+        if row == 0:
+            ax_thr.set_title("§5.1 Throughput over time")
+            ax_lat.set_title("§5.1 P99 latency over time")
+            ax_thr.legend(frameon=False)
+    axes[-1][0].set_xlabel("Time (s)")
+    axes[-1][1].set_xlabel("Time (s)")
+
+    _save_fig(fig, out_dir / "5_1_overhead_timeline.png", out_dir / "5_1_overhead_timeline.pdf")
+    plt.close(fig)
+
+
 def _plot_5_1_overhead(artifact_root: Path, out_dir: Path) -> None:
     _ensure_matplotlib()
     import matplotlib.pyplot as plt
@@ -425,6 +533,9 @@ def _plot_5_1_overhead(artifact_root: Path, out_dir: Path) -> None:
     _save_fig(fig, out_dir / "5_1_overhead.png", out_dir / "5_1_overhead.pdf")
     plt.close(fig)
 
+    # Time-resolved view (ramp-up, warmup transients, mode switches).
+    _plot_5_1_overhead_timeline(artifact_root, out_dir)
+
     # Additionally: dump and plot *all recorded metrics* for this suite.
     section_dir = out_dir / "5_1_overhead"
     recorded_csv = section_dir / "recorded_metrics.csv"
@@ -123,8 +123,17 @@ def expand_parameter_variants(params: Dict) -> List[Dict]:
             for flt in params["filters"]
         ])
     if params.get("numa_actions"):
+        # An action either prefixes the whole server (server_cmd_prefix) or, for the
+        # builtin KV server, places each worker and its shard (placement); `server`
+        # carries any other server overrides the action needs.
         axes.append([
-            {"server": {"numa_policy": action.get("server_cmd_prefix")}, "annotations": {"numa_action": action.get("description", "")}}
+            {
+                "server": deep_merge(
+                    action.get("server") or {},
+                    {"numa_policy": action.get("server_cmd_prefix"), "placement": action.get("placement")},
+                ),
+                "annotations": {"numa_action": action.get("description", "")},
+            }
             for action in params["numa_actions"]
         ])
     if params.get("mutations"):
@@ -30,6 +30,7 @@ from experiments.automation.instrumentation import start_instrumentation
 from experiments.automation.pmu_catalog import build_pmu_update
 from experiments.automation.process_utils import managed_process, ProcessLaunchError
 from experiments.automation.results import ResultRecorder
+from experiments.workloads.common.data_objects import ENV_DIR as DATA_OBJECTS_ENV, load_published
 
 
 @dataclass
@@ -82,6 +83,8 @@ class CommandSpec:
     remote: Optional[RemoteSpec] = None
     metrics_remote_path: Optional[str] = None
     extra_artifacts: List[Tuple[Path, Optional[str]]] = field(default_factory=list)
+    # Data-object manifests the command publishes once it serves (one per worker).
+    data_objects: int = 0
 
 
 CONFIG_ROOT = Path("experiments/configs/workloads")
@@ -119,6 +122,14 @@ DEFAULT_TOKEN_RATE = _coerce_int(_GLOBAL_INSTRUMENTATION_DEFAULTS.get("token_rat
 
 CLIENT_GRACE_S = 5
 
+# The agent control plane reads each request with a single 8 KiB recv().
+DATA_OBJECT_BATCH_BYTES = 6 * 1024
+# Workers publish after prefill and fork, which can outlast a server's ready_wait.
+DATA_OBJECT_WAIT_S = 30.0
+
+# lb_client's default --payload; backends count requests in units of it.
+LB_CLIENT_PAYLOAD = 512
+
 
 CAP_SYS_ADMIN = 21
 CAP_BPF = 39
@@ -545,27 +556,94 @@ def _configure_microsentinel_agent(
                     artifact_dir,
                     f"[runner] failed to apply PMU override {pmu_payload}: {err}",
                 )
-        object_map = overrides.get("object_map")
-        if object_map:
-            map_path = artifact_dir / "object_map_config.json"
-            try:
-                map_path.write_text(json.dumps(object_map, indent=2), encoding="utf-8")
-            except OSError as exc:
-                _log_progress(artifact_dir, f"[runner] failed to write object_map_config.json: {exc}")
-            requests, warnings = _prepare_object_requests(object_map)
-            for warn in warnings:
-                _log_progress(artifact_dir, f"[runner] {warn}")
-            if not requests:
-                _log_progress(artifact_dir, "[runner] object_map override captured; no entries posted")
-            for req in requests:
-                ok, err = _post_control_request(base_url, "/api/v1/symbols/data", req)
-                if ok:
-                    _log_progress(artifact_dir, f"[runner] registered data object {req['name']}@0x{req['address']:x}")
-                else:
-                    _log_progress(
-                        artifact_dir,
-                        f"[runner] failed to register data object {req['name']}@0x{req['address']:x}: {err}",
-                    )
+    object_map = overrides.get("object_map")
+    if object_map:
+        map_path = artifact_dir / "object_map_config.json"
+        try:
+            map_path.write_text(json.dumps(object_map, indent=2), encoding="utf-8")
+        except OSError as exc:
+            _log_progress(artifact_dir, f"[runner] failed to write object_map_config.json: {exc}")
+        requests, warnings = _prepare_object_requests(object_map)
+        for warn in warnings:
+            _log_progress(artifact_dir, f"[runner] {warn}")
+        if not requests:
+            _log_progress(artifact_dir, "[runner] object_map override captured; no entries posted")
+        _post_data_objects(base_url, requests, artifact_dir)
+
+
+def _post_data_objects(base_url: str, requests: List[Dict[str, object]], artifact_dir: Path) -> int:
+    """Register data objects in batched requests sized for the agent; returns the count accepted."""
+    batches: List[List[Dict[str, object]]] = []
+    current: List[Dict[str, object]] = []
+    current_bytes = 0
+    for req in requests:
+        size = len(json.dumps(req)) + 2
+        if current and current_bytes + size > DATA_OBJECT_BATCH_BYTES:
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(req)
+        current_bytes += size
+    if current:
+        batches.append(current)
+
+    registered = 0
+    for batch in batches:
+        names = ", ".join(f"{req['name']}@0x{int(req['address']):x}" for req in batch)
+        ok, err = _post_control_request(base_url, "/api/v1/symbols/data", {"objects": batch})
+        if ok:
+            registered += len(batch)
+            _log_progress(artifact_dir, f"[runner] registered {len(batch)} data objects: {names}")
+        else:
+            _log_progress(artifact_dir, f"[runner] failed to register data objects {names}: {err}")
+    return registered
+
+
+def _register_published_data_objects(
+    agent_config_path: str,
+    overrides: Dict[str, object],
+    artifact_dir: Path,
+    manifest_dir: Path,
+    expected: int = 0,
+    timeout_s: float = DATA_OBJECT_WAIT_S,
+) -> None:
+    """Register the regions workloads published under `manifest_dir` (see common/data_objects.py).
+
+    Waits up to `timeout_s` for `expected` manifests to appear first, since
+    workers publish only once their store is filled.
+    """
+    deadline = time.monotonic() + timeout_s
+    found = len(list(manifest_dir.glob("*.json")))
+    while found < expected and time.monotonic() < deadline:
+        time.sleep(0.2)
+        found = len(list(manifest_dir.glob("*.json")))
+    if found < expected:
+        _log_progress(
+            artifact_dir,
+            f"[runner] only {found}/{expected} data object manifests published after {timeout_s:.0f}s",
+        )
+    objects, warnings = load_published(manifest_dir)
+    for warn in warnings:
+        _log_progress(artifact_dir, f"[runner] {warn}")
+    if not objects:
+        _log_progress(artifact_dir, "[runner] no workload data objects published")
+        return
+    control_addr, control_port = _resolve_control_endpoint(agent_config_path, overrides)
+    if not _wait_for_control_plane(control_addr, control_port):
+        _log_progress(
+            artifact_dir,
+            f"[runner] control plane {control_addr}:{control_port} unreachable; skipped data object registration",
+        )
+        return
+    requests: List[Dict[str, object]] = []
+    for obj in objects:
+        req = {"pid": int(obj["pid"]), "address": int(obj["address"]), "name": str(obj["name"])}
+        req["type"] = str(obj.get("type") or "heap")
+        if obj.get("size"):
+            req["size"] = int(obj["size"])
+        requests.append(req)
+    registered = _post_data_objects(f"http://{control_addr}:{control_port}", requests, artifact_dir)
+    _log_progress(artifact_dir, f"[runner] registered {registered}/{len(requests)} published data objects")
+
 
 def _split_cmd(cmd):
     if isinstance(cmd, (list, tuple)):
@@ -622,6 +700,49 @@ def _metric_path(artifact_dir: Path, stem: str) -> Path:
     return path
 
 
+def _load_shape_args(gen_cfg: Dict, rate: Optional[float] = None) -> List[str]:
+    """Builtin-generator flags for open-loop load (`load_shape: open-loop`).
+
+    `rate` is passed only when the caller doesn't already forward --rate.
+    """
+    shape = gen_cfg.get("load_shape")
+    if not shape:
+        return []
+    args = ["--load-shape", str(shape)]
+    if rate is not None:
+        args += ["--rate", str(rate)]
+    if gen_cfg.get("arrivals"):
+        args += ["--arrivals", str(gen_cfg["arrivals"])]
+    if gen_cfg.get("max_backlog") is not None:
+        args += ["--max-backlog", str(gen_cfg["max_backlog"])]
+    return args
+
+
+def _timeseries_args(
+    gen_cfg: Dict,
+    artifact_dir: Path,
+    stem: str,
+    remote: Optional[RemoteSpec],
+    extra_artifacts: List[Tuple[Path, Optional[str]]],
+) -> List[str]:
+    """Builtin-generator flags for per-interval metrics (`interval_ms` & co.).
+
+    The stream lands next to the metrics file as `<stem>.series.jsonl` and is
+    collected like any other per-command artifact.
+    """
+    interval_ms = _coerce_int(gen_cfg.get("interval_ms"), 0)
+    if interval_ms <= 0:
+        return []
+    series_path = artifact_dir / f"{stem}.series.jsonl"
+    series_arg, series_remote = _resolve_metrics_destination(series_path, remote)
+    extra_artifacts.append((series_path, series_remote))
+    args = ["--interval-ms", str(interval_ms), "--timeseries-file", series_arg]
+    for key in ("trim_start_s", "trim_end_s"):
+        if gen_cfg.get(key) is not None:
+            args += [f"--{key.replace('_', '-')}", str(gen_cfg[key])]
+    return args
+
+
 def load_config(workload: str, override_path: Optional[str]) -> Dict:
     if override_path:
         cfg_path = Path(override_path)
@@ -843,7 +964,41 @@ def build_kv_commands(
             str(server.get("dataset", {}).get("value_size_bytes", 256)),
             "--zipf-theta",
             str(server.get("request_mix", {}).get("zipf_theta", 1.0)),
+            # `threads` maps to forked SO_REUSEPORT worker processes for the builtin server.
+            "--workers",
+            str(server.get("threads", 1)),
         ]
+        if server.get("io"):
+            cmd += ["--io", str(server["io"])]
+        # Per-worker "CPUS[@NODE]" entries (or {cpus, mem_node} mappings).
+        for entry in server.get("placement") or []:
+            if isinstance(entry, dict):
+                entry = str(entry["cpus"]) + (f"@{entry['mem_node']}" if entry.get("mem_node") is not None else "")
+            cmd += ["--placement", str(entry)]
+        dataset = server.get("dataset", {})
+        store_mode = dataset.get("store")
+        if store_mode:
+            cmd += ["--store", str(store_mode)]
+        if store_mode == "slab":
+            # Snapshots are reused across repetitions/warmups; prefault by default when
+            # a NUMA prefix is set so pages land on the node chosen by numa_policy.
+            if dataset.get("seed") is not None:
+                cmd += ["--seed", str(dataset["seed"])]
+            if dataset.get("cache_dir"):
+                cmd += ["--dataset-cache", str(dataset["cache_dir"])]
+            if dataset.get("prefault", bool(server.get("numa_policy"))):
+                cmd += ["--dataset-prefault"]
+        elif store_mode == "capped":
+            if dataset.get("seed") is not None:
+                cmd += ["--seed", str(dataset["seed"])]
+            for key, flag in (
+                ("memory_limit_mb", "--memory-limit-mb"),
+                ("eviction", "--eviction"),
+                ("slab_growth_factor", "--slab-growth-factor"),
+                ("value_size_dist", "--value-size-dist"),
+            ):
+                if dataset.get(key) is not None:
+                    cmd += [flag, str(dataset[key])]
     server_extra: List[Tuple[Path, Optional[str]]] = []
     truth_file = server.get("truth_file")
     if truth_file and impl != "memcached":
@@ -857,6 +1012,27 @@ def build_kv_commands(
             artifact_dir,
             "[runner] kv-server implementation=memcached does not support --truth-file/--truth-limit; ignoring truth_file",
         )
+    access_trace = server.get("access_trace")
+    if access_trace and impl != "memcached":
+        trace_path = _resolve_output_path(artifact_dir, access_trace)
+        cmd += ["--access-trace", str(trace_path)]
+        if server.get("access_trace_every"):
+            cmd += ["--access-trace-every", str(server["access_trace_every"])]
+        if server.get("access_trace_capacity"):
+            cmd += ["--access-trace-capacity", str(server["access_trace_capacity"])]
+        # One ring per forked worker, named like kv_server.trace_path().
+        workers = _coerce_int(server.get("threads", 1), 1)
+        if workers > 1:
+            for idx in range(workers):
+                server_extra.append((trace_path.with_name(f"{trace_path.stem}.w{idx}{trace_path.suffix}"), None))
+        else:
+            server_extra.append((trace_path, None))
+    elif access_trace:
+        _log_progress(artifact_dir, "[runner] kv-server implementation=memcached has no access trace; ignoring access_trace")
+    # Only the slab and capped stores have contiguous regions to publish.
+    data_objects = 0
+    if impl == "builtin" and server.get("dataset", {}).get("store") in ("slab", "capped"):
+        data_objects = max(1, _coerce_int(server.get("threads", 1), 1))
     cmd = _apply_prefix(cmd, server.get("numa_policy"))
     specs.append(
         CommandSpec(
@@ -866,6 +1042,7 @@ def build_kv_commands(
             ready_wait=server.get("ready_wait", 2.0),
             role="server",
             extra_artifacts=server_extra,
+            data_objects=data_objects,
         )
     )
 
@@ -888,7 +1065,7 @@ def build_kv_commands(
             annotations_arg, annotation_remote = _resolve_metrics_destination(annotation_path, remote)
             if remote and annotation_remote == remote_metrics:
                 # Avoid clobbering the main metrics file on the remote host.
-                annotation_remote = remote.metrics_target(f"kv_client_{idx}_annotations.json")
+                annotation_remote = remote.metrics_target(f"kv_client_{idx}_annotations{annotation_path.suffix}")
                 annotations_arg = annotation_remote
             extra_artifacts.append((annotation_path, annotation_remote))
         if impl == "memtier":
@@ -929,8 +1106,30 @@ def build_kv_commands(
                 "--metrics-file",
                 metrics_arg,
             ]
+            if client_cfg.get("key_distribution"):
+                cmd += ["--key-distribution", str(client_cfg["key_distribution"])]
+            if client_cfg.get("zipf_theta") is not None:
+                cmd += ["--zipf-theta", str(client_cfg["zipf_theta"])]
+            if client_cfg.get("set_value_size_dist"):
+                cmd += ["--set-value-size-dist", str(client_cfg["set_value_size_dist"])]
+            # Both servers speak the memcached text protocol; its replies are
+            # length-framed, which pipelining needs. `legacy` is opt-in.
+            protocol = client_cfg.get("protocol") or "memcache_text"
+            cmd += ["--protocol", str(protocol)]
+            if client_cfg.get("multiget"):
+                cmd += ["--multiget", str(client_cfg["multiget"])]
+            if client_cfg.get("pipeline_depth"):
+                cmd += ["--pipeline-depth", str(client_cfg["pipeline_depth"])]
+            if client_cfg.get("processes"):
+                cmd += ["--processes", str(client_cfg["processes"])]
+            # `rate` is the aggregate offered load; split it evenly across instances.
+            instance_rate = None
+            if client_cfg.get("rate") is not None:
+                instance_rate = float(client_cfg["rate"]) / max(1, int(client_cfg.get("instances", 1)))
+            cmd += _load_shape_args(client_cfg, instance_rate)
             if annotations_arg:
                 cmd += ["--annotations-file", annotations_arg]
+            cmd += _timeseries_args(client_cfg, artifact_dir, f"kv_client_{idx}", remote, extra_artifacts)
         cmd = _wrap_remote_command(cmd, remote)
         specs.append(
             CommandSpec(
@@ -986,6 +1185,8 @@ def build_lb_commands(
         lb_override = {}
     lb.update(lb_override)
     impl = lb.get("implementation", "builtin")
+    lb_extra: List[Tuple[Path, Optional[str]]] = []
+    data_objects = 0
     if impl == "haproxy":
         cfg_path = _write_haproxy_cfg(lb, artifact_dir)
         cmd = _split_cmd(lb.get("binary", "haproxy")) + ["-f", str(cfg_path), "-db"]
@@ -1002,6 +1203,45 @@ def build_lb_commands(
         ]
         for backend in lb.get("backends", []):
             cmd += ["--backend", f"{backend['host']}:{backend['port']}"]
+        if lb.get("forward"):
+            cmd += ["--forward", str(lb["forward"])]
+        if lb.get("balance"):
+            cmd += ["--balance", str(lb["balance"])]
+        if lb.get("maglev_table_size"):
+            cmd += ["--maglev-table-size", str(lb["maglev_table_size"])]
+        if lb.get("truth_file"):
+            truth_path = _resolve_output_path(artifact_dir, lb["truth_file"])
+            cmd += ["--truth-file", str(truth_path)]
+            if lb.get("truth_limit"):
+                cmd += ["--truth-limit", str(lb["truth_limit"])]
+            # One file per forked worker, named like l4_lb.truth_path().
+            workers = _coerce_int(lb.get("workers", 8), 1)
+            if workers > 1:
+                for idx in range(workers):
+                    lb_extra.append((truth_path.with_name(f"{truth_path.stem}.w{idx}{truth_path.suffix}"), None))
+            else:
+                lb_extra.append((truth_path, None))
+        # `workers` processes share the port via SO_REUSEPORT. pin_cpus pins worker i
+        # to the i-th listed CPU; pin_to_rss_queues uses CPUs 0..rss_queues-1, the
+        # usual IRQ affinity of the NIC's RSS queues.
+        pin_cpus = lb.get("pin_cpus")
+        if pin_cpus is None and lb.get("pin_to_rss_queues") and lb.get("rss_queues"):
+            pin_cpus = f"0-{_coerce_int(lb['rss_queues'], 1) - 1}"
+        if pin_cpus:
+            cmd += ["--pin-cpus", str(pin_cpus)]
+        # Pre-connected upstreams per backend; size 0 keeps one backend
+        # handshake per accepted flow.
+        pool = lb.get("upstream_pool") or {}
+        if _coerce_int(pool.get("size"), 0) > 0:
+            cmd += ["--upstream-pool-size", str(_coerce_int(pool["size"], 0))]
+            if pool.get("keepalive"):
+                cmd.append("--upstream-keepalive")
+            if pool.get("idle_timeout_s") is not None:
+                cmd += ["--upstream-idle-timeout", str(pool["idle_timeout_s"])]
+            if pool.get("health_interval_s") is not None:
+                cmd += ["--upstream-health-interval", str(pool["health_interval_s"])]
+        if pool.get("connect_timeout_s") is not None:
+            cmd += ["--upstream-connect-timeout", str(pool["connect_timeout_s"])]
 
         # Optional synthetic cache-miss generator for flow attribution accuracy
         # experiments. Defaults to disabled when not set in config.
@@ -1014,10 +1254,44 @@ def build_lb_commands(
             cmd += ["--hot-slots", str(hot_slots)]
         if hot_rounds is not None:
             cmd += ["--hot-rounds", str(hot_rounds)]
+        # Each worker publishes its hot-slot arena when the generator is enabled.
+        if _coerce_int(hot_bytes, 0) > 0:
+            data_objects = max(1, _coerce_int(lb.get("workers", 8), 1))
+        for key, flag in (
+            ("hot_pattern", "--hot-pattern"),
+            ("hot_stride", "--hot-stride"),
+            ("hot_lines", "--hot-lines"),
+        ):
+            if lb.get(key) is not None:
+                cmd += [flag, str(lb[key])]
     cmd = _apply_prefix(cmd, lb.get("numa_policy"))
-    specs.append(CommandSpec("lb-node", cmd, "lb.log", ready_wait=2.0, role="server"))
+    specs.append(
+        CommandSpec(
+            "lb-node",
+            cmd,
+            "lb.log",
+            ready_wait=2.0,
+            role="server",
+            extra_artifacts=lb_extra,
+            data_objects=data_objects,
+        )
+    )
 
-    backend_stub = cfg.get("backend_stub", {})
+    client = cfg["clients"].copy()
+    client_override = overrides.get("clients")
+    if not isinstance(client_override, dict):
+        client_override = {}
+    client.update(client_override)
+    impl = client.get("implementation", "builtin")
+    # One payload size for lb_client and the backends' service-time accounting.
+    payload = _coerce_int(client.get("payload"), LB_CLIENT_PAYLOAD)
+
+    backend_stub = dict(cfg.get("backend_stub") or {})
+    stub_override = overrides.get("backend_stub")
+    if isinstance(stub_override, dict):
+        backend_stub.update(stub_override)
+    if backend_stub.get("request_size") is None and impl != "wrk":
+        backend_stub["request_size"] = payload
     for idx, backend in enumerate(lb.get("backends", [])):
         stub_impl = backend_stub.get("implementation", "builtin")
         if stub_impl == "external":
@@ -1031,17 +1305,20 @@ def build_lb_commands(
                 "--workers",
                 str(backend_stub.get("workers", 4)),
             ]
+            for key, flag in (
+                ("service_time", "--service-time"),
+                ("service_mode", "--service-mode"),
+                ("request_size", "--request-size"),
+                ("seed", "--seed"),
+            ):
+                if backend_stub.get(key) is not None:
+                    backend_cmd += [flag, str(backend_stub[key])]
         specs.append(
             CommandSpec(
                 f"lb-backend-{idx}", backend_cmd, f"lb_backend_{idx}.log", ready_wait=1.0, role="backend"
             )
         )
 
-    client = cfg["clients"].copy()
-    client_override = overrides.get("clients")
-    if not isinstance(client_override, dict):
-        client_override = {}
-    client.update(client_override)
     metrics_path = _metric_path(artifact_dir, "lb_client")
     remote = _build_remote_spec(client.get("remote"))
     metrics_arg, remote_metrics = _resolve_metrics_destination(metrics_path, remote)
@@ -1054,7 +1331,6 @@ def build_lb_commands(
         extra_artifacts.append((truth_path, truth_remote_path))
     else:
         truth_arg = None
-    impl = client.get("implementation", "builtin")
     rate = client.get("rate")
     # If the client will be run on a remote host and we intend to pass --rate,
     # stage the local builtin generator onto the remote so it supports the same args.
@@ -1076,6 +1352,14 @@ def build_lb_commands(
                     scp_cmd = ["sudo", "-u", remote.local_user, *scp_cmd]
                 specs.append(CommandSpec("lb-client-deploy-mkdir", mkdir_cmd, "lb_client_deploy_mkdir.log", ready_wait=0.1))
                 specs.append(CommandSpec("lb-client-deploy-scp", scp_cmd, "lb_client_deploy_scp.log", ready_wait=0.1))
+                # lb_client imports shared helpers from experiments/workloads/common.
+                common_dir = Path("experiments/workloads/common")
+                common_cmd = ["scp", "-r", *remote.ssh_options, str(common_dir), f"{remote.host}:{str(target_dir.parent)}/"]
+                if remote.local_user and os.geteuid() == 0:
+                    common_cmd = ["sudo", "-u", remote.local_user, *common_cmd]
+                specs.append(
+                    CommandSpec("lb-client-deploy-common", common_cmd, "lb_client_deploy_common.log", ready_wait=0.2)
+                )
     if impl == "wrk":
         url = client.get("url", f"http://{lb.get('bind_address', '127.0.0.1')}:{lb.get('port', 7100)}")
         cmd = _split_cmd(client.get("binary", "wrk")) + [
@@ -1102,12 +1386,18 @@ def build_lb_commands(
             str(client.get("flows", 256)),
             "--duration",
             str(duration),
+            "--payload",
+            str(payload),
             "--metrics-file",
             metrics_arg,
         ]
         # forward an optional per-workload total rate to the client generator
         if rate is not None:
             cmd += ["--rate", str(rate)]
+        if client.get("processes"):
+            cmd += ["--processes", str(client["processes"])]
+        cmd += _load_shape_args(client)
+        cmd += _timeseries_args(client, artifact_dir, "lb_client", remote, extra_artifacts)
     if truth_path:
         cmd += ["--ground-truth-log", truth_arg]
     cmd = _wrap_remote_command(cmd, remote)
@@ -1235,12 +1525,14 @@ def build_nfv_commands(
             cmd += ["--dst-ports", ",".join(str(port) for port in dst_ports)]
         if tenants:
             cmd += ["--tenants", ",".join(tenants)]
+    extra_artifacts: List[Tuple[Path, Optional[str]]] = []
+    if impl != "pktgen":
+        cmd += _timeseries_args(traffic, artifact_dir, "nfv_traffic", remote, extra_artifacts)
     if truth_arg:
         cmd += ["--truth-log", truth_arg]
     if truth_limit:
         cmd += ["--truth-limit", str(truth_limit)]
     cmd = _wrap_remote_command(cmd, remote)
-    extra_artifacts: List[Tuple[Path, Optional[str]]] = []
     if truth_path:
         extra_artifacts.append((truth_path, truth_remote))
     specs.append(
@@ -1477,18 +1769,35 @@ def execute_workload(
             if mode == "microsentinel":
                 _configure_microsentinel_agent(agent_config, ms_runtime_overrides, artifact_dir)
 
+            # Workloads publish their hot data regions here; they are registered
+            # with the agent once the servers are up and before any client starts.
+            data_objects_dir = artifact_dir / "data_objects"
+            data_objects_registered = mode != "microsentinel"
+            data_objects_expected = 0
             for spec in commands:
+                if spec.role == "client" and not data_objects_registered:
+                    _register_published_data_objects(
+                        agent_config, ms_runtime_overrides, artifact_dir, data_objects_dir, data_objects_expected
+                    )
+                    data_objects_registered = True
                 log_path = artifact_dir / spec.log_suffix
+                env = dict(spec.env if spec.env is not None else os.environ)
+                env[DATA_OBJECTS_ENV] = str(data_objects_dir.resolve())
                 proc = stack.enter_context(
                     managed_process(
                         spec.name,
                         spec.argv,
                         log_path=log_path,
-                        env=spec.env,
+                        env=env,
                         ready_wait=spec.ready_wait,
                     )
                 )
                 running.append((spec, proc))
+                data_objects_expected += spec.data_objects
+            if not data_objects_registered:
+                _register_published_data_objects(
+                    agent_config, ms_runtime_overrides, artifact_dir, data_objects_dir, data_objects_expected
+                )
 
             # Record PIDs for downstream analysis (pidstat parsing, per-role CPU/RSS, etc).
             try:
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Sampled server-side access trace in a fixed-size memory-mapped ring.
+
+Every Nth data access is written as one 64-byte little-endian record
+
+    ts_ns u64 | key_id i64 | addr u64 | op u16 | family u16 |
+    peer_port u16 | local_port u16 | peer_ip 16s | local_ip 16s
+
+into a MAP_SHARED file after a 32-byte header
+
+    magic 8s | record_size u32 | capacity u32 | pid u32 | every u32 | written u64
+
+`written` counts every record ever stored, so record `i` lives in slot
+`i % capacity` and the oldest surviving record is `max(0, written - capacity)`.
+Timestamps are CLOCK_MONOTONIC (`time.monotonic_ns()`), the same clock as
+BPF `bpf_ktime_get_ns()` samples and kv_client annotations on this host.
+IPv4 addresses are stored IPv4-mapped; `family` is 4 or 6 (0 if unknown).
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import mmap
+import os
+import struct
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+MAGIC = b"MSTRACE1"
+HEADER = struct.Struct("<8sIIIIQ")
+RECORD = struct.Struct("<QqQHHHH16s16s")
+WRITTEN = struct.Struct("<Q")
+WRITTEN_OFFSET = HEADER.size - WRITTEN.size
+OP_CODES = {"GET": 1, "SET": 2}
+OP_NAMES = {code: name for name, code in OP_CODES.items()}
+DEFAULT_CAPACITY = 1 << 16
+DEFAULT_EVERY = 64
+
+Conn = Tuple[int, int, int, bytes, bytes]
+NO_CONN: Conn = (0, 0, 0, bytes(16), bytes(16))
+PathLike = Union[str, Path]
+
+
+def _ip16(host: str) -> Tuple[int, bytes]:
+    addr = ipaddress.ip_address(host.split("%", 1)[0])
+    if addr.version == 4:
+        return 4, ipaddress.IPv6Address(f"::ffff:{addr}").packed
+    return 6, addr.packed
+
+
+def connection(peer, local) -> Conn:
+    """Pre-pack a connection tuple once per connection (from get_extra_info)."""
+    try:
+        family, peer_ip = _ip16(peer[0])
+        _, local_ip = _ip16(local[0])
+        return family, int(peer[1]), int(local[1]), peer_ip, local_ip
+    except (TypeError, ValueError, IndexError):
+        return NO_CONN
+
+
+class AccessTrace:
+    """Writer side; one instance per serving process."""
+
+    def __init__(self, path: PathLike, capacity: int = DEFAULT_CAPACITY, every: int = DEFAULT_EVERY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._capacity = max(1, capacity)
+        self._every = max(1, every)
+        size = HEADER.size + self._capacity * RECORD.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._mm, 0, MAGIC, RECORD.size, self._capacity, os.getpid(), self._every, 0)
+        self._written = 0
+        self._countdown = self._every
+
+    def sample(self) -> bool:
+        """Count one access; True if it is the Nth since the last sample.
+
+        Callers resolve the key id and address only when this returns True,
+        so unsampled accesses cost a decrement and a compare.
+        """
+        self._countdown -= 1
+        if self._countdown:
+            return False
+        self._countdown = self._every
+        return True
+
+    def record(self, op: int, key_id: int, addr: int, conn: Conn) -> None:
+        idx = self._written
+        offset = HEADER.size + (idx % self._capacity) * RECORD.size
+        RECORD.pack_into(self._mm, offset, time.monotonic_ns(), key_id, addr, op, *conn)
+        self._written = idx + 1
+        WRITTEN.pack_into(self._mm, WRITTEN_OFFSET, self._written)
+
+    def close(self) -> None:
+        self._mm.flush()
+        self._mm.close()
+
+
+class TraceFile:
+    """Read-only view over a trace ring file."""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        data = self.path.read_bytes()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{self.path}: truncated trace header")
+        magic, record_size, capacity, pid, every, written = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{self.path}: not a MicroSentinel access trace")
+        self.pid = pid
+        self.every = every
+        self.capacity = capacity
+        self.written = written
+        self._data = data
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    def records(self) -> Iterator[Tuple[int, int, int, int, Conn]]:
+        """Yield (ts_ns, op, key_id, addr, conn) oldest first."""
+        for idx in range(self.written - len(self), self.written):
+            offset = HEADER.size + (idx % self.capacity) * RECORD.size
+            ts, key_id, addr, op, family, pport, lport, pip, lip = RECORD.unpack_from(self._data, offset)
+            yield ts, op, key_id, addr, (family, pport, lport, pip, lip)
+
+
+def summarize(paths: Iterable[PathLike], top_keys: int = 10) -> Dict[str, object]:
+    """Aggregate sampled accesses across per-worker trace files."""
+    files = []
+    records = 0
+    written = 0
+    ops: Counter = Counter()
+    keys: Counter = Counter()
+    conns = set()
+    t0: Optional[int] = None
+    t1: Optional[int] = None
+    every = None
+    for path in paths:
+        trace = TraceFile(path)
+        files.append({"path": str(path), "pid": trace.pid, "written": trace.written, "retained": len(trace)})
+        written += trace.written
+        every = trace.every
+        for ts, op, key_id, _addr, conn in trace.records():
+            records += 1
+            ops[OP_NAMES.get(op, str(op))] += 1
+            keys[key_id] += 1
+            conns.add(conn)
+            t0 = ts if t0 is None or ts < t0 else t0
+            t1 = ts if t1 is None or ts > t1 else t1
+    return {
+        "files": files,
+        "sample_every": every,
+        "records": records,
+        "records_written": written,
+        "ops": dict(ops),
+        "connections": len(conns),
+        "distinct_keys": len(keys),
+        "time_range_monotonic_ns": {"start": t0, "end": t1} if t0 is not None else None,
+        "top_keys": [
+            {"key_id": key_id, "count": count, "share": count / records if records else 0.0}
+            for key_id, count in keys.most_common(top_keys)
+        ],
+    }
+
+
+def summarize_dir(artifact_dir: PathLike) -> Optional[Dict[str, object]]:
+    """`summarize` every trace file (`*.trace`) under a run's artifact dir, or None.
+
+    A malformed file yields {"error": ...} rather than failing the analysis.
+    """
+    paths = sorted(Path(artifact_dir).rglob("*.trace"))
+    if not paths:
+        return None
+    try:
+        return summarize(paths)
+    except ValueError as exc:
+        return {"error": str(exc)}
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Compact append-only per-operation annotation records.
+
+File layout: a 16-byte header (magic + record size) followed by fixed 32-byte
+little-endian records
+
+    conn_id u32 | op u16 | reserved u16 | key_id u64 | start_ns i64 | end_ns i64
+
+Timestamps are `time.monotonic_ns()` of the client host. Writers buffer
+records in memory and hand full chunks to a background thread, so the send
+path only pays for one `struct.pack`. Several processes may append to the
+same file: each chunk is one `write()` of whole records on an O_APPEND fd.
+Readers memory-map the file (as a NumPy structured array when available).
+"""
+
+from __future__ import annotations
+
+import mmap
+import queue
+import struct
+import threading
+import traceback
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:  # optional: zero-copy structured view for analyzers
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised on hosts without numpy
+    np = None
+
+MAGIC = b"MSANN001"
+HEADER = struct.Struct("<8sI4x")
+RECORD = struct.Struct("<IHHQqq")
+OP_CODES = {"GET": 1, "SET": 2}
+OP_NAMES = {code: name for name, code in OP_CODES.items()}
+DEFAULT_FLUSH_BYTES = 1 << 20
+
+PathLike = Union[str, Path]
+
+
+def create(path: PathLike) -> Path:
+    """Create (or truncate) an annotation file containing only the header."""
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(HEADER.pack(MAGIC, RECORD.size))
+    return path
+
+
+class AnnotationWriter:
+    """Append records to an existing annotation file from a background flusher."""
+
+    def __init__(self, path: PathLike, flush_bytes: int = DEFAULT_FLUSH_BYTES):
+        path = Path(path).expanduser()
+        if not path.exists():
+            create(path)
+        self._file = open(path, "ab", buffering=0)
+        # Round down so every chunk handed to write() holds whole records.
+        self._flush_bytes = max(RECORD.size, flush_bytes - flush_bytes % RECORD.size)
+        self._buf = bytearray()
+        self._pack = RECORD.pack
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name="annotation-flusher", daemon=True)
+        self._thread.start()
+
+    def record(self, conn_id: int, op: int, key_id: int, start_ns: int, end_ns: int) -> None:
+        self._buf += self._pack(conn_id, op, 0, key_id, start_ns, end_ns)
+        if len(self._buf) >= self._flush_bytes:
+            self._queue.put(bytes(self._buf))
+            self._buf.clear()
+
+    def _drain(self) -> None:
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            self._file.write(chunk)
+
+    def close(self) -> None:
+        if self._buf:
+            self._queue.put(bytes(self._buf))
+            self._buf.clear()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+class AnnotationFile:
+    """Read-only memory map over an annotation file."""
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            head = f.read(HEADER.size)
+            if len(head) < HEADER.size:
+                raise ValueError(f"{self.path}: truncated annotation header")
+            magic, record_size = HEADER.unpack(head)
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"{self.path}: not a MicroSentinel annotation file")
+            size = f.seek(0, 2)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        # Ignore a torn trailing record (e.g. client killed mid-write).
+        self.count = max(0, size - HEADER.size) // RECORD.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def records(self) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Yield (conn_id, op, key_id, start_ns, end_ns)."""
+        if not self.count:
+            return
+        body = memoryview(self._mm)[HEADER.size : HEADER.size + self.count * RECORD.size]
+        try:
+            for conn_id, op, _reserved, key_id, start, end in RECORD.iter_unpack(body):
+                yield conn_id, op, key_id, start, end
+        finally:
+            body.release()
+
+    def array(self):
+        """NumPy structured view (no copy); requires numpy."""
+        if np is None:
+            raise RuntimeError("numpy is required for AnnotationFile.array()")
+        dtype = np.dtype(
+            [
+                ("conn_id", "<u4"),
+                ("op", "<u2"),
+                ("reserved", "<u2"),
+                ("key_id", "<u8"),
+                ("start_ns", "<i8"),
+                ("end_ns", "<i8"),
+            ]
+        )
+        if not self.count:
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(self._mm, dtype=dtype, count=self.count, offset=HEADER.size)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def is_annotation_file(path: PathLike) -> bool:
+    try:
+        with Path(path).open("rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _array_stats(ann: AnnotationFile, ops: Counter, keys: Counter, connections: set) -> Tuple[int, int]:
+    # The view into the mmap lives only in this frame, so it is gone before
+    # the caller closes the file, whether or not the stats succeed.
+    arr = ann.array()
+    try:
+        codes, counts = np.unique(arr["op"], return_counts=True)
+        for code, count in zip(codes.tolist(), counts.tolist()):
+            ops[OP_NAMES.get(code, str(code))] += count
+        ids, counts = np.unique(arr["key_id"], return_counts=True)
+        keys.update(dict(zip(ids.tolist(), counts.tolist())))
+        connections.update(np.unique(arr["conn_id"]).tolist())
+        return int(arr["start_ns"].min()), int(arr["end_ns"].max())
+    except BaseException as exc:
+        # The traceback keeps NumPy's frames, and the slices of `arr` they
+        # hold, alive; clear them so the real error survives the close().
+        traceback.clear_frames(exc.__traceback__)
+        raise
+    finally:
+        del arr
+
+
+def summarize(paths: Iterable[PathLike], top_keys: int = 10) -> Dict[str, object]:
+    """Aggregate op counts, time range and hottest keys across annotation files."""
+    files = []
+    records = 0
+    ops: Counter = Counter()
+    keys: Counter = Counter()
+    connections = set()
+    t0: Optional[int] = None
+    t1: Optional[int] = None
+    for path in paths:
+        ann = AnnotationFile(path)
+        try:
+            files.append(str(path))
+            records += len(ann)
+            if np is not None and len(ann):
+                lo, hi = _array_stats(ann, ops, keys, connections)
+            elif len(ann):
+                lo = hi = None
+                for conn_id, op, key_id, start, end in ann.records():
+                    ops[OP_NAMES.get(op, str(op))] += 1
+                    keys[key_id] += 1
+                    connections.add(conn_id)
+                    lo = start if lo is None or start < lo else lo
+                    hi = end if hi is None or end > hi else hi
+            else:
+                continue
+            t0 = lo if t0 is None else min(t0, lo)
+            t1 = hi if t1 is None else max(t1, hi)
+        finally:
+            ann.close()
+    return {
+        "files": files,
+        "records": records,
+        "ops": dict(ops),
+        "connections": len(connections),
+        "distinct_keys": len(keys),
+        "time_range_monotonic_ns": {"start": t0, "end": t1} if t0 is not None else None,
+        "top_keys": [
+            {"key_id": key_id, "count": count, "share": count / records if records else 0.0}
+            for key_id, count in keys.most_common(top_keys)
+        ],
+    }
+
+
+def summarize_dir(artifact_dir: PathLike) -> Optional[Dict[str, object]]:
+    """`summarize` every annotation file (`*.msann`) under a run's artifact dir, or None.
+
+    A malformed file yields {"error": ...} rather than failing the analysis.
+    """
+    paths = sorted(p for p in Path(artifact_dir).rglob("*.msann") if is_annotation_file(p))
+    if not paths:
+        return None
+    try:
+        return summarize(paths)
+    except ValueError as exc:
+        return {"error": str(exc)}
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Open-loop arrival scheduling shared by the request/response generators.
+
+In closed-loop mode a connection sends its next request when the previous
+reply arrives, so a slower server is offered less load, and the time a
+request spent waiting to be sent never shows up in its latency
+(coordinated omission). In open-loop mode one scheduler per process draws
+arrival times for the target aggregate rate. Poisson arrivals have
+exponential gaps; constant arrivals have fixed gaps. The scheduler hands
+each intended send time to whichever connection is free next. Workers then
+measure latency from that intended time, so queueing behind a saturated
+server or client counts.
+
+Arrivals are generated in catch-up batches whenever the scheduler wakes.
+Event-loop timer slack therefore delays sends, not intended times. That
+slack is client-side, so workers report each send's lag behind its
+intended time via `sent()`, and the stats include it as `send_lag_us`. If
+more than `max_backlog` arrivals are waiting for a connection, new ones are
+dropped and counted instead of growing the queue without bound.
+
+In closed-loop mode a target rate is a ceiling, not an arrival process.
+`SharedRate` enforces it across forked processes by handing out global
+send slots.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from typing import Dict, Iterable, Optional
+
+from .histogram import LatencyHistogram, merge_serialized
+
+LOAD_SHAPES = ("closed-loop", "open-loop")
+ARRIVALS = ("poisson", "constant")
+DEFAULT_MAX_BACKLOG = 1 << 16
+
+
+def add_arguments(parser: argparse.ArgumentParser, rate_help: Optional[str] = None) -> None:
+    """Add --load-shape/--arrivals/--max-backlog (and --rate unless the caller owns it)."""
+    group = parser.add_argument_group("load shape")
+    group.add_argument(
+        "--load-shape",
+        choices=LOAD_SHAPES,
+        default="closed-loop",
+        help="open-loop: a central scheduler issues requests at --rate regardless of replies",
+    )
+    if rate_help is not None:
+        group.add_argument("--rate", type=float, default=0.0, help=rate_help)
+    group.add_argument("--arrivals", choices=ARRIVALS, default="poisson", help="open-loop inter-arrival distribution")
+    group.add_argument(
+        "--max-backlog",
+        type=int,
+        default=DEFAULT_MAX_BACKLOG,
+        help="open-loop: arrivals allowed to wait for a free connection before new ones are dropped",
+    )
+
+
+def resolve_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.load_shape == "open-loop" and not (args.rate and args.rate > 0):
+        parser.error("--load-shape open-loop needs --rate > 0")
+
+
+class OpenLoopScheduler:
+    """Central arrival scheduler; workers pull intended send times from it."""
+
+    def __init__(
+        self,
+        rate: float,
+        arrivals: str = "poisson",
+        seed: Optional[int] = None,
+        phase: float = 0.0,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+    ):
+        if rate <= 0:
+            raise ValueError("open-loop rate must be > 0")
+        if arrivals not in ARRIVALS:
+            raise ValueError(f"unknown arrival process {arrivals!r}")
+        self.rate = float(rate)
+        self.arrivals = arrivals
+        self._mean_gap_ns = 1e9 / self.rate
+        self._rng = random.Random(seed)
+        # Fraction of one mean gap to delay the first arrival; lets N
+        # processes with constant arrivals interleave instead of colliding.
+        self._phase_ns = int(phase * self._mean_gap_ns)
+        self._max_backlog = max(1, max_backlog)
+        self._queue: "asyncio.Queue[Optional[int]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.scheduled = 0
+        self.dropped = 0
+        self.max_queued = 0
+        self.unsent = 0
+        self.send_lag = LatencyHistogram()
+
+    async def _run(self) -> None:
+        queue = self._queue
+        next_t = time.monotonic_ns() + self._phase_ns
+        constant = self.arrivals == "constant"
+        expovariate = self._rng.expovariate
+        mean_gap = self._mean_gap_ns
+        # Carries the sub-ns remainder so fixed gaps don't drift.
+        carry = 0.0
+        while True:
+            now = time.monotonic_ns()
+            while next_t <= now:
+                self.scheduled += 1
+                if queue.qsize() >= self._max_backlog:
+                    self.dropped += 1
+                else:
+                    queue.put_nowait(next_t)
+                carry += mean_gap if constant else expovariate(1.0) * mean_gap
+                step = int(carry)
+                carry -= step
+                next_t += step
+            if queue.qsize() > self.max_queued:
+                self.max_queued = queue.qsize()
+            await asyncio.sleep((next_t - now) / 1e9)
+
+    def start(self) -> None:
+        """Start issuing arrivals from now on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def next(self) -> Optional[int]:
+        """Wait for the next arrival's intended send time (monotonic ns).
+
+        Returns None once `stop(release=...)` has run.
+        """
+        return await self._queue.get()
+
+    def sent(self, intended_ns: int, start_ns: int) -> None:
+        self.send_lag.record(start_ns - intended_ns)
+
+    async def stop(self, release: int = 0) -> None:
+        """Stop issuing arrivals.
+
+        Arrivals still queued are discarded and counted as unsent; `release`
+        waiters then get None from `next()`, so workers blocked on it can exit
+        instead of being cancelled.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self.unsent += 1
+        for _ in range(release):
+            self._queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "arrivals": self.arrivals,
+            "offered_rate": self.rate,
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "unsent": self.unsent,
+            "max_queued": self.max_queued,
+            "send_lag_us": self.send_lag.summary(),
+            "send_lag_histogram": self.send_lag.to_dict(),
+        }
+
+
+class SharedRate:
+    """Closed-loop rate limit shared by forked processes.
+
+    Token k is due at start + k / rate. A sender claims the next token
+    before each request and waits until it is due, so the aggregate rate is
+    exact however flows are spread over processes; a process that falls
+    behind just claims fewer tokens. Create it before forking.
+    """
+
+    # A send is counted late when its token was due this long before the claim.
+    LATE_NS = 1_000_000
+
+    def __init__(self, rate: float, ctx=None):
+        if rate <= 0:
+            raise ValueError("shared rate must be > 0")
+        ctx = ctx or multiprocessing.get_context("fork")
+        self.rate = float(rate)
+        self._gap_ns = 1e9 / self.rate
+        self._lock = ctx.Lock()
+        self._state = ctx.RawArray("q", 2)  # [start_ns, next token]
+        # Per-process counters (each fork has its own copy).
+        self.claimed = 0
+        self.late = 0
+
+    def start(self, now_ns: Optional[int] = None) -> None:
+        """Set the schedule origin; only the first caller's time counts."""
+        with self._lock:
+            if not self._state[0]:
+                self._state[0] = now_ns or time.monotonic_ns()
+
+    def claim(self) -> int:
+        """Claim the next token; returns its due time (monotonic ns)."""
+        with self._lock:
+            token = self._state[1]
+            self._state[1] = token + 1
+            start = self._state[0]
+        due = start + int(token * self._gap_ns)
+        self.claimed += 1
+        if time.monotonic_ns() - due > self.LATE_NS:
+            self.late += 1
+        return due
+
+    def stats(self) -> Dict[str, object]:
+        return {"target_rate": self.rate, "claimed": self.claimed, "late": self.late}
+
+
+def merge_rate_stats(parts: Iterable[Optional[Dict[str, object]]]) -> Dict[str, object]:
+    """Combine per-process `SharedRate.stats()` dicts."""
+    parts = [part for part in parts if part]
+    if not parts:
+        return {}
+    return {
+        "target_rate": parts[0]["target_rate"],
+        "claimed": sum(part["claimed"] for part in parts),
+        "late": sum(part["late"] for part in parts),
+    }
+
+
+def merge_stats(parts: Iterable[Optional[Dict[str, object]]]) -> Dict[str, object]:
+    """Combine per-process `stats()` dicts (rates and counters add up)."""
+    parts = [part for part in parts if part]
+    if not parts:
+        return {}
+    merged = dict(parts[0])
+    for part in parts[1:]:
+        for key in ("offered_rate", "scheduled", "dropped", "unsent"):
+            merged[key] = merged.get(key, 0) + part.get(key, 0)
+        merged["max_queued"] = max(merged.get("max_queued", 0), part.get("max_queued", 0))
+    lag = merge_serialized(part.get("send_lag_histogram") for part in parts)
+    if lag is not None:
+        merged["send_lag_us"] = lag.summary()
+        merged["send_lag_histogram"] = lag.to_dict()
+    return merged
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Publish a workload's hot data regions for agent data-object registration.
+
+Each process writes one small JSON manifest, `<label>.<pid>.json`, into a
+well-known directory: `$MICROSENTINEL_DATA_OBJECTS_DIR`, or
+`/tmp/microsentinel/data_objects` when the variable is unset. The workload
+runner points the variable at the artifact dir, then registers every region
+it finds with the agent in batched `/api/v1/symbols/data` requests.
+
+Regions are real buffer addresses in the publishing process, so they must be
+published by the process that serves requests (i.e. after any fork).
+"""
+
+from __future__ import annotations
+
+import ctypes
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+ENV_DIR = "MICROSENTINEL_DATA_OBJECTS_DIR"
+DEFAULT_DIR = "/tmp/microsentinel/data_objects"
+
+# (name, address, size_bytes[, type])
+Region = Union[Tuple[str, int, int], Tuple[str, int, int, str]]
+
+
+def buffer_address(buf) -> int:
+    """Address of the first byte of a bytes/bytearray/array/mmap buffer."""
+    if isinstance(buf, bytes):
+        # c_char_p borrows the bytes object's internal buffer (no copy).
+        return ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value or 0
+    if isinstance(buf, array):
+        return buf.buffer_info()[0]
+    return ctypes.addressof(ctypes.c_char.from_buffer(buf))
+
+
+def data_objects_dir() -> Path:
+    return Path(os.environ.get(ENV_DIR) or DEFAULT_DIR)
+
+
+def publish(label: str, regions: Iterable[Region], directory: Optional[Path] = None) -> Optional[Path]:
+    """Write this process's regions to `<dir>/<label>.<pid>.json`; returns the path.
+
+    Publishing is best-effort: a workload must not fail because the manifest
+    directory is not writable, so errors are reported and `None` is returned.
+    """
+    pid = os.getpid()
+    objects: List[Dict[str, object]] = []
+    for region in regions:
+        name, address, size = region[0], int(region[1]), int(region[2])
+        obj_type = region[3] if len(region) > 3 else "heap"
+        if address and size > 0:
+            objects.append({"name": name, "pid": pid, "address": address, "size": size, "type": obj_type})
+    if not objects:
+        return None
+    out_dir = Path(directory) if directory is not None else data_objects_dir()
+    path = out_dir / f"{label}.{pid}.json"
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"label": label, "pid": pid, "objects": objects}, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as exc:
+        print(f"[data-objects] failed to publish {label}: {exc}", flush=True)
+        return None
+    return path
+
+
+def load_published(directory: Path) -> Tuple[List[Dict[str, object]], List[str]]:
+    """Collect regions from every manifest in `directory`; returns (objects, warnings)."""
+    objects: List[Dict[str, object]] = []
+    warnings: List[str] = []
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            warnings.append(f"unreadable data object manifest {path.name}: {exc}")
+            continue
+        for obj in payload.get("objects") or []:
+            if isinstance(obj, dict) and obj.get("pid") and obj.get("address") and obj.get("name"):
+                objects.append(obj)
+            else:
+                warnings.append(f"malformed entry in {path.name}: {obj!r}")
+    return objects, warnings
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Fixed-size log-linear (HDR-style) latency histogram with exact merging.
+
+Values are non-negative integers, nanoseconds by convention. With
+`sub_bucket_bits = s`, values below 2**s get one bucket each. Above that,
+every power-of-two range is split into 2**(s-1) equal buckets, so any value
+is reported within a relative error of 2**-(s-1) (0.8% for the default
+s=8). Values of 2**max_bits or more share the top bucket; `max` stays exact.
+
+`record` is O(1), memory is fixed by (s, max_bits), and histograms with the
+same layout merge exactly by adding counts. This lets per-connection,
+per-process and per-host results be combined before taking percentiles,
+instead of averaging percentiles. `to_dict` / `from_dict` give the compact
+JSON form embedded in workload metrics files under "latency_histogram".
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+FORMAT = "loglinear-v1"
+DEFAULT_SUB_BUCKET_BITS = 8
+DEFAULT_MAX_BITS = 40  # ~18 minutes in ns
+SUMMARY_PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits: int = DEFAULT_SUB_BUCKET_BITS, max_bits: int = DEFAULT_MAX_BITS):
+        if sub_bucket_bits < 2 or max_bits <= sub_bucket_bits:
+            raise ValueError("need 2 <= sub_bucket_bits < max_bits")
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_bits = max_bits
+        self._half_bits = sub_bucket_bits - 1
+        self._max_shift = max_bits - sub_bucket_bits
+        self._counts = array("Q", bytes(8 * (self._max_shift + 2) * (1 << self._half_bits)))
+        self._last = len(self._counts) - 1
+        self.count = 0
+        self.sum = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        if shift > self._max_shift:
+            return self._last
+        return (shift << self._half_bits) + (value >> shift)
+
+    def _lowest_equivalent(self, index: int) -> int:
+        shift = max(0, (index >> self._half_bits) - 1)
+        return (index - (shift << self._half_bits)) << shift
+
+    def _highest_equivalent(self, index: int) -> int:
+        shift = max(0, (index >> self._half_bits) - 1)
+        return self._lowest_equivalent(index) + (1 << shift) - 1
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if (other.sub_bucket_bits, other.max_bits) != (self.sub_bucket_bits, self.max_bits):
+            raise ValueError("cannot merge histograms with different bucket layouts")
+        counts = self._counts
+        for idx, n in enumerate(other._counts):
+            if n:
+                counts[idx] += n
+        self.count += other.count
+        self.sum += other.sum
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        return self
+
+    def copy(self) -> "LatencyHistogram":
+        other = LatencyHistogram(self.sub_bucket_bits, self.max_bits)
+        other._counts = array("Q", self._counts)
+        other.count, other.sum, other.min, other.max = self.count, self.sum, self.min, self.max
+        return other
+
+    def delta(self, earlier: "LatencyHistogram") -> "LatencyHistogram":
+        """Values recorded since `earlier`, an older `copy()` of this histogram.
+
+        Exact per-interval extremes are not tracked, so `min`/`max` of the
+        result are bounded by its lowest and highest non-empty bucket.
+        """
+        out = LatencyHistogram(self.sub_bucket_bits, self.max_bits)
+        counts = out._counts
+        first = last = -1
+        for idx, (now, then) in enumerate(zip(self._counts, earlier._counts)):
+            if now != then:
+                counts[idx] = now - then
+                if first < 0:
+                    first = idx
+                last = idx
+        out.count = self.count - earlier.count
+        out.sum = self.sum - earlier.sum
+        if first >= 0:
+            out.min = max(self.min or 0, self._lowest_equivalent(first))
+            out.max = min(self.max or 0, self._highest_equivalent(last))
+        return out
+
+    def percentile(self, pct: float) -> float:
+        """Value at `pct` (0-100), reported as the bucket's highest equivalent value."""
+        if not self.count:
+            return 0.0
+        if pct >= 100.0:
+            return float(self.max)
+        rank = max(1, int(-(-pct * self.count // 100.0)))
+        seen = 0
+        for idx, n in enumerate(self._counts):
+            if not n:
+                continue
+            seen += n
+            if seen >= rank:
+                return float(min(self._highest_equivalent(idx), self.max))
+        return float(self.max)
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self, scale: float = 1e-3) -> Dict[str, float]:
+        """p50/p90/p95/p99/p999/mean/max, scaled (default ns -> us)."""
+        out = {}
+        for pct in SUMMARY_PERCENTILES:
+            key = "p" + (f"{pct:g}".replace(".", ""))
+            out[key] = self.percentile(pct) * scale
+        out["mean"] = self.mean() * scale
+        out["max"] = float(self.max or 0) * scale
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": FORMAT,
+            "unit": "ns",
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "max_bits": self.max_bits,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            # Sparse [index, count] pairs: only touched buckets are stored.
+            "buckets": [[idx, n] for idx, n in enumerate(self._counts) if n],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "LatencyHistogram":
+        if not isinstance(payload, dict) or payload.get("format") != FORMAT:
+            raise ValueError("not a serialized latency histogram")
+        hist = cls(int(payload["sub_bucket_bits"]), int(payload["max_bits"]))
+        for idx, n in payload.get("buckets") or []:
+            hist._counts[int(idx)] += int(n)
+        hist.count = int(payload.get("count") or 0)
+        hist.sum = int(payload.get("sum") or 0)
+        hist.min = payload.get("min")
+        hist.max = payload.get("max")
+        return hist
+
+
+def is_serialized(payload: Any) -> bool:
+    return isinstance(payload, dict) and payload.get("format") == FORMAT
+
+
+def merge_serialized(payloads: Iterable[Any]) -> Optional[LatencyHistogram]:
+    """Merge every serialized histogram in `payloads`; None if there are none."""
+    merged: Optional[LatencyHistogram] = None
+    for payload in payloads:
+        if not is_serialized(payload):
+            continue
+        hist = LatencyHistogram.from_dict(payload)
+        merged = hist if merged is None else merged.merge(hist)
+    return merged
+
+
+def client_histograms(metrics_list: Iterable[Dict[str, Any]], key: str = "latency_histogram") -> List[Any]:
+    """Pull the serialized histograms out of a list of client metrics dicts."""
+    return [m.get(key) for m in metrics_list if isinstance(m, dict) and is_serialized(m.get(key))]
+
+
+def merge_clients(
+    metrics_list: Iterable[Dict[str, Any]], key: str = "latency_histogram", require_all: bool = False
+) -> Optional[LatencyHistogram]:
+    """Merged histogram over every client that shipped one; None if none did or all are empty.
+
+    With `require_all`, also None unless every client shipped one, so a
+    partial merge is never mistaken for the whole client population.
+    """
+    clients = [m for m in metrics_list if isinstance(m, dict)]
+    hists = client_histograms(clients, key)
+    if require_all and len(hists) != len(clients):
+        return None
+    merged = merge_serialized(hists)
+    return merged if merged is not None and merged.count else None
+
+
+def client_p99_us(
+    metrics_list: Iterable[Dict[str, Any]], key: str = "latency_histogram", require_all: bool = True
+) -> Optional[float]:
+    """p99 in microseconds over all client requests, from the merged histograms.
+
+    None without any histogram or, by default, when some client lacks one:
+    callers then fall back to the per-client p99s.
+    """
+    merged = merge_clients(metrics_list, key, require_all)
+    return merged.percentile(99.0) / 1_000.0 if merged is not None else None
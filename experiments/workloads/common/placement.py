@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Per-worker CPU and memory placement for the forked workload servers.
+
+A placement is one `CPUS[@NODE]` entry per worker:
+
+    0-7,16-23@1     run on CPUs 0-7 and 16-23, put this worker's memory on node 1
+    node0@1         run on every CPU of node 0, memory on node 1
+    node1           run on node 1's CPUs, memory wherever first touch puts it
+
+Entries are reused round-robin when there are more workers than entries.
+Memory is placed by `mbind(MPOL_BIND)` on the worker's range, issued before
+the worker first touches it, so the policy holds no matter which process
+later reads the pages. The calls go straight to the kernel through libc's
+`syscall()`, so neither libnuma nor numactl is needed; on hosts where they
+are unavailable, `bind_memory` reports failure and placement falls back to
+plain first touch from the pinned CPUs.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import mmap
+import os
+import platform
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NODE_ROOT = Path("/sys/devices/system/node")
+MPOL_BIND = 2
+MPOL_MF_STRICT = 1
+# (mbind, move_pages) syscall numbers.
+_SYSCALLS = {
+    "x86_64": (237, 279),
+    "aarch64": (235, 239),
+}
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parse a kernel-style CPU list (`0-3,8,10-11`)."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return sorted(set(cpus))
+
+
+def node_cpus() -> Dict[int, List[int]]:
+    """CPUs of every online NUMA node; {0: all CPUs} on non-NUMA hosts."""
+    nodes: Dict[int, List[int]] = {}
+    for path in sorted(NODE_ROOT.glob("node[0-9]*")):
+        try:
+            nodes[int(path.name[4:])] = parse_cpulist((path / "cpulist").read_text())
+        except (OSError, ValueError):
+            continue
+    if not nodes:
+        nodes[0] = sorted(os.sched_getaffinity(0))
+    return nodes
+
+
+def nodes_of(cpus: Iterable[int], topology: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    topology = node_cpus() if topology is None else topology
+    wanted = set(cpus)
+    return sorted(node for node, members in topology.items() if wanted & set(members))
+
+
+@dataclass(frozen=True)
+class WorkerPlacement:
+    cpus: Tuple[int, ...]
+    mem_node: Optional[int]
+    spec: str
+
+    def as_dict(self, topology: Optional[Dict[int, List[int]]] = None) -> Dict[str, object]:
+        return {
+            "spec": self.spec,
+            "cpus": list(self.cpus),
+            "cpu_nodes": nodes_of(self.cpus, topology),
+            "mem_node": self.mem_node,
+        }
+
+
+def parse_placement(spec: str, topology: Optional[Dict[int, List[int]]] = None) -> WorkerPlacement:
+    """Parse one `CPUS[@NODE]` entry; raises ValueError on bad input."""
+    cpu_part, _, node_part = spec.strip().partition("@")
+    cpu_part = cpu_part.strip()
+    if cpu_part.startswith("node"):
+        topology = node_cpus() if topology is None else topology
+        try:
+            cpus = topology[int(cpu_part[4:])]
+        except (KeyError, ValueError) as exc:
+            raise ValueError(f"unknown NUMA node in placement {spec!r}") from exc
+    else:
+        try:
+            cpus = parse_cpulist(cpu_part)
+        except ValueError as exc:
+            raise ValueError(f"bad CPU list in placement {spec!r}") from exc
+    if not cpus:
+        raise ValueError(f"placement {spec!r} has no CPUs")
+    mem_node: Optional[int] = None
+    if node_part.strip():
+        try:
+            mem_node = int(node_part.strip().removeprefix("node"))
+        except ValueError as exc:
+            raise ValueError(f"bad memory node in placement {spec!r}") from exc
+    return WorkerPlacement(tuple(cpus), mem_node, spec.strip())
+
+
+def pin(cpus: Iterable[int]) -> None:
+    """Restrict the calling process to `cpus` (raises OSError if none are allowed)."""
+    os.sched_setaffinity(0, set(cpus))
+
+
+def _syscall(index: int):
+    numbers = _SYSCALLS.get(platform.machine())
+    if numbers is None:
+        return None
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.syscall.restype = ctypes.c_long
+    return lambda *args: libc.syscall(ctypes.c_long(numbers[index]), *args)
+
+
+def page_range(address: int, length: int) -> Tuple[int, int]:
+    """Widen [address, address + length) to whole pages."""
+    start = address - address % mmap.PAGESIZE
+    end = address + length
+    end += -end % mmap.PAGESIZE
+    return start, end - start
+
+
+def bind_memory(address: int, length: int, node: int) -> Optional[str]:
+    """Bind the pages of a range to `node` before they are touched.
+
+    Returns None on success, else a short reason (unsupported arch, errno).
+    """
+    call = _syscall(0)
+    if call is None:
+        return f"mbind unsupported on {platform.machine()}"
+    start, size = page_range(address, length)
+    words = node // 64 + 1
+    mask = (ctypes.c_ulong * words)()
+    mask[node // 64] = 1 << (node % 64)
+    rc = call(
+        ctypes.c_void_p(start),
+        ctypes.c_ulong(size),
+        ctypes.c_int(MPOL_BIND),
+        mask,
+        ctypes.c_ulong(words * 64 + 1),
+        ctypes.c_uint(MPOL_MF_STRICT),
+    )
+    if rc != 0:
+        return os.strerror(ctypes.get_errno())
+    return None
+
+
+def page_nodes(address: int, length: int, samples: int = 64) -> Dict[int, int]:
+    """Node -> count for up to `samples` evenly spaced resident pages of a range.
+
+    Uses move_pages() in query mode; negative "nodes" are errnos (e.g. -14
+    for a page that is not resident). Empty if the query is unsupported.
+    """
+    call = _syscall(1)
+    if call is None:
+        return {}
+    start, size = page_range(address, length)
+    pages = size // mmap.PAGESIZE
+    if not pages:
+        return {}
+    step = max(1, pages // samples)
+    addrs = [start + idx * mmap.PAGESIZE for idx in range(0, pages, step)][:samples]
+    count = len(addrs)
+    ptrs = (ctypes.c_void_p * count)(*addrs)
+    status = (ctypes.c_int * count)()
+    rc = call(
+        ctypes.c_int(0), ctypes.c_ulong(count), ptrs, ctypes.c_void_p(None), status, ctypes.c_int(0)
+    )
+    if rc != 0:
+        return {}
+    out: Dict[int, int] = {}
+    for node in status:
+        out[node] = out.get(node, 0) + 1
+    return out
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Per-interval time series written by the load generators (`--interval-ms`).
+
+Each writer (one per generator process) appends JSON lines to a shared
+stream file: a header once, then one record per interval
+
+    {"format": "msts-v1", "source": "kv_client", "pid": 123, "interval_ms": 1000}
+    {"pid": 123, "t_unix_ns": ..., "ms": 1000, "ops": 5120, "errors": 0,
+     "partial": false, "hist": {...}}
+
+Interval boundaries are multiples of `interval_ms` since the Unix epoch, so
+records from different processes (and NTP-synced hosts) line up on
+`t_unix_ns` and can be summed. The first and last interval of every writer
+cover only part of the boundary window and are flagged `partial`. `hist` is
+the latency histogram delta for the interval (see `histogram.py`).
+
+Lines are flushed as they are produced, so a crashed run still leaves the
+intervals it completed. Readers skip lines they cannot parse.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .histogram import LatencyHistogram
+
+FORMAT = "msts-v1"
+PathLike = Union[str, Path]
+
+
+def create(path: PathLike) -> Path:
+    """Truncate (or create) the stream file before any writer starts."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(b"")
+    return target
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("time series")
+    group.add_argument(
+        "--interval-ms",
+        type=int,
+        default=0,
+        help="If >0, stream per-interval ops/errors/latency deltas, aligned to wall-clock boundaries",
+    )
+    group.add_argument("--timeseries-file", help="Interval stream path (default: <metrics-file stem>.series.jsonl)")
+    group.add_argument(
+        "--trim-start-s",
+        type=float,
+        default=0.0,
+        help="With --interval-ms: leave this much warmup out of the summary window",
+    )
+    group.add_argument(
+        "--trim-end-s",
+        type=float,
+        default=0.0,
+        help="With --interval-ms: leave this much cooldown out of the summary window",
+    )
+
+
+def resolve_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Fill in the default stream path; clears it when interval mode is off."""
+    if args.interval_ms <= 0:
+        args.timeseries_file = None
+        return
+    if not args.timeseries_file and getattr(args, "metrics_file", None):
+        metrics = Path(args.metrics_file).expanduser()
+        args.timeseries_file = str(metrics.with_name(f"{metrics.stem}.series.jsonl"))
+    if not args.timeseries_file:
+        parser.error("--interval-ms needs --timeseries-file or --metrics-file")
+
+
+class IntervalRecorder:
+    """Emit per-interval deltas of a generator's latency histogram.
+
+    The histogram's count doubles as the operation counter. `errors` is an
+    optional callable returning the generator's running error count.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        interval_ms: int,
+        latency: LatencyHistogram,
+        source: str,
+        errors: Optional[Callable[[], int]] = None,
+    ):
+        self._interval_ns = max(1, int(interval_ms)) * 1_000_000
+        self._latency = latency
+        self._errors = errors
+        self._prev = latency.copy()
+        self._prev_errors = errors() if errors is not None else 0
+        self._pid = os.getpid()
+        self._fd = os.open(Path(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._task: Optional[asyncio.Task] = None
+        now = time.time_ns()
+        self._window_start = now - now % self._interval_ns
+        self._partial = now != self._window_start
+        self._write({"format": FORMAT, "source": source, "pid": self._pid, "interval_ms": int(interval_ms)})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        # One write per line; O_APPEND keeps lines from concurrent writers whole.
+        os.write(self._fd, (json.dumps(record, separators=(",", ":")) + "\n").encode())
+
+    def _emit(self, partial: bool) -> None:
+        current = self._latency.copy()
+        errors = self._errors() if self._errors is not None else 0
+        delta = current.delta(self._prev)
+        self._write(
+            {
+                "pid": self._pid,
+                "t_unix_ns": self._window_start,
+                "ms": self._interval_ns // 1_000_000,
+                "ops": delta.count,
+                "errors": errors - self._prev_errors,
+                "partial": partial,
+                "hist": delta.to_dict(),
+            }
+        )
+        self._prev = current
+        self._prev_errors = errors
+        self._window_start += self._interval_ns
+
+    async def _run(self) -> None:
+        while True:
+            boundary = self._window_start + self._interval_ns
+            delay = boundary - time.time_ns()
+            if delay > 0:
+                await asyncio.sleep(delay / 1e9)
+            self._emit(self._partial)
+            self._partial = False
+
+    def start(self) -> None:
+        """Start ticking on the running event loop."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop ticking and flush the in-progress interval as partial."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._emit(True)
+        os.close(self._fd)
+
+
+def load(*paths: PathLike) -> List[Dict[str, Any]]:
+    """Return interval records merged across writers and files, oldest first.
+
+    Each entry has t_unix_ns, ms, ops, errors, writers, partial (True if any
+    writer covered only part of the interval) and a merged `latency`
+    histogram.
+    """
+    merged: Dict[int, Dict[str, Any]] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                    ts = int(rec["t_unix_ns"])
+                    hist = LatencyHistogram.from_dict(rec["hist"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                slot = merged.get(ts)
+                if slot is None:
+                    merged[ts] = {
+                        "t_unix_ns": ts,
+                        "ms": int(rec.get("ms") or 0),
+                        "ops": int(rec.get("ops") or 0),
+                        "errors": int(rec.get("errors") or 0),
+                        "writers": 1,
+                        "partial": bool(rec.get("partial")),
+                        "latency": hist,
+                    }
+                    continue
+                slot["ops"] += int(rec.get("ops") or 0)
+                slot["errors"] += int(rec.get("errors") or 0)
+                slot["writers"] += 1
+                slot["partial"] = slot["partial"] or bool(rec.get("partial"))
+                slot["latency"].merge(hist)
+    return [merged[ts] for ts in sorted(merged)]
+
+
+@dataclass
+class SteadyState:
+    start_unix_ns: int
+    end_unix_ns: int
+    intervals: int
+    operations: int
+    errors: int
+    latency: LatencyHistogram
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end_unix_ns - self.start_unix_ns) / 1e9
+
+
+def steady_state(
+    intervals: List[Dict[str, Any]], trim_start_s: float = 0.0, trim_end_s: float = 0.0
+) -> Optional[SteadyState]:
+    """Aggregate the complete intervals left after trimming both ends.
+
+    Partial intervals (ramp-up/teardown of any writer) are always dropped;
+    `trim_start_s` / `trim_end_s` additionally cut warmup and cooldown,
+    measured from the first and last complete interval. Returns None if
+    nothing is left.
+    """
+    complete = [rec for rec in intervals if not rec["partial"]]
+    if not complete:
+        return None
+    lo = complete[0]["t_unix_ns"] + int(trim_start_s * 1e9)
+    hi = complete[-1]["t_unix_ns"] + complete[-1]["ms"] * 1_000_000 - int(trim_end_s * 1e9)
+    window = [rec for rec in complete if rec["t_unix_ns"] >= lo and rec["t_unix_ns"] + rec["ms"] * 1_000_000 <= hi]
+    if not window:
+        return None
+    latency = LatencyHistogram()
+    for rec in window:
+        latency.merge(rec["latency"])
+    return SteadyState(
+        start_unix_ns=window[0]["t_unix_ns"],
+        end_unix_ns=window[-1]["t_unix_ns"] + window[-1]["ms"] * 1_000_000,
+        intervals=len(window),
+        operations=sum(rec["ops"] for rec in window),
+        errors=sum(rec["errors"] for rec in window),
+        latency=latency,
+    )
+
+
+def apply_steady_state(
+    summary: Dict[str, Any],
+    steady: Optional[SteadyState],
+    series_file: str,
+    *,
+    ops_key: str = "operations",
+    rate_key: str = "throughput_ops_per_s",
+    latency_key: str = "latency_us",
+    histogram_key: str = "latency_histogram",
+) -> None:
+    """Rebase a generator's end-of-run summary on the steady-state window.
+
+    The whole-run figures move under "full_run"; the headline counters,
+    rate, latency summary and histogram then describe only the window.
+    """
+    summary["timeseries_file"] = series_file
+    if steady is None:
+        summary["steady_state"] = None
+        return
+    summary["full_run"] = {
+        key: summary[key]
+        for key in (ops_key, "duration_s", rate_key, "errors", latency_key)
+        if key in summary
+    }
+    summary["steady_state"] = {
+        "start_unix_ns": steady.start_unix_ns,
+        "end_unix_ns": steady.end_unix_ns,
+        "intervals": steady.intervals,
+    }
+    summary[ops_key] = steady.operations
+    summary["duration_s"] = steady.duration_s
+    summary[rate_key] = steady.operations / steady.duration_s if steady.duration_s else 0.0
+    if "errors" in summary:
+        summary["errors"] = steady.errors
+    if steady.latency.count:
+        summary[latency_key] = steady.latency.summary()
+    summary[histogram_key] = steady.latency.to_dict()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Value-size distributions for KV SETs and dataset prefill.
+
+Spec strings:
+
+    fixed[:N]                every value is N bytes (default: the caller's size)
+    uniform:MIN:MAX          uniform integer sizes in [MIN, MAX]
+    lognormal:MEDIAN:SIGMA   log-normal around MEDIAN bytes
+    pareto:MIN:ALPHA         heavy tail starting at MIN (memcached ETC-style)
+
+Samples are clipped to [1, max_size]. A table of sizes is drawn once up
+front and `next()` cycles through it, so the per-request cost is an index
+increment and runs with the same seed see the same sizes.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from array import array
+from typing import List, Optional
+
+KINDS = ("fixed", "uniform", "lognormal", "pareto")
+DEFAULT_TABLE_SIZE = 1 << 14
+
+
+def _parse(spec: str, default_size: int) -> List:
+    parts = spec.split(":")
+    kind = parts[0].strip().lower()
+    if kind not in KINDS:
+        raise ValueError(f"unknown value-size distribution {spec!r} (expected one of {', '.join(KINDS)})")
+    try:
+        params = [float(p) for p in parts[1:]]
+    except ValueError as exc:
+        raise ValueError(f"bad value-size parameters in {spec!r}") from exc
+    if not all(math.isfinite(p) for p in params):
+        raise ValueError(f"bad value-size parameters in {spec!r}")
+    if kind == "fixed":
+        if len(params) > 1:
+            raise ValueError(f"fixed value sizes take at most one parameter, got {spec!r}")
+        size = params[0] if params else float(default_size)
+        if size < 1:
+            raise ValueError(f"fixed value size must be >= 1 in {spec!r}")
+        return [kind, size]
+    if len(params) != 2:
+        raise ValueError(f"{kind} value sizes need two parameters, got {spec!r}")
+    first, second = params
+    if kind == "uniform" and not 1 <= first <= second:
+        raise ValueError(f"uniform value sizes need 1 <= MIN <= MAX, got {spec!r}")
+    if kind == "lognormal" and not (first > 0 and second >= 0):
+        raise ValueError(f"lognormal value sizes need MEDIAN > 0 and SIGMA >= 0, got {spec!r}")
+    if kind == "pareto" and not (first >= 1 and second > 0):
+        raise ValueError(f"pareto value sizes need MIN >= 1 and ALPHA > 0, got {spec!r}")
+    return [kind, *params]
+
+
+class ValueSizes:
+    def __init__(
+        self,
+        spec: Optional[str],
+        default_size: int,
+        max_size: int = 1 << 20,
+        seed: Optional[int] = None,
+        table_size: int = DEFAULT_TABLE_SIZE,
+    ):
+        self.spec = spec or "fixed"
+        kind, *params = _parse(self.spec, default_size)
+        self.kind = kind
+        rng = random.Random(seed)
+        if kind == "fixed":
+            draw = lambda: params[0]  # noqa: E731
+            table_size = 1
+        elif kind == "uniform":
+            lo, hi = int(params[0]), int(params[1])
+            draw = lambda: rng.randint(lo, hi)  # noqa: E731
+        elif kind == "lognormal":
+            mu, sigma = math.log(params[0]), params[1]
+            draw = lambda: rng.lognormvariate(mu, sigma)  # noqa: E731
+        else:
+            low, alpha = params
+            draw = lambda: low * rng.paretovariate(alpha)  # noqa: E731
+        self._table = array("I", (min(max_size, max(1, int(draw()))) for _ in range(max(1, table_size))))
+        self._idx = 0
+        self.max = max(self._table)
+        self.mean = sum(self._table) / len(self._table)
+
+    @property
+    def fixed(self) -> bool:
+        return len(self._table) == 1
+
+    def next(self) -> int:
+        idx = self._idx
+        self._idx = idx + 1 if idx + 1 < len(self._table) else 0
+        return self._table[idx]
+
+    def distinct(self) -> List[int]:
+        """Every size `next()` can return, ascending."""
+        return sorted(set(self._table))
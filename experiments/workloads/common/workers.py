@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Fork-based multi-process serving for the builtin workload servers.
+
+Each worker binds its own listening socket with SO_REUSEPORT so the kernel
+spreads incoming connections across processes. The parent only supervises:
+it forwards SIGTERM/SIGINT to the workers and exits once they are gone, which
+keeps `managed_process` teardown in the runner working unchanged.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import signal
+import sys
+from typing import Callable, List
+
+PR_SET_PDEATHSIG = 1
+
+
+def _die_with_parent() -> None:
+    # Best-effort: if the supervisor is SIGKILLed, don't leave workers holding the port.
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM, 0, 0, 0)
+    except Exception:
+        pass
+
+
+def run_workers(count: int, worker_main: Callable[[int], None], name: str = "worker") -> int:
+    """Run `worker_main(idx)` in `count` forked processes and wait for them.
+
+    With `count <= 1` the worker runs in-process and no fork happens. Returns
+    the exit code the supervisor should use (non-zero if any worker failed).
+    """
+    if count <= 1:
+        worker_main(0)
+        return 0
+
+    children: List[int] = []
+    for idx in range(count):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                _die_with_parent()
+                worker_main(idx)
+            except KeyboardInterrupt:
+                pass
+            except BaseException as exc:  # noqa: BLE001 - report and exit the child
+                print(f"[{name}-{idx}] fatal: {type(exc).__name__}: {exc}", file=sys.stderr, flush=True)
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children.append(pid)
+
+    def _forward(signum, _frame):
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+    print(f"[{name}] supervising {count} workers: {children}", flush=True)
+
+    exit_code = 0
+    alive = set(children)
+    while alive:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        alive.discard(pid)
+        code = os.waitstatus_to_exitcode(status)
+        if code not in (0, -signal.SIGTERM, -signal.SIGINT):
+            # One worker died unexpectedly: fail the whole server so the runner notices.
+            print(f"[{name}] worker pid={pid} exited with {code}; stopping remaining workers", flush=True)
+            exit_code = 1
+            _forward(signal.SIGTERM, None)
+    return exit_code
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Zipf key sampling by inverse-CDF binary search over a precomputed table.
+
+Rank r in [1, n] is drawn with probability proportional to 1 / r**theta and
+mapped to key id r - 1, so key 0 is the hottest. The CDF is built once per
+(n, theta) and shared by every sampler in the process; each sampler has its
+own seeded `random.Random`, so a seed yields the same key sequence with or
+without NumPy. NumPy, when installed, only builds the table and vectorises
+the CDF search.
+"""
+
+from __future__ import annotations
+
+import random
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Iterator, List, Optional
+
+try:  # optional: vectorized table build and CDF search
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised on hosts without numpy
+    np = None
+
+DEFAULT_BATCH = 4096
+
+
+@lru_cache(maxsize=8)
+def zipf_cdf(n: int, theta: float):
+    """Unnormalized cumulative weights for ranks 1..n (last element is the total)."""
+    if n <= 0:
+        raise ValueError("zipf key space must be positive")
+    if np is not None:
+        return np.cumsum(np.arange(1, n + 1, dtype=np.float64) ** -theta)
+    return array("d", accumulate(rank ** -theta for rank in range(1, n + 1)))
+
+
+class ZipfSampler:
+    def __init__(self, n: int, theta: float, seed: Optional[int] = None, batch: int = DEFAULT_BATCH):
+        self._n = n
+        self._cdf = zipf_cdf(n, float(theta))
+        self._total = float(self._cdf[-1])
+        self._batch = max(1, batch)
+        self._rng = random.Random(seed)
+
+    def batch(self, count: int) -> List[int]:
+        """Return `count` key ids in [0, n)."""
+        if np is not None:
+            rnd = self._rng.random
+            u = np.fromiter((rnd() for _ in range(count)), dtype=np.float64, count=count) * self._total
+            idx = np.searchsorted(self._cdf, u, side="right")
+            return np.minimum(idx, self._n - 1).tolist()
+        cdf, total, last, rnd = self._cdf, self._total, self._n - 1, self._rng.random
+        return [min(bisect_right(cdf, rnd() * total), last) for _ in range(count)]
+
+    def sample(self) -> int:
+        return self.batch(1)[0]
+
+    def __iter__(self) -> Iterator[int]:
+        while True:
+            yield from self.batch(self._batch)
@@ -2,69 +2,150 @@
 import argparse
 import asyncio
 import json
+import multiprocessing
+import queue
 import random
-import statistics
+import sys
 import time
+from collections import deque
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Deque, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import annotations as ann  # noqa: E402
+from common import arrivals  # noqa: E402
+from common import timeseries  # noqa: E402
+from common.histogram import LatencyHistogram  # noqa: E402
+from common.value_sizes import ValueSizes  # noqa: E402
+from common.zipf import ZipfSampler  # noqa: E402
 
-def _percentile(values, pct):
-    if not values:
-        return 0.0
-    ordered = sorted(values)
-    idx = int(round((pct / 100.0) * (len(ordered) - 1)))
-    idx = max(0, min(len(ordered) - 1, idx))
-    return ordered[idx]
+OP_GET = ann.OP_CODES["GET"]
+OP_SET = ann.OP_CODES["SET"]
+# Lines that terminate a memcached `get` response.
+MC_END_LINES = (b"END", b"ERROR", b"CLIENT_ERROR", b"SERVER_ERROR")
+
+
+async def _read_mc_values(reader: asyncio.StreamReader) -> int:
+    """Consume one memcached `get` response (VALUE blocks up to END); return hits.
+
+    An ERROR/CLIENT_ERROR/SERVER_ERROR line is the whole response (no END
+    follows), so it ends the read and leaves later pipelined replies aligned.
+    """
+    hits = 0
+    while True:
+        line = await reader.readline()
+        if not line or line.startswith(MC_END_LINES):
+            return hits
+        parts = line.split()
+        if parts and parts[0] == b"VALUE" and len(parts) >= 4:
+            await reader.readexactly(int(parts[3]) + 2)
+            hits += 1
+
+
+class RequestTemplates:
+    """Pre-encoded request fragments shared by all connections.
+
+    A request is assembled as `[head, key, tail]` and handed to `writelines`,
+    so no per-op string formatting or encoding happens in the send path.
+    With a variable SET size distribution, `set_parts` builds the value from
+    a cached per-size header and a slice of one shared blob instead.
+    """
+
+    def __init__(self, key_space: int, value_size: int, protocol: str, set_sizes: Optional[ValueSizes] = None):
+        self.keys = [b"k%d" % key_id for key_id in range(key_space)]
+        if set_sizes is not None and set_sizes.fixed:
+            value_size, set_sizes = set_sizes.max, None
+        self.set_sizes = set_sizes
+        value_blob = b"y" * value_size
+        if protocol == "memcache_text":
+            self.get_head, self.get_tail = b"get ", b"\r\n"
+            self.set_head = b"set "
+            self.set_tail = b" 0 0 %d\r\n" % value_size + value_blob + b"\r\n"
+            size_header, self._set_trailer = b" 0 0 %d\r\n", b"\r\n"
+        else:
+            self.get_head, self.get_tail = b"GET ", b"\n"
+            self.set_head = b"SET "
+            self.set_tail = b" %d\n" % value_size + value_blob + b"\n"
+            size_header, self._set_trailer = b" %d\n", b"\n"
+        if set_sizes is not None:
+            self._size_headers = {size: size_header % size for size in set_sizes.distinct()}
+            self._set_blob = memoryview(b"y" * set_sizes.max)
+
+    def set_parts(self, key: bytes) -> Tuple[bytes, ...]:
+        if self.set_sizes is None:
+            return (self.set_head, key, self.set_tail)
+        size = self.set_sizes.next()
+        return (self.set_head, key, self._size_headers[size], self._set_blob[:size], self._set_trailer)
 
 
 async def send_loop(
-    host: str,
-    port: int,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
     conn_id: int,
     args,
-    latency_hist,
-    op_counter,
-    annotations: Optional[List[dict]],
+    templates: RequestTemplates,
+    latency_hist: LatencyHistogram,
+    annotate: Optional[Callable[[int, int, int, int, int], None]],
+    scheduler: Optional[arrivals.OpenLoopScheduler] = None,
 ):
-    reader, writer = await asyncio.open_connection(host, port)
+    """Issue requests on one connection until cancelled.
+
+    Closed loop keeps `--pipeline-depth` requests outstanding. Open loop
+    (`scheduler` set) sends one request per arrival pulled from the shared
+    scheduler, one at a time, and measures latency from the arrival's
+    intended send time rather than from when the connection got to it.
+    """
     random.seed(conn_id)
-    value_blob = b"y" * args.value_size
     key_range = range(args.key_space)
+    if args.key_distribution == "zipf":
+        next_key = iter(ZipfSampler(args.key_space, args.zipf_theta, seed=conn_id)).__next__
+    else:
+        next_key = lambda: random.choice(key_range)  # noqa: E731
+    keys = templates.keys
+    memcache = args.protocol == "memcache_text"
+    multiget = max(1, args.multiget)
+    depth = max(1, args.pipeline_depth) if scheduler is None else 1
+    # (op, key, start_ns, latency_origin_ns) per outstanding request; replies
+    # arrive in send order.
+    inflight: Deque[Tuple[int, int, int, int]] = deque()
 
     while True:
-        op = "GET" if random.random() < args.get_ratio else "SET"
-        key = random.choice(key_range)
-        cmd = f"{op} k{key}"
-        if op == "SET":
-            cmd += f" {len(value_blob)}"
-        cmd += "\n"
-        start = time.monotonic_ns()
-        writer.write(cmd.encode())
+        while len(inflight) < depth:
+            intended = await scheduler.next() if scheduler is not None else 0
+            key = next_key()
+            if random.random() < args.get_ratio:
+                op = OP_GET
+                if memcache and multiget > 1:
+                    parts = [templates.get_head, keys[key]]
+                    for _ in range(multiget - 1):
+                        parts.append(b" ")
+                        parts.append(keys[next_key()])
+                    parts.append(templates.get_tail)
+                else:
+                    parts = (templates.get_head, keys[key], templates.get_tail)
+            else:
+                op = OP_SET
+                parts = templates.set_parts(keys[key])
+            start = time.monotonic_ns()
+            if scheduler is not None:
+                scheduler.sent(intended, start)
+            inflight.append((op, key, start, intended or start))
+            writer.writelines(parts)
         await writer.drain()
-        if op == "SET":
-            writer.write(value_blob)
-            writer.write(b"\n")
-            await writer.drain()
-            await reader.readline()
+
+        op, key, start, origin = inflight[0]
+        if op == OP_GET and memcache:
+            await _read_mc_values(reader)
         else:
             await reader.readline()
         end = time.monotonic_ns()
-        latency_hist.append((end - start) / 1e3)
-        op_counter.append(1)
-        if annotations is not None:
-            annotations.append(
-                {
-                    "connection": conn_id,
-                    "op": op,
-                    "key": key,
-                    "start_ns": start,
-                    "end_ns": end,
-                }
-            )
+        inflight.popleft()
+        latency_hist.record(end - origin)
+        if annotate is not None:
+            annotate(conn_id, op, key, start, end)
 
 
-async def main():
+def parse_args():
     parser = argparse.ArgumentParser(description="KV load generator")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=7000)
@@ -72,52 +153,213 @@ async def main():
     parser.add_argument("--duration", type=int, default=60)
     parser.add_argument("--get-ratio", type=float, default=0.95)
     parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument(
+        "--set-value-size-dist",
+        help="SET value sizes: fixed[:N], uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or pareto:MIN:ALPHA "
+        "(default: fixed --value-size)",
+    )
     parser.add_argument("--key-space", type=int, default=1_000_000)
+    parser.add_argument("--key-distribution", choices=["uniform", "zipf"], default="uniform")
+    parser.add_argument("--zipf-theta", type=float, default=1.0)
+    parser.add_argument(
+        "--protocol",
+        choices=["legacy", "memcache_text"],
+        default="legacy",
+        help="legacy: builtin GET/SET lines; memcache_text: memcached ASCII protocol (builtin server or memcached)",
+    )
+    parser.add_argument(
+        "--multiget",
+        type=int,
+        default=1,
+        help="memcache_text only: keys per GET request, served in one response",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=1,
+        help="Requests kept outstanding per connection (replies are matched FIFO); requires --protocol memcache_text",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Fork this many client processes; connections are split across them and start on a shared barrier",
+    )
     parser.add_argument("--metrics-file", help="Optional JSON metrics output path")
-    parser.add_argument("--annotations-file", help="Optional JSON timeline for per-connection operations")
+    parser.add_argument(
+        "--annotations-file",
+        help="Optional per-operation timeline, streamed as fixed-size binary records (see common/annotations.py)",
+    )
+    arrivals.add_arguments(parser, rate_help="open-loop: total requests/s across all connections and processes")
+    timeseries.add_arguments(parser)
     args = parser.parse_args()
+    if args.pipeline_depth > 1 and args.protocol == "legacy":
+        # Legacy GET replies are raw values ended by a newline the value may
+        # itself contain, so only one outstanding reply can be framed safely.
+        parser.error("--pipeline-depth > 1 requires --protocol memcache_text")
+    if args.set_value_size_dist:
+        try:
+            ValueSizes(args.set_value_size_dist, args.value_size, table_size=1)
+        except ValueError as exc:
+            parser.error(str(exc))
+    arrivals.resolve_arguments(parser, args)
+    timeseries.resolve_arguments(parser, args)
+    return args
+
+
+BARRIER_TIMEOUT_S = 30.0
 
-    latency_hist = []
-    op_counter: list[int] = []
-    annotation_buffers: Optional[List[List[dict]]] = None
-    if args.annotations_file:
-        annotation_buffers = [[] for _ in range(args.connections)]
 
+async def run_connections(args, conn_ids: List[int], barrier=None, share: Tuple[int, int] = (0, 1)):
+    """Drive `conn_ids` for exactly `args.duration` seconds.
+
+    Connections are established before the (optional) cross-process barrier,
+    so every process's measurement window starts at the same moment.
+    Annotations are appended to `args.annotations_file`, which must already
+    hold a header (see `annotations.create`). In open-loop mode this process
+    schedules its `share = (index, count)` of `args.rate`. Returns the
+    latency histogram (its count is the number of completed operations) and
+    the open-loop scheduler stats, or None in closed-loop mode.
+    """
+    latency_hist = LatencyHistogram()
+
+    set_sizes = None
+    if args.set_value_size_dist:
+        set_sizes = ValueSizes(args.set_value_size_dist, args.value_size, seed=share[0])
+    templates = RequestTemplates(args.key_space, args.value_size, args.protocol, set_sizes)
+    conns = await asyncio.gather(*(asyncio.open_connection(args.host, args.port) for _ in conn_ids))
+    if barrier is not None:
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait, BARRIER_TIMEOUT_S)
+
+    recorder = ann.AnnotationWriter(args.annotations_file) if args.annotations_file else None
+    scheduler = None
+    if args.load_shape == "open-loop":
+        index, count = share
+        scheduler = arrivals.OpenLoopScheduler(
+            args.rate / count, args.arrivals, seed=index, phase=index / count, max_backlog=args.max_backlog
+        )
+        scheduler.start()
+    series = None
+    if args.timeseries_file:
+        series = timeseries.IntervalRecorder(args.timeseries_file, args.interval_ms, latency_hist, "kv_client")
+        series.start()
     tasks = [
         asyncio.create_task(
             send_loop(
-                args.host,
-                args.port,
-                i,
+                reader,
+                writer,
+                conn_id,
                 args,
+                templates,
                 latency_hist,
-                op_counter,
-                annotation_buffers[i] if annotation_buffers is not None else None,
+                recorder.record if recorder is not None else None,
+                scheduler,
             )
         )
-        for i in range(args.connections)
+        for conn_id, (reader, writer) in zip(conn_ids, conns)
     ]
 
-    await asyncio.sleep(args.duration)
-    for t in tasks:
-        t.cancel()
     try:
-        await asyncio.gather(*tasks)
-    except asyncio.CancelledError:
-        pass
+        await asyncio.sleep(args.duration)
+        for t in tasks:
+            t.cancel()
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            pass
+    finally:
+        if scheduler is not None:
+            await scheduler.stop()
+        if series is not None:
+            await series.stop()
+        if recorder is not None:
+            recorder.close()
+    return latency_hist, scheduler.stats() if scheduler is not None else None
+
+
+def _process_main(args, conn_ids: List[int], barrier, share: Tuple[int, int], results) -> None:
+    try:
+        latency_hist, load_stats = asyncio.run(run_connections(args, conn_ids, barrier, share))
+    except BaseException as exc:
+        # Release the siblings instead of letting them wait out the barrier timeout.
+        barrier.abort()
+        results.put({"error": f"{type(exc).__name__}: {exc}"})
+        return
+    results.put({"latency_histogram": latency_hist.to_dict(), "open_loop": load_stats})
+
+
+def run_processes(args):
+    """Fork `args.processes` workers behind one start barrier and merge their results.
 
+    Returns (merged histogram, merged open-loop stats, processes used); at most
+    one process per connection is forked.
+    """
+    ctx = multiprocessing.get_context("fork")
+    count = max(1, min(args.processes, args.connections))
+    barrier = ctx.Barrier(count)
+    results = ctx.Queue()
+    procs = []
+    for idx in range(count):
+        conn_ids = list(range(idx, args.connections, count))
+        proc = ctx.Process(
+            target=_process_main, args=(args, conn_ids, barrier, (idx, count), results), daemon=True
+        )
+        proc.start()
+        procs.append(proc)
+
+    merged = LatencyHistogram()
+    load_stats = []
+    errors = []
+    deadline = time.monotonic() + args.duration + BARRIER_TIMEOUT_S + 30.0
+    for _ in procs:
+        try:
+            part = results.get(timeout=max(1.0, deadline - time.monotonic()))
+        except queue.Empty:
+            errors.append("timed out waiting for worker results")
+            break
+        if "error" in part:
+            errors.append(part["error"])
+            continue
+        merged.merge(LatencyHistogram.from_dict(part["latency_histogram"]))
+        load_stats.append(part["open_loop"])
+    for proc in procs:
+        proc.join(timeout=5.0)
+    if errors:
+        raise SystemExit(f"kv_client: {len(errors)} worker process(es) failed: {errors[0]}")
+    return merged, arrivals.merge_stats(load_stats) or None, count
+
+
+def main():
+    args = parse_args()
+    if args.annotations_file:
+        # Header is written once here; workers (forked or not) only append records.
+        ann.create(args.annotations_file)
+    if args.timeseries_file:
+        timeseries.create(args.timeseries_file)
+    if args.processes > 1:
+        latency_hist, load_stats, processes = run_processes(args)
+    else:
+        processes = 1
+        latency_hist, load_stats = asyncio.run(
+            run_connections(args, list(range(args.connections)))
+        )
+
+    total_ops = latency_hist.count
     summary = {}
-    total_ops = len(op_counter)
-    if latency_hist:
-        summary["latency_us"] = {
-            "p50": statistics.median(latency_hist),
-            "p95": _percentile(latency_hist, 95),
-            "p99": _percentile(latency_hist, 99),
-        }
+    if total_ops:
+        summary["latency_us"] = latency_hist.summary()
     if total_ops and args.duration:
         summary["throughput_ops_per_s"] = total_ops / args.duration
     summary["operations"] = total_ops
     summary["duration_s"] = args.duration
+    summary["processes"] = processes
+    summary["load_shape"] = args.load_shape
+    if load_stats:
+        summary["open_loop"] = load_stats
+    summary["latency_histogram"] = latency_hist.to_dict()
+    if args.timeseries_file:
+        steady = timeseries.steady_state(timeseries.load(args.timeseries_file), args.trim_start_s, args.trim_end_s)
+        timeseries.apply_steady_state(summary, steady, args.timeseries_file)
     if args.metrics_file:
         # Ensure parent directory exists and expand user (~) before writing.
         metrics_path = Path(args.metrics_file).expanduser()
@@ -127,17 +369,7 @@ async def main():
         metrics_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
     else:
         print(json.dumps(summary, indent=2))
-    if args.annotations_file and annotation_buffers is not None:
-        payload = [
-            {"connection": idx, "events": buf}
-            for idx, buf in enumerate(annotation_buffers)
-            if buf
-        ]
-        annotations_path = Path(args.annotations_file).expanduser()
-        annotations_path.parent.mkdir(parents=True, exist_ok=True)
-        if not annotations_path.exists():
-            annotations_path.touch()
-        annotations_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,109 +1,1141 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import bisect
+import ctypes
 import json
+import mmap
+import multiprocessing
 import os
 import random
 import string
+import sys
 import time
+from array import array
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import access_trace  # noqa: E402
+from common import placement as numa  # noqa: E402
+from common.data_objects import buffer_address, publish  # noqa: E402
+from common.value_sizes import ValueSizes  # noqa: E402
+from common.workers import run_workers  # noqa: E402
 
 DEFAULT_VALUE = b"x" * 256
+MC_VERSION = b"VERSION 1.6.0-microsentinel\r\n"
+MC_NOT_STORED = b"SERVER_ERROR out of memory storing object\r\n"
+LEGACY_NOT_STORED = b"SERVER_ERROR out of memory\n"
+MC_BAD_CHUNK = b"CLIENT_ERROR bad data chunk\r\n"
+OP_GET = access_trace.OP_CODES["GET"]
+OP_SET = access_trace.OP_CODES["SET"]
+PLACEMENT_TIMEOUT_S = 300.0
+
+
+def _key_id(key: bytes, key_space: int) -> int:
+    """Numeric id of a `k<id>` key within the key space, else -1."""
+    if key[:1] != b"k":
+        return -1
+    try:
+        key_id = int(key[1:])
+    except ValueError:
+        return -1
+    return key_id if 0 <= key_id < key_space else -1
+
+
+_FILL_BLOCK = 1 << 20
+
+
+def _fill_random(view: memoryview, seed: Optional[int]) -> None:
+    # Seed one random block, then double it across the buffer with memcpy-speed
+    # slice copies; value contents only need to be non-trivial, not unique.
+    total = len(view)
+    block = min(total, _FILL_BLOCK)
+    view[:block] = os.urandom(block) if seed is None else random.Random(seed).randbytes(block)
+    filled = block
+    while filled < total:
+        chunk = min(filled, total - filled)
+        view[filled : filled + chunk] = view[:chunk]
+        filled += chunk
 
 
 class KVStore:
     def __init__(self, key_space: int, value_size: int):
         self._value_size = value_size
+        self._key_space = key_space
         self._store: Dict[bytes, bytes] = {}
         for key_id in range(key_space):
             key = f"k{key_id}".encode()
             self._store[key] = os.urandom(value_size)
 
+    def lookup(self, key: bytes) -> Optional[bytes]:
+        return self._store.get(key)
+
     def get(self, key: bytes) -> bytes:
         return self._store.get(key, DEFAULT_VALUE)
 
-    def set(self, key: bytes, value: bytes) -> None:
+    def set(self, key: bytes, value: bytes) -> bool:
         self._store[key] = value
+        return True
 
+    def trace_target(self, key: bytes) -> Tuple[int, int]:
+        """(key id, payload address) for the access trace; 0 if the key is absent."""
+        value = self._store.get(key)
+        return _key_id(key, self._key_space), buffer_address(value) if value is not None else 0
 
-def _zipf_key(key_space: int, theta: float) -> int:
-    # simple rejection sampler for reproducible hot keys
-    while True:
-        rank = random.randint(1, key_space)
-        prob = 1 / (rank ** theta)
-        if random.random() < prob:
-            return rank
+    def truth_objects(self, limit: int) -> Iterator[Tuple[str, int, int]]:
+        for idx, (key, value) in enumerate(self._store.items()):
+            if idx >= limit:
+                break
+            yield key.decode(), buffer_address(value), len(value)
+
+    def data_regions(self) -> List[Tuple[str, int, int]]:
+        # One bytes object per key: there is no contiguous range worth
+        # registering. Use the slab store for data-object attribution.
+        return []
+
+    def stats(self, slabs: bool = False) -> Dict[str, int]:
+        if slabs:
+            return {}
+        return {"curr_items": len(self._store), "bytes": sum(len(v) for v in self._store.values())}
+
+
+class SlabKVStore:
+    """Fixed-slot value slab: key `k<id>` lives at offset `id * value_size`.
+
+    All values share one private mmap, so the dataset costs one allocation
+    instead of one bytes object per key and is shared copy-on-write across
+    forked workers: a SET only changes the slab of the worker that handled
+    it. `lookup` returns a memoryview into the slab (no copy); the server
+    copies it into the reply, since a later SET may overwrite the slot. Keys that don't
+    parse as `k<id>` within the key space, or values larger than a slot, spill
+    into a small overflow dict.
+
+    With `cache_dir`, the slab is written once to
+    `kv_<key_space>_<value_size>_<seed>.slab` and later starts map that file
+    privately (MAP_PRIVATE): startup is a page-table setup, every run sees the
+    same bytes, and SETs never reach the file. `prefault` rewrites one byte per
+    page so each page gets a private copy right away, allocated under the
+    process's memory policy (e.g. the `numactl --membind` prefix).
+
+    With `fill=False` the in-memory slab is left untouched so that forked
+    workers can place and first-touch their own shards (`shard`,
+    `fill_shard`). The slab and the per-key lengths are then MAP_SHARED, so
+    every worker reads, and SETs into, the same pages. Like memcached without
+    its item locks, a GET racing a SET to the same key in another worker may
+    see a torn value; the overflow dict stays per-process.
+    """
+
+    def __init__(
+        self,
+        key_space: int,
+        value_size: int,
+        seed: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        prefault: bool = False,
+        fill: bool = True,
+    ):
+        self._value_size = value_size
+        self._key_space = key_space
+        self._seed = seed
+        size = max(1, key_space * value_size)
+        self.cache_path: Optional[Path] = None
+        if cache_dir:
+            self.cache_path = self._ensure_cached(Path(cache_dir), size)
+            with self.cache_path.open("rb") as f:
+                self._slab = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY)
+            self._view = memoryview(self._slab)
+        else:
+            self._slab = mmap.mmap(-1, size, flags=mmap.MAP_PRIVATE if fill else mmap.MAP_SHARED)
+            self._view = memoryview(self._slab)
+            if fill:
+                _fill_random(self._view, self._seed)
+        if prefault:
+            self._prefault()
+        lengths = array("I", [value_size]) * key_space
+        if fill or cache_dir:
+            self._lengths = lengths
+        else:
+            # Shared with the slab, so a SET's length travels with its bytes.
+            self._lengths_map = mmap.mmap(-1, max(1, len(lengths) * lengths.itemsize), flags=mmap.MAP_SHARED)
+            self._lengths = memoryview(self._lengths_map).cast("I")[:key_space]
+            self._lengths[:] = lengths
+        self._overflow: Dict[bytes, bytes] = {}
+        self._base = self.base_address()
+
+    def _ensure_cached(self, cache_dir: Path, size: int) -> Path:
+        seed = 0 if self._seed is None else self._seed
+        self._seed = seed
+        path = cache_dir / f"kv_{self._key_space}_{self._value_size}_{seed}.slab"
+        if path.exists() and path.stat().st_size == size:
+            return path
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Build under a private name and rename so concurrent starts never map
+        # a half-written snapshot.
+        tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        with tmp.open("w+b") as f:
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as mm:
+                view = memoryview(mm)
+                _fill_random(view, self._seed)
+                view.release()
+                mm.flush()
+        os.replace(tmp, path)
+        return path
+
+    def _prefault(self) -> None:
+        view = self._view
+        for off in range(0, len(view), mmap.PAGESIZE):
+            view[off] = view[off]
+
+    def _slot(self, key: bytes) -> int:
+        return _key_id(key, self._key_space)
+
+    def shard(self, idx: int, count: int) -> Tuple[int, int, int, int]:
+        """(first key, end key, byte offset, byte length) of shard `idx` of `count`.
+
+        Shard boundaries are rounded down to pages so each page belongs to
+        exactly one shard; a key straddling a boundary goes with its first byte.
+        """
+        total = len(self._slab)
+
+        def boundary(i: int) -> int:
+            if i >= count:
+                return total
+            off = total * i // count
+            return off - off % mmap.PAGESIZE
+
+        start, end = boundary(idx), boundary(idx + 1)
+        first_key = -(-start // self._value_size)
+        end_key = min(self._key_space, -(-end // self._value_size))
+        return first_key, end_key, start, end - start
+
+    def fill_shard(self, offset: int, length: int) -> None:
+        _fill_random(self._view[offset : offset + length], self._seed)
+
+    def base_address(self) -> int:
+        return ctypes.addressof(ctypes.c_char.from_buffer(self._slab))
+
+    def lookup(self, key: bytes):
+        slot = self._slot(key)
+        if slot < 0 or (self._overflow and key in self._overflow):
+            return self._overflow.get(key)
+        off = slot * self._value_size
+        return self._view[off : off + self._lengths[slot]]
+
+    def get(self, key: bytes):
+        value = self.lookup(key)
+        return DEFAULT_VALUE if value is None else value
+
+    def set(self, key: bytes, value: bytes) -> bool:
+        slot = self._slot(key)
+        size = len(value)
+        if slot < 0 or size > self._value_size:
+            self._overflow[key] = bytes(value)
+            return True
+        if self._overflow:
+            self._overflow.pop(key, None)
+        off = slot * self._value_size
+        self._view[off : off + size] = value
+        self._lengths[slot] = size
+        return True
+
+    def trace_target(self, key: bytes) -> Tuple[int, int]:
+        slot = self._slot(key)
+        if slot < 0 or (self._overflow and key in self._overflow):
+            value = self._overflow.get(key)
+            return slot, buffer_address(value) if value is not None else 0
+        return slot, self._base + slot * self._value_size
+
+    def truth_objects(self, limit: int) -> Iterator[Tuple[str, int, int]]:
+        base = self._base
+        for slot in range(min(limit, self._key_space)):
+            yield f"k{slot}", base + slot * self._value_size, self._lengths[slot]
+
+    def _lengths_address(self) -> int:
+        if isinstance(self._lengths, array):
+            return buffer_address(self._lengths)
+        return buffer_address(self._lengths_map)
+
+    def data_regions(self) -> List[Tuple[str, int, int]]:
+        return [
+            ("kv_value_slab", self._base, self._key_space * self._value_size),
+            ("kv_value_lengths", self._lengths_address(), len(self._lengths) * self._lengths.itemsize),
+        ]
+
+    def stats(self, slabs: bool = False) -> Dict[str, int]:
+        if slabs:
+            return {}
+        return {
+            "curr_items": self._key_space + len(self._overflow),
+            "bytes": sum(self._lengths) + sum(len(v) for v in self._overflow.values()),
+            "limit_maxbytes": len(self._slab),
+        }
+
+
+_FREE_CHUNK = -1
+_OTHER_KEY = -2
+
+
+class _SlabClass:
+    """Chunk bookkeeping for one slab class, kept in flat arrays indexed by chunk.
+
+    `owner` is the key id stored in a chunk, _OTHER_KEY for a key outside
+    the `k<id>` space, or _FREE_CHUNK. `prev`/`next` link the class LRU list
+    (head is the most recently used chunk); `ref` is the CLOCK reference bit.
+    """
+
+    __slots__ = (
+        "idx", "size", "per_page", "pages", "owner", "lengths", "ref",
+        "prev", "next", "head", "tail", "free", "hand", "items",
+    )
+
+    def __init__(self, idx: int, size: int, page_size: int):
+        self.idx = idx
+        self.size = size
+        self.per_page = page_size // size
+        self.pages = array("I")
+        self.owner = array("q")
+        self.lengths = array("I")
+        self.ref = bytearray()
+        self.prev = array("i")
+        self.next = array("i")
+        self.head = -1
+        self.tail = -1
+        self.free = array("I")
+        self.hand = 0
+        self.items = 0
+
+    def add_page(self, page: int) -> None:
+        first = len(self.owner)
+        n = self.per_page
+        self.pages.append(page)
+        self.owner.extend(array("q", [_FREE_CHUNK]) * n)
+        self.lengths.extend(array("I", [0]) * n)
+        self.ref.extend(bytes(n))
+        self.prev.extend(array("i", [-1]) * n)
+        self.next.extend(array("i", [-1]) * n)
+        # Reversed so chunks are handed out in address order.
+        self.free.extend(range(first + n - 1, first - 1, -1))
+
+    def link(self, chunk: int) -> None:
+        self.prev[chunk] = -1
+        self.next[chunk] = self.head
+        if self.head >= 0:
+            self.prev[self.head] = chunk
+        else:
+            self.tail = chunk
+        self.head = chunk
+
+    def unlink(self, chunk: int) -> None:
+        prev, nxt = self.prev[chunk], self.next[chunk]
+        if prev >= 0:
+            self.next[prev] = nxt
+        else:
+            self.head = nxt
+        if nxt >= 0:
+            self.prev[nxt] = prev
+        else:
+            self.tail = prev
+
+
+class CappedKVStore:
+    """Memory-capped store with memcached-style slab classes and eviction.
+
+    Values live in one anonymous mmap of `memory_limit` bytes, carved into
+    1 MiB pages. Chunk sizes start at 64 bytes and grow by `growth_factor`
+    up to the page size; a page is assigned to the class that first needs
+    it. A SET takes a chunk from its class's free list, then a fresh page,
+    and once memory is exhausted evicts within the class: CLOCK (a reference
+    bit per chunk, swept by a hand) or LRU (a doubly linked list bumped on
+    every hit). A class left with nothing to evict takes the last page of
+    the class holding the most pages (if it has more than one), evicting
+    what was on it. That is the only rebalancing; memcached's automover
+    also moves pages between classes that are merely evicting.
+
+    All bookkeeping is in per-class arrays and a key-id index array, so
+    there is no Python object per entry; keys outside the `k<id>` space go
+    through a small dict. The arena is MAP_PRIVATE like that bookkeeping,
+    so forked workers each run their own copy-on-write store: the cap and
+    eviction apply per worker.
+
+    At startup keys are assigned in id order with sizes drawn from
+    `value_sizes`, skipping any that would need an eviction, so the dataset
+    starts as full as the key space allows and, when it does not fit, SET
+    traffic evicts right away. A SET that cannot be stored (value larger
+    than a page, or no page left anywhere to take) returns False.
+    """
+
+    PAGE_SIZE = 1 << 20
+    MIN_CHUNK = 64
+    EVICTIONS = ("clock", "lru")
+
+    def __init__(
+        self,
+        key_space: int,
+        value_size: int,
+        memory_limit: int,
+        growth_factor: float = 1.25,
+        eviction: str = "clock",
+        value_sizes: Optional[ValueSizes] = None,
+        seed: Optional[int] = None,
+    ):
+        if eviction not in self.EVICTIONS:
+            raise ValueError(f"unknown eviction policy {eviction!r}")
+        if growth_factor <= 1.0:
+            raise ValueError("slab growth factor must be > 1")
+        self._value_size = value_size
+        self._key_space = key_space
+        self._lru = eviction == "lru"
+        self.eviction = eviction
+        self._page_count = max(1, memory_limit // self.PAGE_SIZE)
+        self._next_page = 0
+        self._arena = mmap.mmap(-1, self._page_count * self.PAGE_SIZE, flags=mmap.MAP_PRIVATE)
+        self._view = memoryview(self._arena)
+        _fill_random(self._view, seed)
+        self._base = ctypes.addressof(ctypes.c_char.from_buffer(self._arena))
+        self._sizes: List[int] = []
+        size = self.MIN_CHUNK
+        while size < self.PAGE_SIZE:
+            self._sizes.append(size)
+            size = max(size + 8, (int(size * growth_factor) + 7) & ~7)
+        self._sizes.append(self.PAGE_SIZE)
+        self._classes = [_SlabClass(idx, size, self.PAGE_SIZE) for idx, size in enumerate(self._sizes)]
+        # Handle per key id: (class << 32) | chunk, or -1 when absent.
+        self._index = array("q", [-1]) * key_space
+        self._other: Dict[bytes, int] = {}
+        self._other_keys: Dict[int, bytes] = {}
+        self._bytes = 0
+        self.evictions = 0
+        self.get_hits = 0
+        self.get_misses = 0
+        self.total_items = 0
+        self.set_failures = 0
+        self.slab_reassigns = 0
+        self._prefill(value_sizes or ValueSizes(None, value_size, seed=seed))
+
+    def _prefill(self, sizes: ValueSizes) -> None:
+        index = self._index
+        for key_id in range(self._key_space):
+            size = sizes.next()
+            cls_idx = self._class_for(size)
+            if cls_idx < 0:
+                continue
+            cls = self._classes[cls_idx]
+            if not cls.free:
+                if self._next_page >= self._page_count:
+                    continue
+                self._add_page(cls)
+            chunk = cls.free.pop()
+            self._store_chunk(cls, chunk, key_id, size)
+            index[key_id] = (cls_idx << 32) | chunk
+
+    def _class_for(self, size: int) -> int:
+        if size > self.PAGE_SIZE:
+            return -1
+        return bisect.bisect_left(self._sizes, size)
+
+    def _add_page(self, cls: _SlabClass) -> None:
+        cls.add_page(self._next_page)
+        self._next_page += 1
+
+    def _offset(self, cls: _SlabClass, chunk: int) -> int:
+        per_page = cls.per_page
+        return cls.pages[chunk // per_page] * self.PAGE_SIZE + (chunk % per_page) * cls.size
+
+    def _handle(self, key: bytes) -> Tuple[int, int]:
+        key_id = _key_id(key, self._key_space)
+        if key_id >= 0:
+            return key_id, self._index[key_id]
+        return _OTHER_KEY, self._other.get(key, -1)
+
+    def _touch(self, cls: _SlabClass, chunk: int) -> None:
+        if self._lru:
+            if cls.head != chunk:
+                cls.unlink(chunk)
+                cls.link(chunk)
+        else:
+            cls.ref[chunk] = 1
+
+    def _store_chunk(self, cls: _SlabClass, chunk: int, owner: int, size: int) -> None:
+        cls.owner[chunk] = owner
+        cls.lengths[chunk] = size
+        cls.items += 1
+        self._bytes += size
+        if self._lru:
+            cls.link(chunk)
+        else:
+            cls.ref[chunk] = 1
+
+    def _release(self, cls: _SlabClass, chunk: int) -> None:
+        """Drop the item in `chunk` from the class; the caller reuses or frees it."""
+        owner = cls.owner[chunk]
+        if owner >= 0:
+            self._index[owner] = -1
+        elif owner == _OTHER_KEY:
+            handle = (cls.idx << 32) | chunk
+            del self._other[self._other_keys.pop(handle)]
+        cls.owner[chunk] = _FREE_CHUNK
+        cls.ref[chunk] = 0
+        cls.items -= 1
+        self._bytes -= cls.lengths[chunk]
+        if self._lru:
+            cls.unlink(chunk)
+
+    def _evict(self, cls: _SlabClass) -> int:
+        if self._lru:
+            chunk = cls.tail
+        else:
+            owner, ref = cls.owner, cls.ref
+            n = len(owner)
+            hand = cls.hand
+            # Terminates within two sweeps: the first clears every reference bit.
+            while True:
+                if hand >= n:
+                    hand = 0
+                if owner[hand] != _FREE_CHUNK:
+                    if not ref[hand]:
+                        break
+                    ref[hand] = 0
+                hand += 1
+            chunk = hand
+            cls.hand = hand + 1
+        self._release(cls, chunk)
+        self.evictions += 1
+        return chunk
 
+    def _reassign_page(self, cls: _SlabClass) -> bool:
+        donor = max(self._classes, key=lambda c: len(c.pages))
+        if donor is cls or len(donor.pages) < 2:
+            return False
+        # The last page holds the highest chunk numbers, so dropping it just
+        # truncates the donor's arrays.
+        first = len(donor.owner) - donor.per_page
+        for chunk in range(first, len(donor.owner)):
+            if donor.owner[chunk] != _FREE_CHUNK:
+                self._release(donor, chunk)
+                self.evictions += 1
+        donor.free = array("I", (chunk for chunk in donor.free if chunk < first))
+        for arr in (donor.owner, donor.lengths, donor.ref, donor.prev, donor.next):
+            del arr[first:]
+        if donor.hand >= first:
+            donor.hand = 0
+        cls.add_page(donor.pages.pop())
+        self.slab_reassigns += 1
+        return True
 
-def _random_key(key_space: int, theta: float) -> bytes:
-    key_id = _zipf_key(key_space, theta)
-    return f"k{key_id}".encode()
+    def _alloc(self, cls: _SlabClass) -> int:
+        if cls.free:
+            return cls.free.pop()
+        if self._next_page < self._page_count:
+            self._add_page(cls)
+            return cls.free.pop()
+        if cls.items:
+            return self._evict(cls)
+        if self._reassign_page(cls):
+            return cls.free.pop()
+        return -1
 
+    def lookup(self, key: bytes):
+        _, handle = self._handle(key)
+        if handle < 0:
+            self.get_misses += 1
+            return None
+        self.get_hits += 1
+        cls = self._classes[handle >> 32]
+        chunk = handle & 0xFFFFFFFF
+        self._touch(cls, chunk)
+        off = self._offset(cls, chunk)
+        return self._view[off : off + cls.lengths[chunk]]
 
-async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, store: KVStore):
+    def get(self, key: bytes):
+        value = self.lookup(key)
+        return DEFAULT_VALUE if value is None else value
+
+    def set(self, key: bytes, value: bytes) -> bool:
+        size = len(value)
+        cls_idx = self._class_for(size)
+        owner, handle = self._handle(key)
+        if handle >= 0:
+            old_cls = self._classes[handle >> 32]
+            chunk = handle & 0xFFFFFFFF
+            if handle >> 32 == cls_idx:
+                # Same class: overwrite in place and count it as a use.
+                self._bytes += size - old_cls.lengths[chunk]
+                old_cls.lengths[chunk] = size
+                off = self._offset(old_cls, chunk)
+                self._view[off : off + size] = value
+                self._touch(old_cls, chunk)
+                self.total_items += 1
+                return True
+            # The old item goes even if the new one cannot be stored, as in memcached.
+            self._release(old_cls, chunk)
+            old_cls.free.append(chunk)
+        if cls_idx < 0:
+            self.set_failures += 1
+            return False
+        cls = self._classes[cls_idx]
+        chunk = self._alloc(cls)
+        if chunk < 0:
+            self.set_failures += 1
+            return False
+        off = self._offset(cls, chunk)
+        self._view[off : off + size] = value
+        self._store_chunk(cls, chunk, owner, size)
+        handle = (cls_idx << 32) | chunk
+        if owner >= 0:
+            self._index[owner] = handle
+        else:
+            self._other[bytes(key)] = handle
+            self._other_keys[handle] = bytes(key)
+        self.total_items += 1
+        return True
+
+    def trace_target(self, key: bytes) -> Tuple[int, int]:
+        key_id, handle = self._handle(key)
+        key_id = max(key_id, -1)
+        if handle < 0:
+            return key_id, 0
+        cls = self._classes[handle >> 32]
+        return key_id, self._base + self._offset(cls, handle & 0xFFFFFFFF)
+
+    def truth_objects(self, limit: int) -> Iterator[Tuple[str, int, int]]:
+        emitted = 0
+        for key_id, handle in enumerate(self._index):
+            if emitted >= limit:
+                break
+            if handle < 0:
+                continue
+            cls = self._classes[handle >> 32]
+            chunk = handle & 0xFFFFFFFF
+            yield f"k{key_id}", self._base + self._offset(cls, chunk), cls.lengths[chunk]
+            emitted += 1
+
+    def data_regions(self) -> List[Tuple[str, int, int]]:
+        return [
+            ("kv_value_arena", self._base, len(self._arena)),
+            ("kv_key_index", buffer_address(self._index), len(self._index) * self._index.itemsize),
+        ]
+
+    def stats(self, slabs: bool = False) -> Dict[str, int]:
+        if slabs:
+            # Same keys as memcached's `stats slabs`, for the classes in use.
+            out: Dict[str, int] = {}
+            for cls_idx, cls in enumerate(self._classes):
+                if not cls.pages:
+                    continue
+                out[f"{cls_idx}:chunk_size"] = cls.size
+                out[f"{cls_idx}:chunks_per_page"] = cls.per_page
+                out[f"{cls_idx}:total_pages"] = len(cls.pages)
+                out[f"{cls_idx}:used_chunks"] = cls.items
+                out[f"{cls_idx}:free_chunks"] = len(cls.free)
+            out["active_slabs"] = sum(1 for cls in self._classes if cls.pages)
+            out["total_malloced"] = self._next_page * self.PAGE_SIZE
+            return out
+        return {
+            "limit_maxbytes": len(self._arena),
+            "bytes": self._bytes,
+            "curr_items": sum(cls.items for cls in self._classes),
+            "total_items": self.total_items,
+            "evictions": self.evictions,
+            "get_hits": self.get_hits,
+            "get_misses": self.get_misses,
+            "set_failures": self.set_failures,
+            "slab_reassigns": self.slab_reassigns,
+        }
+
+
+STORES = {
+    "capped": CappedKVStore,
+    "dict": KVStore,
+    "slab": SlabKVStore,
+}
+
+
+def _mc_values(store, keys, out: list, with_cas: bool, trace=None, conn=access_trace.NO_CONN) -> None:
+    # memcached text protocol: one VALUE block per hit, misses are omitted, one END.
+    # Flags are not stored and always reported as 0. Values are copied: a store
+    # may hand out a view into its arena, which a later SET or eviction reuses
+    # before the batched reply is written.
+    for key in keys:
+        if trace is not None and trace.sample():
+            trace.record(OP_GET, *store.trace_target(key), conn)
+        value = store.lookup(key)
+        if value is None:
+            continue
+        if with_cas:
+            out.append(b"VALUE %s 0 %d 0\r\n" % (key, len(value)))
+        else:
+            out.append(b"VALUE %s 0 %d\r\n" % (key, len(value)))
+        out.append(bytes(value))
+        out.append(b"\r\n")
+    out.append(b"END\r\n")
+
+
+def _set_header(parts: list, value_size: int) -> Tuple[int, int, Optional[bytes]]:
+    """(payload length, trailer length, error reply or None) of a SET/set header.
+
+    Legacy `SET key [len]` defaults to the store's value size and has no
+    trailer; memcached `set key flags exptime bytes [noreply]` is followed
+    by the payload and CRLF. Callers check the trailer once it has arrived.
+    """
+    if parts[0] == b"SET":
+        if len(parts) < 2:
+            return 0, 0, b"ERROR\r\n"
+        if len(parts) == 2:
+            return value_size, 0, None
+        length, trailer = parts[2], 0
+    else:
+        if len(parts) < 5:
+            return 0, 0, b"ERROR\r\n"
+        length, trailer = parts[4], 2
+    if not length.isdigit():
+        return 0, 0, MC_BAD_CHUNK
+    return int(length), trailer, None
+
+
+def _mc_stats(store, args, out: list) -> None:
+    # `stats` and `stats slabs`; other sections are answered with an empty list.
+    section = args[0] if args else b""
+    stats = store.stats(slabs=True) if section == b"slabs" else ({} if section else store.stats())
+    if not section:
+        stats = {"pid": os.getpid(), **stats}
+    for name, value in stats.items():
+        out.append(b"STAT %s %d\r\n" % (name.encode(), value))
+    out.append(b"END\r\n")
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, store, trace=None):
     addr = writer.get_extra_info("peername")
+    conn = access_trace.connection(addr, writer.get_extra_info("sockname")) if trace is not None else None
     while True:
         header = await reader.readline()
         if not header:
             break
-        parts = header.decode().strip().split()
-        if len(parts) < 2:
+        parts = header.split()
+        if not parts:
+            continue
+        op = parts[0]
+        if op in (b"get", b"gets"):
+            out: list = []
+            _mc_values(store, parts[1:], out, op == b"gets", trace, conn)
+            writer.writelines(out)
+        elif (op == b"set" and len(parts) >= 5) or (op == b"SET" and len(parts) >= 2):
+            payload_len, trailer, error = _set_header(parts, store._value_size)
+            if error:
+                writer.write(error)
+            else:
+                payload = await reader.readexactly(payload_len + trailer)
+                if trailer and payload[payload_len:] != b"\r\n":
+                    # Not stored; resynchronise at the next line, as memcached does.
+                    if not payload.endswith(b"\n"):
+                        await reader.readline()
+                    writer.write(MC_BAD_CHUNK)
+                    await writer.drain()
+                    continue
+                stored = store.set(parts[1], payload[:payload_len])
+                if trace is not None and trace.sample():
+                    trace.record(OP_SET, *store.trace_target(parts[1]), conn)
+                if op == b"SET":
+                    writer.write(b"OK\n" if stored else LEGACY_NOT_STORED)
+                elif parts[-1] != b"noreply":
+                    writer.write(b"STORED\r\n" if stored else MC_NOT_STORED)
+        elif op == b"stats":
+            out = []
+            _mc_stats(store, parts[1:], out)
+            writer.writelines(out)
+        elif op == b"version":
+            writer.write(MC_VERSION)
+        elif op == b"quit":
+            break
+        elif len(parts) < 2:
             continue
-        op, key = parts[0], parts[1].encode()
-        if op == "GET":
-            writer.write(store.get(key))
+        elif op == b"GET":
+            if trace is not None and trace.sample():
+                trace.record(OP_GET, *store.trace_target(parts[1]), conn)
+            writer.write(bytes(store.get(parts[1])))
             writer.write(b"\n")
-        elif op == "SET":
-            payload_len = int(parts[2]) if len(parts) > 2 else store._value_size
-            payload = await reader.readexactly(payload_len)
-            store.set(key, payload)
-            writer.write(b"OK\n")
+        else:
+            writer.write(b"ERROR\r\n")
         await writer.drain()
     writer.close()
     await writer.wait_closed()
 
 
+class KVProtocol(asyncio.Protocol):
+    """Buffered, pipelined variant of `handle_client` (same legacy + memcached commands).
+
+    Every `data_received` parses as many complete requests as the receive
+    buffer holds and answers them with one `writelines`, so a client can keep
+    several requests in flight per connection. Reading only pauses when the
+    transport reports write backpressure.
+    """
+
+    def __init__(self, store, trace=None):
+        self._store = store
+        self._trace = trace
+        self._conn = access_trace.NO_CONN
+        self._buf = bytearray()
+        self._transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport
+        if self._trace is not None:
+            self._conn = access_trace.connection(
+                transport.get_extra_info("peername"), transport.get_extra_info("sockname")
+            )
+
+    def data_received(self, data: bytes) -> None:
+        buf = self._buf
+        buf += data
+        store = self._store
+        trace = self._trace
+        out = []
+        pos = 0
+        end = len(buf)
+        closing = False
+        while pos < end:
+            nl = buf.find(b"\n", pos)
+            if nl < 0:
+                break
+            parts = bytes(buf[pos:nl]).split()
+            if not parts:
+                pos = nl + 1
+                continue
+            op = parts[0]
+            if op == b"GET" and len(parts) >= 2:
+                if trace is not None and trace.sample():
+                    trace.record(OP_GET, *store.trace_target(parts[1]), self._conn)
+                out.append(bytes(store.get(parts[1])))
+                out.append(b"\n")
+            elif op in (b"get", b"gets"):
+                _mc_values(store, parts[1:], out, op == b"gets", trace, self._conn)
+            elif op == b"SET" or op == b"set":
+                payload_len, trailer, error = _set_header(parts, store._value_size)
+                if error:
+                    # Skip just the header; a payload line that follows is parsed as a command.
+                    out.append(error)
+                    pos = nl + 1
+                    continue
+                if end - (nl + 1) < payload_len + trailer:
+                    # Wait for the rest of the payload before consuming the header.
+                    break
+                data_end = nl + 1 + payload_len
+                if trailer and buf[data_end : data_end + trailer] != b"\r\n":
+                    # Not stored; resynchronise at the next line, as memcached does.
+                    resync = buf.find(b"\n", data_end)
+                    if resync < 0:
+                        break
+                    out.append(MC_BAD_CHUNK)
+                    pos = resync + 1
+                    continue
+                stored = store.set(parts[1], bytes(buf[nl + 1 : nl + 1 + payload_len]))
+                if trace is not None and trace.sample():
+                    trace.record(OP_SET, *store.trace_target(parts[1]), self._conn)
+                if op == b"SET":
+                    out.append(b"OK\n" if stored else LEGACY_NOT_STORED)
+                elif parts[-1] != b"noreply":
+                    out.append(b"STORED\r\n" if stored else MC_NOT_STORED)
+                nl += payload_len + trailer
+            elif op == b"stats":
+                _mc_stats(store, parts[1:], out)
+            elif op == b"version":
+                out.append(MC_VERSION)
+            elif op == b"quit":
+                closing = True
+                break
+            elif len(parts) >= 2:
+                out.append(b"ERROR\r\n")
+            pos = nl + 1
+        if pos:
+            del buf[:pos]
+        if out:
+            self._transport.writelines(out)
+        if closing:
+            # After the writes, so replies earlier in the batch are flushed first.
+            self._transport.close()
+
+    def pause_writing(self) -> None:
+        self._transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self._transport.resume_reading()
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Async KV server for MicroSentinel experiments")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=7000)
     parser.add_argument("--key-space", type=int, default=1_000_000)
     parser.add_argument("--value-size", type=int, default=256)
+    parser.add_argument(
+        "--store",
+        choices=sorted(STORES),
+        default="dict",
+        help=(
+            "dict: one bytes object per key; slab: one preallocated mmap with fixed-size value slots; "
+            "capped: memory-limited slab classes with eviction"
+        ),
+    )
+    parser.add_argument(
+        "--memory-limit-mb",
+        type=int,
+        default=64,
+        help="capped store only: value memory per worker, carved into 1 MiB slab pages",
+    )
+    parser.add_argument(
+        "--eviction",
+        choices=CappedKVStore.EVICTIONS,
+        default="clock",
+        help="capped store only: victim selection within a full slab class",
+    )
+    parser.add_argument(
+        "--slab-growth-factor",
+        type=float,
+        default=1.25,
+        help="capped store only: ratio between consecutive slab class chunk sizes",
+    )
+    parser.add_argument(
+        "--value-size-dist",
+        help="capped store only: prefill value sizes, e.g. lognormal:256:0.6 (default: fixed --value-size)",
+    )
     parser.add_argument("--zipf-theta", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, help="Seed for dataset contents (default: random; 0 with --dataset-cache)")
+    parser.add_argument(
+        "--dataset-cache",
+        help="slab store only: directory of persistent dataset snapshots keyed by (key_space, value_size, seed)",
+    )
+    parser.add_argument(
+        "--dataset-prefault",
+        action="store_true",
+        help="slab store only: touch every page at startup so it is placed under the current NUMA policy",
+    )
     parser.add_argument("--truth-file", help="Optional JSON file describing dataset objects")
     parser.add_argument("--truth-limit", type=int, default=1024)
+    parser.add_argument(
+        "--access-trace",
+        help="Optional sampled access trace ring file (with --workers > 1, one file per worker: <stem>.w<idx><suffix>)",
+    )
+    parser.add_argument(
+        "--access-trace-every",
+        type=int,
+        default=access_trace.DEFAULT_EVERY,
+        help="Record every Nth key access",
+    )
+    parser.add_argument(
+        "--access-trace-capacity",
+        type=int,
+        default=access_trace.DEFAULT_CAPACITY,
+        help="Ring size in records (64 bytes each); older samples are overwritten",
+    )
+    parser.add_argument(
+        "--io",
+        choices=["stream", "protocol"],
+        default="stream",
+        help="stream: one StreamReader request at a time; protocol: buffered asyncio.Protocol with pipelining",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of server processes sharing the port via SO_REUSEPORT (dataset is built once and inherited)",
+    )
+    parser.add_argument(
+        "--placement",
+        action="append",
+        metavar="CPUS[@NODE]",
+        help=(
+            "slab store only, repeatable: worker i (entries reused round-robin) runs on CPUS (a CPU list or nodeN) "
+            "and first-touches the i-th key-range shard on memory node NODE"
+        ),
+    )
     return parser.parse_args()
 
 
-def _write_truth_snapshot(store: KVStore, path: str, limit: int) -> None:
-    entries = []
-    for idx, (key, value) in enumerate(store._store.items()):
-        entries.append(
+def _write_truth_snapshot(
+    store,
+    path: str,
+    limit: int,
+    shards: Optional[List[Dict[str, object]]] = None,
+    worker_pids: Optional[List[int]] = None,
+) -> None:
+    """Write the truth snapshot; `worker_pids` (by worker index) when forked workers serve.
+
+    A single process records its own pid. Forked workers share the object
+    addresses but not a pid, so the snapshot lists every worker's pid and
+    each placement shard carries the pid of the worker that owns it.
+    """
+    entries = [
+        {
+            "key": key,
+            "value_addr": hex(addr),
+            "value_len": length,
+        }
+        for key, addr, length in store.truth_objects(limit)
+    ]
+    if worker_pids is None:
+        payload: Dict[str, object] = {"pid": os.getpid(), "objects": entries}
+    else:
+        payload = {"worker_pids": worker_pids, "objects": entries}
+    if shards:
+        shards = [
+            {**shard, "pid": os.getpid() if worker_pids is None else worker_pids[shard["worker"]]} for shard in shards
+        ]
+        payload["placement"] = {"node_cpus": numa.node_cpus(), "shards": shards}
+    Path(path).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def _plan_shards(store: SlabKVStore, placements: List[numa.WorkerPlacement], workers: int) -> List[Dict[str, object]]:
+    """One shard per worker; entries of `placements` are reused round-robin."""
+    topology = numa.node_cpus()
+    base = store.base_address()
+    shards = []
+    for idx in range(workers):
+        first_key, end_key, offset, length = store.shard(idx, workers)
+        shards.append(
             {
-                "key": key.decode(),
-                "value_addr": hex(id(value)),
-                "value_len": len(value),
+                "worker": idx,
+                **placements[idx % len(placements)].as_dict(topology),
+                "keys": [first_key, end_key],
+                "offset": offset,
+                "addr": hex(base + offset),
+                "len": length,
             }
         )
-        if idx + 1 >= limit:
-            break
-    Path(path).write_text(json.dumps({"objects": entries}, indent=2), encoding="utf-8")
+    return shards
 
 
-async def main():
-    args = parse_args()
-    store = KVStore(args.key_space, args.value_size)
-    if args.truth_file:
-        _write_truth_snapshot(store, args.truth_file, args.truth_limit)
-    server = await asyncio.start_server(
-        lambda r, w: handle_client(r, w, store), host=args.host, port=args.port
+def _place_shard(store: SlabKVStore, shard: Dict[str, object], barrier) -> None:
+    """Pin this worker, bind its shard to the memory node, first-touch it, then wait for the others."""
+    idx = shard["worker"]
+    numa.pin(shard["cpus"])
+    addr, offset, length = int(shard["addr"], 16), shard["offset"], shard["len"]
+    mem_node = shard["mem_node"]
+    if mem_node is not None:
+        error = numa.bind_memory(addr, length, mem_node)
+        if error:
+            print(f"[kv-server-{idx}] mbind to node {mem_node} failed ({error}); relying on first touch", flush=True)
+    store.fill_shard(offset, length)
+    print(
+        f"KV shard worker={idx} keys={shard['keys'][0]}-{shard['keys'][1]} cpus={shard['spec']} "
+        f"mem_node={mem_node} sampled page nodes={numa.page_nodes(addr, length)}",
+        flush=True,
     )
+    # Nobody serves until every shard is in place, so no page is first
+    # touched by a reader on the wrong node.
+    barrier.wait(PLACEMENT_TIMEOUT_S)
+
+
+def trace_path(path: str, worker_idx: int, workers: int) -> Path:
+    base = Path(path)
+    if workers <= 1:
+        return base
+    return base.with_name(f"{base.stem}.w{worker_idx}{base.suffix}")
+
+
+async def serve(args, store, worker_idx: int):
+    reuse_port = args.workers > 1
+    # Published per worker: addresses match across forks but the pid does not.
+    publish("kv-server", store.data_regions())
+    trace = None
+    if args.access_trace:
+        trace = access_trace.AccessTrace(
+            trace_path(args.access_trace, worker_idx, args.workers),
+            capacity=args.access_trace_capacity,
+            every=args.access_trace_every,
+        )
+    if args.io == "protocol":
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: KVProtocol(store, trace), host=args.host, port=args.port, reuse_port=reuse_port
+        )
+    else:
+        server = await asyncio.start_server(
+            lambda r, w: handle_client(r, w, store, trace),
+            host=args.host,
+            port=args.port,
+            reuse_port=reuse_port,
+        )
     addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
-    print(f"KV server listening on {addrs}")
+    print(f"KV server worker={worker_idx} pid={os.getpid()} io={args.io} listening on {addrs}", flush=True)
     async with server:
         await server.serve_forever()
 
 
+def main():
+    args = parse_args()
+    if args.store != "slab" and (args.dataset_cache or args.dataset_prefault):
+        raise SystemExit("--dataset-cache/--dataset-prefault require --store slab")
+    if args.store != "capped" and args.value_size_dist:
+        raise SystemExit("--value-size-dist requires --store capped")
+    if args.value_size_dist:
+        try:
+            ValueSizes(args.value_size_dist, args.value_size, table_size=1)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+    placements: List[numa.WorkerPlacement] = []
+    if args.placement:
+        if args.store != "slab" or args.dataset_cache or args.dataset_prefault:
+            raise SystemExit("--placement requires --store slab without --dataset-cache/--dataset-prefault")
+        try:
+            placements = [numa.parse_placement(spec) for spec in args.placement]
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+    # Build the dataset before forking so every worker starts from the same
+    # copy-on-write snapshot; SETs stay local to the worker that handled them.
+    # With --placement the slab is only mapped here, shared, and each worker
+    # fills its own shard after pinning; SETs are then seen by every worker.
+    if args.store == "slab":
+        store = SlabKVStore(
+            args.key_space,
+            args.value_size,
+            seed=args.seed,
+            cache_dir=args.dataset_cache,
+            prefault=args.dataset_prefault,
+            fill=not placements,
+        )
+    elif args.store == "capped":
+        store = CappedKVStore(
+            args.key_space,
+            args.value_size,
+            args.memory_limit_mb << 20,
+            growth_factor=args.slab_growth_factor,
+            eviction=args.eviction,
+            value_sizes=ValueSizes(args.value_size_dist, args.value_size, seed=args.seed),
+            seed=args.seed,
+        )
+        stats = store.stats()
+        print(
+            f"KV capped store: {stats['curr_items']}/{args.key_space} keys prefilled, "
+            f"{stats['bytes']} bytes in {stats['limit_maxbytes']} ({args.eviction} eviction)",
+            flush=True,
+        )
+    else:
+        store = STORES[args.store](args.key_space, args.value_size)
+    workers = max(1, args.workers)
+    args.workers = workers
+    shards = _plan_shards(store, placements, workers) if placements else None
+    ctx = multiprocessing.get_context("fork")
+    # With forked workers the snapshot needs their pids, so worker 0 writes
+    # it once every worker has recorded its pid and passed the barrier.
+    worker_pids = ctx.RawArray("i", workers) if args.truth_file and workers > 1 else None
+    if args.truth_file and worker_pids is None:
+        _write_truth_snapshot(store, args.truth_file, args.truth_limit, shards)
+    barrier = ctx.Barrier(workers) if shards or worker_pids is not None else None
+
+    def worker_main(idx: int) -> None:
+        if worker_pids is not None:
+            worker_pids[idx] = os.getpid()
+        if shards:
+            _place_shard(store, shards[idx], barrier)
+        elif barrier is not None:
+            barrier.wait(PLACEMENT_TIMEOUT_S)
+        if worker_pids is not None and idx == 0:
+            _write_truth_snapshot(store, args.truth_file, args.truth_limit, shards, list(worker_pids))
+        asyncio.run(serve(args, store, idx))
+
+    raise SystemExit(run_workers(workers, worker_main, name="kv-server"))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,34 +1,190 @@
 #!/usr/bin/env python3
+"""Echo backend for the LB workload.
+
+Each connection is served by a `sock_recv_into` loop over one buffer
+allocated when the connection is accepted, so echoing allocates nothing
+per read. An optional service time is spent before each request's bytes
+are echoed, so experiments are not proxy-bound. Specs are in microseconds:
+
+    none                      echo immediately (default)
+    fixed:US                  every request takes US
+    exp:MEAN_US               exponential with mean MEAN_US
+    bimodal:FAST:SLOW:P_SLOW  SLOW with probability P_SLOW, else FAST
+
+With --service-mode sleep the time is awaited, so requests overlap like
+I/O-bound work. With burn the worker spins on the CPU, so requests queue
+behind each other like CPU-bound work. A request is --request-size bytes
+(lb_client's --payload), or every read when 0. As with value sizes in the
+KV workload, samples come from a table drawn once up front.
+"""
+
 import argparse
 import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.workers import run_workers  # noqa: E402
+
+SERVICE_KINDS = ("none", "fixed", "exp", "bimodal")
+SERVICE_TABLE_SIZE = 1 << 14
+RECV_BUFFER = 1 << 16
+
+
+class ServiceTime:
+    def __init__(self, spec: str, seed: Optional[int] = None, table_size: int = SERVICE_TABLE_SIZE):
+        self.spec = spec
+        kind, *parts = spec.split(":")
+        kind = kind.strip().lower()
+        if kind not in SERVICE_KINDS:
+            raise ValueError(f"unknown service-time distribution {spec!r} (expected one of {', '.join(SERVICE_KINDS)})")
+        try:
+            params = [float(p) for p in parts]
+        except ValueError as exc:
+            raise ValueError(f"bad service-time parameters in {spec!r}") from exc
+        expected = {"none": 0, "fixed": 1, "exp": 1, "bimodal": 3}[kind]
+        if len(params) != expected:
+            raise ValueError(f"{kind} service time needs {expected} parameter(s), got {spec!r}")
+        if any(p < 0 for p in params) or (kind == "bimodal" and params[2] > 1):
+            raise ValueError(f"service-time parameters out of range in {spec!r}")
+        self.kind = kind
+        rng = random.Random(seed)
+        if kind == "none":
+            draws = [0.0]
+        elif kind == "fixed":
+            draws = [params[0]]
+        elif kind == "exp":
+            mean = params[0]
+            draws = [rng.expovariate(1.0 / mean) if mean else 0.0 for _ in range(table_size)]
+        else:
+            fast, slow, p_slow = params
+            draws = [slow if rng.random() < p_slow else fast for _ in range(table_size)]
+        self._table = array("q", (int(us * 1000) for us in draws))
+        self._idx = 0
+        self.mean_us = sum(self._table) / len(self._table) / 1000
 
+    @property
+    def enabled(self) -> bool:
+        return self.kind != "none"
 
-async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
-    peer = writer.get_extra_info("peername")
+    def next_ns(self) -> int:
+        idx = self._idx
+        self._idx = idx + 1 if idx + 1 < len(self._table) else 0
+        return self._table[idx]
+
+
+def burn(ns: int) -> None:
+    """Spin on the CPU for `ns`; blocks this worker like CPU-bound service would."""
+    end = time.perf_counter_ns() + ns
+    while time.perf_counter_ns() < end:
+        pass
+
+
+async def handle(sock: socket.socket, args, service: ServiceTime):
+    loop = asyncio.get_running_loop()
+    buf = bytearray(RECV_BUFFER)
+    view = memoryview(buf)
+    request_size = args.request_size
+    pending = 0  # bytes of the current, not yet complete request
+    sleep_mode = args.service_mode == "sleep"
     try:
-        while data := await reader.read(4096):
-            writer.write(data)
-            await writer.drain()
+        while True:
+            n = await loop.sock_recv_into(sock, buf)
+            if not n:
+                break
+            if service.enabled:
+                if request_size > 0:
+                    pending += n
+                    requests, pending = divmod(pending, request_size)
+                else:
+                    requests = 1
+                if requests:
+                    delay = sum(service.next_ns() for _ in range(requests))
+                    if sleep_mode:
+                        await asyncio.sleep(delay / 1e9)
+                    else:
+                        burn(delay)
+            await loop.sock_sendall(sock, view[:n])
+    except (ConnectionError, OSError):
+        pass
     finally:
-        writer.close()
-        await writer.wait_closed()
+        sock.close()
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Echo backend for LB workload")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=7201)
-    parser.add_argument("--workers", type=int, default=2)
-    return parser.parse_args()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of echo processes sharing the port via SO_REUSEPORT",
+    )
+    parser.add_argument(
+        "--service-time",
+        default="none",
+        help="Per-request service time in us: none, fixed:US, exp:MEAN_US, bimodal:FAST_US:SLOW_US:P_SLOW",
+    )
+    parser.add_argument(
+        "--service-mode",
+        choices=["sleep", "burn"],
+        default="sleep",
+        help="sleep: await the service time (requests overlap); burn: spin on the CPU (requests queue)",
+    )
+    parser.add_argument(
+        "--request-size",
+        type=int,
+        default=0,
+        help="Bytes per request for service-time accounting (lb_client --payload); 0 = every read is a request",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Service-time seed (worker i uses seed + i)")
+    args = parser.parse_args()
+    try:
+        ServiceTime(args.service_time, table_size=1)
+    except ValueError as exc:
+        parser.error(str(exc))
+    return args
+
+
+async def serve(args, worker_idx: int):
+    seed = None if args.seed is None else args.seed + worker_idx
+    service = ServiceTime(args.service_time, seed)
+    family = socket.AF_INET6 if ":" in args.host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if args.workers > 1:
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(1024)
+    listener.setblocking(False)
+    print(
+        f"Backend echo worker={worker_idx} pid={os.getpid()} listening on {args.host}:{args.port} "
+        f"(service={args.service_time} mode={args.service_mode} mean_us={service.mean_us:.1f})",
+        flush=True,
+    )
+    loop = asyncio.get_running_loop()
+    conns = set()
+    while True:
+        sock, _ = await loop.sock_accept(listener)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        task = loop.create_task(handle(sock, args, service))
+        conns.add(task)
+        task.add_done_callback(conns.discard)
 
 
-async def main():
+def main():
     args = parse_args()
-    server = await asyncio.start_server(handle, host=args.host, port=args.port)
-    print(f"Backend echo listening on {args.host}:{args.port}")
-    async with server:
-        await server.serve_forever()
+    args.workers = max(1, args.workers)
+    raise SystemExit(run_workers(args.workers, lambda idx: asyncio.run(serve(args, idx)), name="backend-echo"))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
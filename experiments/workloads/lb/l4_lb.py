@@ -3,48 +3,350 @@ import argparse
 import asyncio
 import hashlib
 import itertools
+import json
+import mmap
+import operator
+import os
+import random
+import signal
 import socket
-import struct
+import sys
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import placement as numa  # noqa: E402
+from common.data_objects import buffer_address, publish  # noqa: E402
+from common.flow_id import socket_flow_id  # noqa: E402
+from common.workers import run_workers  # noqa: E402
 
-class L4LoadBalancer:
-    def __init__(self, backend_endpoints: List[Tuple[str, int]]):
-        self._backends = backend_endpoints
-        self._rr = itertools.cycle(self._backends)
 
-    def next_backend(self) -> Tuple[str, int]:
-        return next(self._rr)
+CONNECT_TIMEOUT_S = 1.0
 
 
-MS_FNV64_OFFSET = 1469598103934665603
-MS_FNV64_PRIME = 1099511628211
+async def _connect_socket(host: str, port: int, timeout: float = CONNECT_TIMEOUT_S) -> socket.socket:
+    """Connected non-blocking socket; a connect slower than `timeout` raises TimeoutError (an OSError)."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+    except asyncio.TimeoutError:
+        sock.close()
+        # A blackholed backend must fail like a refused one, not hang its caller.
+        raise TimeoutError(f"connect to {host}:{port} timed out after {timeout}s") from None
+    except BaseException:
+        sock.close()
+        raise
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
 
 
-def _fnv64_mix(h: int, data: int) -> int:
-    h ^= (data & 0xFFFFFFFFFFFFFFFF)
-    h = (h * MS_FNV64_PRIME) & 0xFFFFFFFFFFFFFFFF
-    return h
+def _idle_alive(sock: socket.socket) -> bool:
+    """True if an idle upstream is still open and has nothing unread on it."""
+    try:
+        sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    # EOF from the backend, or stray bytes that would corrupt the next flow.
+    return False
 
 
-def _ipv4_be32(addr: str) -> int:
-    return struct.unpack("I", socket.inet_aton(addr))[0]
+@dataclass
+class PoolConfig:
+    size: int
+    keepalive: bool
+    idle_timeout_s: float
+    health_interval_s: float
+    connect_timeout_s: float = CONNECT_TIMEOUT_S
 
 
-def compute_ms_flow_id_v4(src_ip: str, dst_ip: str, src_port: int, dst_port: int, proto: int = 6, direction: int = 0) -> int:
-    """Match bpf/micro_sentinel_kern.bpf.c::hash_flow_tuple() for IPv4.
+class UpstreamPool:
+    """Pre-connected idle sockets to one backend, refilled in the background.
 
-    Note: kernel stores IPv4 addrs in network byte order (be32) without ntohl.
-    Ports are stored in host order (after bpf_ntohs).
+    `acquire()` hands out an idle connection when there is one, so the flow
+    skips the backend handshake; on a miss it connects inline as it would
+    without a pool. With keep-alive, `release()` parks a connection again if
+    its flow ended with every forwarded byte answered (request/response
+    parity, which holds for the echo backend); anything else is closed. A
+    failed connect marks the backend down until a health check reconnects.
     """
 
-    h = MS_FNV64_OFFSET
-    h = _fnv64_mix(h, direction)
-    h = _fnv64_mix(h, proto)
-    h = _fnv64_mix(h, ((src_port & 0xFFFF) << 32) | (dst_port & 0xFFFF))
-    h = _fnv64_mix(h, ((_ipv4_be32(src_ip) & 0xFFFFFFFF) << 32) | (_ipv4_be32(dst_ip) & 0xFFFFFFFF))
-    return h if h != 0 else 1
+    def __init__(self, host: str, port: int, cfg: PoolConfig):
+        self.host = host
+        self.port = port
+        self._cfg = cfg
+        self._idle: Deque[Tuple[socket.socket, float]] = deque()
+        self._filling: Optional[asyncio.Task] = None
+        self.healthy = True
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self.expired = 0
+        self.connect_failures = 0
+
+    async def _connect(self) -> socket.socket:
+        try:
+            sock = await _connect_socket(self.host, self.port, self._cfg.connect_timeout_s)
+        except OSError:
+            self.connect_failures += 1
+            self.healthy = False
+            raise
+        self.healthy = True
+        return sock
+
+    async def fill(self) -> None:
+        """Open connections until `size` are idle; stops at the first failure."""
+        try:
+            while len(self._idle) < self._cfg.size:
+                self._idle.append((await self._connect(), time.monotonic()))
+        except OSError:
+            pass
+        finally:
+            self._filling = None
+
+    def _refill(self) -> None:
+        if self._filling is None and len(self._idle) < self._cfg.size:
+            self._filling = asyncio.get_running_loop().create_task(self.fill())
+
+    async def acquire(self) -> socket.socket:
+        while self._idle:
+            sock, _ = self._idle.popleft()
+            if _idle_alive(sock):
+                self.hits += 1
+                # With keep-alive the connection is expected back; anything
+                # that is not returned is replaced by the next health check.
+                if self.healthy and not self._cfg.keepalive:
+                    self._refill()
+                return sock
+            sock.close()
+            self.expired += 1
+        self.misses += 1
+        if self.healthy:
+            self._refill()
+        return await self._connect()
+
+    def release(self, sock: socket.socket, reusable: bool) -> None:
+        if (
+            reusable
+            and self._cfg.keepalive
+            and len(self._idle) < self._cfg.size
+            and _idle_alive(sock)
+        ):
+            self._idle.append((sock, time.monotonic()))
+            self.reused += 1
+        else:
+            sock.close()
+
+    def check(self, now: float) -> None:
+        """Health check: drop idle connections that died or sat past the idle
+        timeout, then top the pool up. For a backend marked down the refill is
+        the probe; its first successful connect marks it up again."""
+        timeout = self._cfg.idle_timeout_s
+        kept: Deque[Tuple[socket.socket, float]] = deque()
+        for sock, since in self._idle:
+            if (timeout > 0 and now - since > timeout) or not _idle_alive(sock):
+                sock.close()
+                self.expired += 1
+            else:
+                kept.append((sock, since))
+        self._idle = kept
+        self._refill()
+
+    def close(self) -> None:
+        if self._filling is not None:
+            self._filling.cancel()
+        while self._idle:
+            self._idle.popleft()[0].close()
+
+    def summary(self) -> str:
+        return (
+            f"pool {self.host}:{self.port} healthy={self.healthy} idle={len(self._idle)} hits={self.hits} "
+            f"misses={self.misses} reused={self.reused} expired={self.expired} "
+            f"connect_failures={self.connect_failures}"
+        )
+
+
+BALANCERS = ("rr", "maglev")
+MAGLEV_TABLE_SIZE = 65537  # prime, as Maglev's permutation requires
+
+
+def _is_prime(n: int) -> bool:
+    return n >= 2 and all(n % d for d in range(2, int(n**0.5) + 1))
+
+
+def _backend_name(backend: Tuple[str, int]) -> str:
+    return f"{backend[0]}:{backend[1]}"
+
+
+def maglev_table(backends: Tuple[Tuple[str, int], ...], size: int = MAGLEV_TABLE_SIZE) -> List[Tuple[str, int]]:
+    """Maglev lookup table (Eisenbud et al., NSDI '16): slot -> backend.
+
+    Each backend walks its own permutation of the slots (offset and skip
+    from a hash of its name), and backends take turns claiming their next
+    free slot, so every backend ends up with size/N slots (within one) and
+    removing one backend mostly reassigns only that backend's slots. Names
+    are hashed with blake2b, not hash(), so tables match across runs.
+    """
+    perms = []
+    for backend in backends:
+        digest = hashlib.blake2b(_backend_name(backend).encode(), digest_size=16).digest()
+        perms.append((int.from_bytes(digest[:8], "little") % size, int.from_bytes(digest[8:], "little") % (size - 1) + 1))
+    table: List[Optional[Tuple[str, int]]] = [None] * size
+    pos = [0] * len(backends)
+    filled = 0
+    while True:
+        for idx, (offset, skip) in enumerate(perms):
+            slot = (offset + pos[idx] * skip) % size
+            while table[slot] is not None:
+                pos[idx] += 1
+                slot = (offset + pos[idx] * skip) % size
+            table[slot] = backends[idx]
+            pos[idx] += 1
+            filled += 1
+            if filled == size:
+                return table
+
+
+class AssignmentTruth:
+    """Flow -> backend assignments made by one LB worker.
+
+    Written as JSON on shutdown so per-backend hotspots can be attributed to
+    the MicroSentinel flow ids (the same ids lb_client logs) routed there.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.flows: List[Dict[str, object]] = []
+        self.per_backend: Dict[str, int] = {}
+        self.unkeyed = 0
+        self.dropped = 0
+
+    def record(self, flow_id: Optional[int], backend: Tuple[str, int]) -> None:
+        name = _backend_name(backend)
+        self.per_backend[name] = self.per_backend.get(name, 0) + 1
+        if flow_id is None:
+            self.unkeyed += 1
+        elif len(self.flows) < self.limit:
+            self.flows.append({"flow_id": flow_id, "backend": name, "unix_ns": time.time_ns()})
+        else:
+            self.dropped += 1
+
+    def write(self, path: Path, lb: "L4LoadBalancer", worker_idx: int) -> None:
+        payload: Dict[str, object] = {
+            "pid": os.getpid(),
+            "worker": worker_idx,
+            "balance": lb.balance,
+            "backends": [_backend_name(backend) for backend in lb.backends],
+        }
+        if lb.balance == "maglev":
+            share: Dict[str, int] = {}
+            for backend in lb.table():
+                name = _backend_name(backend)
+                share[name] = share.get(name, 0) + 1
+            payload["table_size"] = lb.table_size
+            payload["table_slots"] = share
+        payload.update(
+            {
+                "assignments_per_backend": self.per_backend,
+                "unkeyed_flows": self.unkeyed,
+                "dropped_flows": self.dropped,
+                "flows": self.flows,
+            }
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def truth_path(path: str, worker_idx: int, workers: int) -> Path:
+    base = Path(path)
+    if workers <= 1:
+        return base
+    return base.with_name(f"{base.stem}.w{worker_idx}{base.suffix}")
+
+
+class L4LoadBalancer:
+    def __init__(
+        self,
+        backend_endpoints: List[Tuple[str, int]],
+        balance: str = "rr",
+        table_size: int = MAGLEV_TABLE_SIZE,
+        connect_timeout: float = CONNECT_TIMEOUT_S,
+    ):
+        self.backends = backend_endpoints
+        self.balance = balance
+        self.table_size = table_size
+        self.connect_timeout = connect_timeout
+        self._rr = itertools.cycle(self.backends)
+        self._tables: Dict[Tuple[Tuple[str, int], ...], List[Tuple[str, int]]] = {}
+        if balance == "maglev":
+            # Built before the fork so every worker shares the full table.
+            self.table()
+        # Per-worker upstream pools and truth log, set up by `serve` after the fork.
+        self.pools: Dict[Tuple[str, int], UpstreamPool] = {}
+        self.assignments: Optional[AssignmentTruth] = None
+
+    def table(self, backends: Optional[Tuple[Tuple[str, int], ...]] = None) -> List[Tuple[str, int]]:
+        """Maglev table over `backends` (default: all), built once per backend set."""
+        backends = tuple(self.backends) if backends is None else backends
+        table = self._tables.get(backends)
+        if table is None:
+            table = self._tables[backends] = maglev_table(backends, self.table_size)
+        return table
+
+    def _healthy(self) -> Tuple[Tuple[str, int], ...]:
+        healthy = tuple(backend for backend in self.backends if self.pools[backend].healthy)
+        # With every backend down, keep routing as if all were up.
+        return healthy or tuple(self.backends)
+
+    def next_backend(self, flow_id: Optional[int] = None) -> Tuple[str, int]:
+        if self.balance == "maglev" and flow_id is not None:
+            # Backends failing health checks drop out of the table; Maglev
+            # moves their flows and few others.
+            table = self.table(self._healthy() if self.pools else None)
+            backend = table[flow_id % self.table_size]
+        else:
+            # Round robin, and the fallback for flows without an IPv4 flow id.
+            backend = next(self._rr)
+            if self.pools:
+                # Skip backends failing health checks, unless all of them are.
+                for _ in range(len(self.backends) - 1):
+                    if self.pools[backend].healthy:
+                        break
+                    backend = next(self._rr)
+        if self.assignments is not None:
+            self.assignments.record(flow_id, backend)
+        return backend
+
+    async def connect(self, backend: Tuple[str, int]) -> socket.socket:
+        pool = self.pools.get(backend)
+        if pool is None:
+            return await _connect_socket(*backend, self.connect_timeout)
+        return await pool.acquire()
+
+    def release(self, backend: Tuple[str, int], sock: socket.socket, reusable: bool) -> None:
+        pool = self.pools.get(backend)
+        if pool is None:
+            sock.close()
+        else:
+            pool.release(sock, reusable)
+
+    def upstream_socket(self, sock: socket.socket) -> socket.socket:
+        """Socket to hand an asyncio transport for a backend connection.
+
+        Closing a transport closes its socket, so with pools the transport
+        gets a dup and the original stays open for `release`.
+        """
+        return sock.dup() if self.pools else sock
+
+
+CACHE_LINE = 64
+HOT_PATTERNS = ("hash", "stride", "random", "chase", "write-share")
 
 
 @dataclass
@@ -52,53 +354,211 @@ class HotConfig:
     bytes_per_slot: int
     slots: int
     rounds: int
+    pattern: str = "hash"
+    stride: int = CACHE_LINE
+    lines: int = 0  # touch points per round; 0 = the whole slot
 
 
 class HotCacheMissor:
+    """Per-flow cache pressure on a slot of a contiguous arena.
+
+    Patterns (each round touches `lines` points `stride` bytes apart):
+
+      hash         blake2b over the whole slot (the original generator; the
+                   misses come mixed with hashing compute)
+      stride       sequential reads, continuing where the flow's slot left
+                   off; cheap, but hardware prefetchers hide most misses
+      random       reads in a fixed random order, as one C-level gather;
+                   independent loads, so misses overlap
+      chase        dependent loads: every touched line stores the offset of
+                   the next in a random single cycle (Sattolo), so each step
+                   waits for the previous miss; one bytecode loop per step
+      write-share  sequential one-byte stores into a MAP_SHARED arena that
+                   every LB worker inherits, so flows of different workers on
+                   the same slot bounce lines between cores
+
+    Except for `hash`, the loops run in C over memoryview slices, and a
+    touch point is one cache line (`stride` >= 64). `lines_per_call` is the
+    number of distinct lines one call touches. If the arena is far larger
+    than the LLC and the pattern defeats the prefetcher, that is also the
+    number of misses it injects.
+    """
+
     def __init__(self, cfg: HotConfig):
         self._cfg = cfg
         self._enabled = cfg.bytes_per_slot > 0 and cfg.slots > 0 and cfg.rounds > 0
-        self._buffers: List[bytearray] = []
+        self._arena = bytearray()
+        self._buffers: List[memoryview] = []
         # Keep a live dependency so the interpreter can't DCE the whole path.
         self._sink = 0
+        self.calls = 0
+        self.lines_per_call = 0
 
         if not self._enabled:
             return
 
+        # All slots live in one arena so the working set is a single
+        # contiguous range that can be registered as a data object.
         fill = bytes([i & 0xFF for i in range(256)])
+        size = cfg.bytes_per_slot
+        pattern = (fill * (size // len(fill) + 1))[:size]
+        if cfg.pattern == "write-share":
+            # Anonymous mmaps are MAP_SHARED, so forked workers write the same pages.
+            self._arena = mmap.mmap(-1, size * cfg.slots)
+            for slot in range(cfg.slots):
+                self._arena[slot * size : (slot + 1) * size] = pattern
+        else:
+            self._arena = bytearray(pattern * cfg.slots)
+        view = memoryview(self._arena)
         for slot in range(cfg.slots):
-            buf = bytearray(cfg.bytes_per_slot)
-            for off in range(0, len(buf), len(fill)):
-                buf[off : off + len(fill)] = fill
+            buf = view[slot * size : (slot + 1) * size]
             # Per-slot perturbation so different slots aren't identical.
             if len(buf) >= 8:
                 buf[0] = slot & 0xFF
             self._buffers.append(buf)
 
+        if cfg.pattern == "hash":
+            # Every round rehashes the same slot; only the first can miss.
+            self.lines_per_call = -(-size // CACHE_LINE)
+            return
+        stride = cfg.stride
+        points = max(1, size // stride)
+        self._points = points
+        self._count = min(cfg.lines, points) if cfg.lines > 0 else points
+        self.lines_per_call = min(self._count * cfg.rounds, points)
+        # Per-slot position in the point sequence, so consecutive calls on a
+        # slot move on to lines the previous call did not touch.
+        self._cursor = [0] * cfg.slots
+        if cfg.pattern == "random":
+            order = list(range(points))
+            random.Random(0).shuffle(order)
+            # One itemgetter per window of `count` points along the order.
+            windows = -(-points // self._count)
+            self._getters = []
+            for w in range(windows):
+                offsets = [order[(w * self._count + i) % points] * stride for i in range(self._count)]
+                # itemgetter returns a bare int for one item; keep it a tuple.
+                self._getters.append(operator.itemgetter(*offsets, *offsets[:1]) if len(offsets) == 1 else operator.itemgetter(*offsets))
+            self._windows = windows
+        elif cfg.pattern == "chase":
+            # Sattolo's algorithm: one cycle through every point.
+            nxt = list(range(points))
+            rng = random.Random(0)
+            for i in range(points - 1, 0, -1):
+                j = rng.randrange(i)
+                nxt[i], nxt[j] = nxt[j], nxt[i]
+            words = view[: len(view) - len(view) % 8].cast("Q")
+            for slot in range(cfg.slots):
+                base = slot * size // 8
+                for i in range(points):
+                    words[base + i * stride // 8] = nxt[i] * stride
+            self._words = words
+        elif cfg.pattern == "write-share":
+            self._stores = (b"\x01" * self._count, b"\x02" * self._count)
+
     def enabled(self) -> bool:
         return self._enabled
 
+    def describe(self) -> str:
+        cfg = self._cfg
+        if not self._enabled:
+            return "disabled"
+        return (
+            f"{cfg.pattern} {cfg.bytes_per_slot}B x {cfg.slots} slots x {cfg.rounds} rounds, "
+            f"{self.lines_per_call} lines/call"
+        )
+
+    def data_regions(self) -> List[Tuple[str, int, int]]:
+        if not self._enabled:
+            return []
+        return [("lb_hot_slots", buffer_address(self._arena), len(self._arena))]
+
+    def summary(self) -> str:
+        return f"hot pattern={self._cfg.pattern} calls={self.calls} expected_lines={self.calls * self.lines_per_call}"
+
     def touch_flow(self, flow_id: int) -> None:
         if not self._enabled:
             return
-        slot = int(flow_id % self._cfg.slots)
+        cfg = self._cfg
+        slot = int(flow_id % cfg.slots)
         buf = self._buffers[slot]
-
-        # Hashing scans the whole buffer in C, generating predictable cache pressure.
-        # Digest is folded into _sink to keep this work observable.
+        self.calls += 1
         local_sink = self._sink
-        for _ in range(self._cfg.rounds):
-            d = hashlib.blake2b(buf, digest_size=16).digest()
-            local_sink ^= int.from_bytes(d[:8], byteorder="little", signed=False)
+
+        if cfg.pattern == "hash":
+            # Hashing scans the whole buffer in C, generating predictable cache pressure.
+            # Digest is folded into _sink to keep this work observable.
+            for _ in range(cfg.rounds):
+                d = hashlib.blake2b(buf, digest_size=16).digest()
+                local_sink ^= int.from_bytes(d[:8], byteorder="little", signed=False)
+            self._sink = local_sink
+            return
+
+        stride, count, points = cfg.stride, self._count, self._points
+        cursor = self._cursor[slot]
+        if cfg.pattern == "chase":
+            words = self._words
+            base = slot * cfg.bytes_per_slot // 8
+            offset = cursor
+            for _ in range(count * cfg.rounds):
+                offset = words[base + offset // 8]
+            local_sink ^= offset
+            self._cursor[slot] = offset
+        elif cfg.pattern == "random":
+            getters, windows = self._getters, self._windows
+            for _ in range(cfg.rounds):
+                local_sink ^= getters[cursor](buf)[-1]
+                cursor = cursor + 1 if cursor + 1 < windows else 0
+            self._cursor[slot] = cursor
+        else:
+            write = cfg.pattern == "write-share"
+            store = self._stores[self.calls & 1] if write else None
+            for _ in range(cfg.rounds):
+                end = cursor + count
+                if end <= points:
+                    spans = ((cursor, end),)
+                else:
+                    end -= points
+                    spans = ((cursor, points), (0, end))
+                for lo, hi in spans:
+                    lines = buf[lo * stride : hi * stride : stride]
+                    if write:
+                        lines[:] = store[: hi - lo]
+                    else:
+                        local_sink ^= lines.tobytes()[-1]
+                cursor = end if end < points else 0
+            self._cursor[slot] = cursor
         self._sink = local_sink
 
 
-async def pipe_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+@dataclass
+class ForwardStats:
+    """Proxy-wide counters, reported on shutdown to compare forwarding modes."""
+
+    connections: int = 0
+    bytes_up: int = 0
+    bytes_down: int = 0
+
+    def summary(self, mode: str, cpu_s: float) -> str:
+        mb = (self.bytes_up + self.bytes_down) / 1e6
+        per_mb = f"{cpu_s * 1e3 / mb:.3f}" if mb else "n/a"
+        return (
+            f"LB forward={mode} connections={self.connections} up_bytes={self.bytes_up} "
+            f"down_bytes={self.bytes_down} cpu_s={cpu_s:.3f} cpu_ms_per_mb={per_mb}"
+        )
+
+
+stats = ForwardStats()
+
+
+async def pipe_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, moved: List[int]):
     try:
         while True:
             data = await reader.read(4096)
             if not data:
                 break
+            stats.bytes_down += len(data)
+            moved[1] += len(data)
             writer.write(data)
             await writer.drain()
     except asyncio.CancelledError:
@@ -109,33 +569,45 @@ async def pipe_stream(reader: asyncio.StreamReader, writer: asyncio.StreamWriter
 
 
 async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, lb: L4LoadBalancer):
-    # Best-effort flow id computation (IPv4 only). This is used only for
-    # selecting the per-flow cache-miss working set.
-    flow_id: Optional[int] = None
+    flow_id = socket_flow_id(writer.get_extra_info("peername"), writer.get_extra_info("sockname"))
+    stats.connections += 1
+
+    backend = lb.next_backend(flow_id)
     try:
-        peer = writer.get_extra_info("peername")
-        local = writer.get_extra_info("sockname")
-        if isinstance(peer, tuple) and isinstance(local, tuple) and len(peer) >= 2 and len(local) >= 2:
-            src_ip, src_port = peer[0], int(peer[1])
-            dst_ip, dst_port = local[0], int(local[1])
-            if ":" not in src_ip and ":" not in dst_ip:
-                flow_id = compute_ms_flow_id_v4(src_ip, dst_ip, src_port, dst_port, proto=6, direction=0)
-    except Exception:
-        flow_id = None
-
-    backend_host, backend_port = lb.next_backend()
-    backend_reader, backend_writer = await asyncio.open_connection(backend_host, backend_port)
+        sock = await lb.connect(backend)
+    except OSError:
+        writer.close()
+        return
+    upstream = None
+    try:
+        upstream = lb.upstream_socket(sock)
+        backend_reader, backend_writer = await asyncio.open_connection(sock=upstream)
+    except OSError:
+        # Close the transport's dup (if any) and hand the upstream back unused.
+        if upstream is not None:
+            upstream.close()
+        lb.release(backend, sock, False)
+        writer.close()
+        return
+    # Bytes of this flow forwarded [up, down]; equal when the backend has
+    # answered everything, so its connection can go back to the pool.
+    moved = [0, 0]
+    client_hung_up = False
 
     # Wrap the upstream direction so we can inject per-flow cache pressure on
     # each request chunk while still forwarding bytes.
     async def pipe_up_with_hot() -> None:
+        nonlocal client_hung_up
         try:
             while True:
                 data = await reader.read(4096)
                 if not data:
+                    client_hung_up = not task_down.done()
                     break
                 if hot is not None and hot.enabled() and flow_id is not None:
                     hot.touch_flow(flow_id)
+                stats.bytes_up += len(data)
+                moved[0] += len(data)
                 backend_writer.write(data)
                 await backend_writer.drain()
         except asyncio.CancelledError:
@@ -144,18 +616,257 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
             backend_writer.close()
             await backend_writer.wait_closed()
 
-    task_down = asyncio.create_task(pipe_stream(backend_reader, writer))
+    task_down = asyncio.create_task(pipe_stream(backend_reader, writer, moved))
     task_up = asyncio.create_task(pipe_up_with_hot())
     await asyncio.wait({task_down, task_up}, return_when=asyncio.FIRST_COMPLETED)
+    reusable = client_hung_up and moved[0] == moved[1]
     for task in (task_down, task_up):
         task.cancel()
+    if lb.pools:
+        await asyncio.gather(task_down, task_up, return_exceptions=True)
+        lb.release(backend, sock, reusable)
+
+
+class _ProxySide(asyncio.Protocol):
+    """One end of a proxied connection: bytes received here go straight to the peer.
+
+    Backpressure stays at the transport level: when this side's write buffer
+    crosses its high-water mark, the peer stops reading until it drains.
+    """
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.Transport] = None
+        self.peer: Optional["_ProxySide"] = None
+        self.moved = 0
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def _forward(self, data: bytes) -> None:
+        self.peer.transport.write(data)
+
+    def data_received(self, data: bytes) -> None:
+        self._forward(data)
+
+    def eof_received(self) -> bool:
+        # Tear the pair down on the first EOF, like the stream path.
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.peer is not None and self.peer.transport is not None:
+            self.peer.transport.close()
+
+    def pause_writing(self) -> None:
+        self.peer.transport.pause_reading()
+
+    def resume_writing(self) -> None:
+        self.peer.transport.resume_reading()
+
+
+class _BackendSide(_ProxySide):
+    def _forward(self, data: bytes) -> None:
+        stats.bytes_down += len(data)
+        self.moved += len(data)
+        self.peer.transport.write(data)
+
+
+class ClientSide(_ProxySide):
+    """Accepted client connection for `--forward protocol`.
+
+    Reading stays paused until the backend connection is up, so nothing has
+    to be buffered in Python. Each upstream chunk runs the HotCacheMissor hook
+    before being forwarded, as in the stream path.
+    """
+
+    def __init__(self, lb: L4LoadBalancer):
+        super().__init__()
+        self._lb = lb
+        self._backend: Optional[Tuple[str, int]] = None
+        self._sock: Optional[socket.socket] = None
+        self._flow_id: Optional[int] = None
+        self._hot = hot is not None and hot.enabled()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        super().connection_made(transport)
+        transport.pause_reading()
+        stats.connections += 1
+        self._flow_id = socket_flow_id(transport.get_extra_info("peername"), transport.get_extra_info("sockname"))
+        self._hot = self._hot and self._flow_id is not None
+        asyncio.get_running_loop().create_task(self._connect())
+
+    async def _connect(self) -> None:
+        lb = self._lb
+        backend_key = lb.next_backend(self._flow_id)
+        loop = asyncio.get_running_loop()
+        try:
+            sock = await lb.connect(backend_key)
+        except OSError:
+            self.transport.close()
+            return
+        upstream = None
+        try:
+            upstream = lb.upstream_socket(sock)
+            _, backend = await loop.create_connection(_BackendSide, sock=upstream)
+        except OSError:
+            if upstream is not None:
+                upstream.close()
+            lb.release(backend_key, sock, False)
+            self.transport.close()
+            return
+        if self.transport.is_closing():
+            backend.transport.close()
+            if lb.pools:
+                lb.release(backend_key, sock, True)
+            return
+        self._backend, self._sock = backend_key, sock
+        backend.peer, self.peer = self, backend
+        self.transport.resume_reading()
+
+    def _forward(self, data: bytes) -> None:
+        if self._hot:
+            hot.touch_flow(self._flow_id)
+        stats.bytes_up += len(data)
+        self.moved += len(data)
+        self.peer.transport.write(data)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        backend = self.peer
+        # Reusable only if the client hung up first with every byte answered.
+        reusable = backend is not None and not backend.transport.is_closing() and self.moved == backend.moved
+        super().connection_lost(exc)
+        if self._sock is not None and self._lb.pools:
+            self._lb.release(self._backend, self._sock, reusable)
+
+
+SPLICE_CHUNK = 1 << 16  # default pipe capacity
+SPLICE_FLAGS = getattr(os, "SPLICE_F_MOVE", 0) | getattr(os, "SPLICE_F_NONBLOCK", 0)
+
+
+def _wait_fd(loop: asyncio.AbstractEventLoop, fd: int, writable: bool) -> "asyncio.Future[None]":
+    fut = loop.create_future()
+    add, remove = (loop.add_writer, loop.remove_writer) if writable else (loop.add_reader, loop.remove_reader)
+
+    def ready() -> None:
+        if not fut.done():
+            fut.set_result(None)
+
+    add(fd, ready)
+    fut.add_done_callback(lambda _: remove(fd))
+    return fut
+
+
+async def splice_direction(
+    src: socket.socket, dst: socket.socket, upstream: bool, flow_id: Optional[int], moved: List[int]
+) -> None:
+    """Move bytes src -> pipe -> dst with splice(2) until EOF; payload never enters Python."""
+    loop = asyncio.get_running_loop()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    touch = upstream and flow_id is not None and hot is not None and hot.enabled()
+    pipe_r, pipe_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+    try:
+        while True:
+            try:
+                n = os.splice(src_fd, pipe_w, SPLICE_CHUNK, flags=SPLICE_FLAGS)
+            except BlockingIOError:
+                await _wait_fd(loop, src_fd, writable=False)
+                continue
+            if n == 0:
+                return
+            if touch:
+                hot.touch_flow(flow_id)
+            if upstream:
+                stats.bytes_up += n
+            else:
+                stats.bytes_down += n
+            moved[not upstream] += n
+            while n:
+                try:
+                    n -= os.splice(pipe_r, dst_fd, n, flags=SPLICE_FLAGS)
+                except BlockingIOError:
+                    await _wait_fd(loop, dst_fd, writable=True)
+    except (ConnectionError, BrokenPipeError):
+        return
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+
+async def handle_splice(client: socket.socket, peer, lb: L4LoadBalancer) -> None:
+    """Proxy one accepted connection; `peer` is the address `sock_accept` returned."""
+    stats.connections += 1
+    try:
+        local = client.getsockname()
+    except OSError:
+        # Reset before this task ran.
+        client.close()
+        return
+    flow_id = socket_flow_id(peer, local)
+    backend_key = lb.next_backend(flow_id)
+    try:
+        backend = await lb.connect(backend_key)
+    except OSError:
+        client.close()
+        return
+    moved = [0, 0]
+    reusable = False
+    try:
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        up = asyncio.create_task(splice_direction(client, backend, True, flow_id, moved))
+        down = asyncio.create_task(splice_direction(backend, client, False, flow_id, moved))
+        done, _ = await asyncio.wait({up, down}, return_when=asyncio.FIRST_COMPLETED)
+        reusable = down not in done and moved[0] == moved[1]
+        for task in (up, down):
+            task.cancel()
+        await asyncio.gather(up, down, return_exceptions=True)
+    except OSError:
+        reusable = False
+    finally:
+        lb.release(backend_key, backend, reusable)
+        client.close()
+
+
+async def serve_splice(listener: socket.socket, lb: L4LoadBalancer) -> None:
+    """Accept loop for `--forward splice`; one task per proxied connection."""
+    loop = asyncio.get_running_loop()
+    conns = set()
+    try:
+        while True:
+            client, peer = await loop.sock_accept(listener)
+            client.setblocking(False)
+            task = loop.create_task(handle_splice(client, peer, lb))
+            conns.add(task)
+            task.add_done_callback(conns.discard)
+    finally:
+        for task in conns:
+            task.cancel()
+
+
+def _listen_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Async TCP load balancer")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=7100)
-    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of LB processes sharing the port via SO_REUSEPORT",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        help="Pin worker i to the i-th CPU of this list (e.g. the CPUs serving the NIC's RSS queues: 0-7)",
+    )
     parser.add_argument("--backend", action="append", required=True, help="backend host:port")
     parser.add_argument(
         "--hot-bytes-per-slot",
@@ -164,29 +875,206 @@ def parse_args():
         help="If >0, enable per-flow cache-miss generator by hashing a buffer of this size (bytes) per slot",
     )
     parser.add_argument("--hot-slots", type=int, default=0, help="Number of per-flow working-set slots")
-    parser.add_argument("--hot-rounds", type=int, default=1, help="How many full-buffer scans to do per forwarded chunk")
-    return parser.parse_args()
+    parser.add_argument("--hot-rounds", type=int, default=1, help="How many passes over the pattern to do per forwarded chunk")
+    parser.add_argument(
+        "--hot-pattern",
+        choices=HOT_PATTERNS,
+        default="hash",
+        help="Access pattern of the cache-miss generator (see HotCacheMissor)",
+    )
+    parser.add_argument(
+        "--hot-stride",
+        type=int,
+        default=CACHE_LINE,
+        help="Bytes between touched points for the non-hash patterns (>= 64: one point per cache line)",
+    )
+    parser.add_argument(
+        "--hot-lines",
+        type=int,
+        default=0,
+        help="Cache lines touched per round for the non-hash patterns (0 = every point of the slot)",
+    )
+    parser.add_argument(
+        "--forward",
+        choices=["stream", "protocol", "splice"],
+        default="stream",
+        help=(
+            "stream: StreamReader/Writer copy task per direction; protocol: Protocol pairs forwarding in "
+            "data_received; splice (Linux): socket -> pipe -> socket with splice(2), no user-space copy"
+        ),
+    )
+    parser.add_argument(
+        "--upstream-pool-size",
+        type=int,
+        default=0,
+        help="Idle pre-connected upstreams kept per backend per worker (0 = connect per flow)",
+    )
+    parser.add_argument(
+        "--upstream-keepalive",
+        action="store_true",
+        help="Return an upstream to its pool when its flow ends with every request answered",
+    )
+    parser.add_argument(
+        "--upstream-idle-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds an idle pooled upstream is kept before it is replaced (0 = no limit)",
+    )
+    parser.add_argument(
+        "--upstream-health-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between pool health checks (prune dead/expired idle upstreams, probe down backends)",
+    )
+    parser.add_argument(
+        "--upstream-connect-timeout",
+        type=float,
+        default=CONNECT_TIMEOUT_S,
+        help="Seconds before a backend connect (per flow, pool fill or probe) fails and the backend is marked down",
+    )
+    parser.add_argument(
+        "--balance",
+        choices=BALANCERS,
+        default="rr",
+        help="rr: round robin; maglev: Maglev consistent hash of the MicroSentinel flow id (IPv4 flows)",
+    )
+    parser.add_argument(
+        "--maglev-table-size",
+        type=int,
+        default=MAGLEV_TABLE_SIZE,
+        help="Maglev lookup table slots (prime, much larger than the backend count)",
+    )
+    parser.add_argument(
+        "--truth-file",
+        help="Write each worker's flow -> backend assignments here as JSON on shutdown (.wN suffix per worker)",
+    )
+    parser.add_argument("--truth-limit", type=int, default=100000, help="Max flows recorded per worker")
+    args = parser.parse_args()
+    if args.hot_stride < CACHE_LINE:
+        parser.error(f"--hot-stride must be >= {CACHE_LINE}")
+    if args.balance == "maglev" and not (
+        _is_prime(args.maglev_table_size) and args.maglev_table_size > len(args.backend)
+    ):
+        parser.error("--maglev-table-size must be a prime larger than the number of backends")
+    if args.upstream_health_interval <= 0:
+        parser.error("--upstream-health-interval must be > 0")
+    if args.upstream_connect_timeout <= 0:
+        parser.error("--upstream-connect-timeout must be > 0")
+    if args.forward == "splice" and not hasattr(os, "splice"):
+        parser.error("--forward splice needs os.splice (Linux, Python >= 3.10)")
+    if args.pin_cpus:
+        try:
+            if not numa.parse_cpulist(args.pin_cpus):
+                raise ValueError
+        except ValueError:
+            parser.error(f"bad --pin-cpus list {args.pin_cpus!r}")
+    return args
+
 
+async def check_upstreams(lb: L4LoadBalancer, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        for pool in lb.pools.values():
+            pool.check(now)
 
-async def main():
+
+async def serve(args, lb: L4LoadBalancer, worker_idx: int, hot_desc: str) -> None:
+    if args.pin_cpus:
+        cpus = numa.parse_cpulist(args.pin_cpus)
+        numa.pin([cpus[worker_idx % len(cpus)]])
+    # Published per worker: addresses match across forks but the pid does not.
+    if hot is not None:
+        publish("l4-lb", hot.data_regions())
+    if args.truth_file:
+        lb.assignments = AssignmentTruth(args.truth_limit)
+    reuse_port = args.workers > 1
+    loop = asyncio.get_running_loop()
+    health_task = None
+    if args.upstream_pool_size > 0:
+        cfg = PoolConfig(
+            args.upstream_pool_size,
+            args.upstream_keepalive,
+            args.upstream_idle_timeout,
+            args.upstream_health_interval,
+            args.upstream_connect_timeout,
+        )
+        lb.pools = {backend: UpstreamPool(*backend, cfg) for backend in lb.backends}
+        # Pre-warm before accepting so the first flows already hit the pool.
+        await asyncio.gather(*(pool.fill() for pool in lb.pools.values()))
+        health_task = loop.create_task(check_upstreams(lb, args.upstream_health_interval))
+    splice_task = None
+    if args.forward == "splice":
+        listener = _listen_socket(args.host, args.port, reuse_port)
+        splice_task = loop.create_task(serve_splice(listener, lb))
+    elif args.forward == "protocol":
+        server = await loop.create_server(
+            lambda: ClientSide(lb), host=args.host, port=args.port, reuse_port=reuse_port
+        )
+    else:
+        server = await asyncio.start_server(
+            lambda r, w: handle_client(r, w, lb), host=args.host, port=args.port, reuse_port=reuse_port
+        )
+    print(
+        f"LB worker={worker_idx} pid={os.getpid()} cpus={sorted(os.sched_getaffinity(0))} listening on "
+        f"{args.host}:{args.port} with {len(lb.backends)} backends (balance={args.balance}, forward={args.forward}, "
+        f"hot={hot_desc}, "
+        f"upstream_pool={args.upstream_pool_size}{'+keepalive' if args.upstream_keepalive else ''})",
+        flush=True,
+    )
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    cpu_start = time.process_time()
+    if splice_task is not None:
+        await stop.wait()
+        splice_task.cancel()
+        listener.close()
+    else:
+        async with server:
+            await stop.wait()
+    if health_task is not None:
+        health_task.cancel()
+    print(f"[worker={worker_idx}] " + stats.summary(args.forward, time.process_time() - cpu_start), flush=True)
+    if hot is not None and hot.enabled():
+        print(f"[worker={worker_idx}] " + hot.summary(), flush=True)
+    for pool in lb.pools.values():
+        print(f"[worker={worker_idx}] " + pool.summary(), flush=True)
+        pool.close()
+    if lb.assignments is not None:
+        lb.assignments.write(truth_path(args.truth_file, worker_idx, args.workers), lb, worker_idx)
+
+
+def main():
     args = parse_args()
     backends = []
     for item in args.backend:
         host, port = item.split(":")
         backends.append((host, int(port)))
-    lb = L4LoadBalancer(backends)
+    lb = L4LoadBalancer(backends, args.balance, args.maglev_table_size, args.upstream_connect_timeout)
     global hot
     hot = None
+    hot_desc = "disabled"
     if args.hot_bytes_per_slot and args.hot_bytes_per_slot > 0:
         slots = int(args.hot_slots) if args.hot_slots and args.hot_slots > 0 else 64
         rounds = int(args.hot_rounds) if args.hot_rounds and args.hot_rounds > 0 else 1
-        hot = HotCacheMissor(HotConfig(bytes_per_slot=int(args.hot_bytes_per_slot), slots=slots, rounds=rounds))
-    server = await asyncio.start_server(lambda r, w: handle_client(r, w, lb), host=args.host, port=args.port)
-    hot_desc = "disabled" if hot is None or not hot.enabled() else f"{args.hot_bytes_per_slot}B x {slots} slots x {rounds} rounds"
-    print(f"LB listening on {args.host}:{args.port} with {len(backends)} backends (hot={hot_desc})")
-    async with server:
-        await server.serve_forever()
+        hot = HotCacheMissor(
+            HotConfig(
+                bytes_per_slot=int(args.hot_bytes_per_slot),
+                slots=slots,
+                rounds=rounds,
+                pattern=args.hot_pattern,
+                stride=args.hot_stride,
+                lines=max(0, args.hot_lines),
+            )
+        )
+        hot_desc = hot.describe()
+    # The hot arena is built once and inherited copy-on-write by every worker.
+    args.workers = max(1, args.workers)
+    raise SystemExit(
+        run_workers(args.workers, lambda idx: asyncio.run(serve(args, lb, idx, hot_desc)), name="l4-lb")
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -3,96 +3,64 @@
 import argparse
 import asyncio
 import json
-import socket
-import struct
+import multiprocessing
+import queue
+import sys
 import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import arrivals, timeseries  # noqa: E402
+from common.flow_id import flow_id as ms_flow_id  # noqa: E402
+from common.histogram import LatencyHistogram  # noqa: E402
+
 
 def _log(message: str) -> None:
     ts = datetime.now().isoformat(timespec="seconds")
     print(f"[{ts}] {message}", flush=True)
 
 
-def percentile(values: List[float], pct: float) -> float:
-    if not values:
-        return 0.0
-    if pct <= 0:
-        return values[0]
-    if pct >= 100:
-        return values[-1]
-    k = (len(values) - 1) * (pct / 100.0)
-    f = int(k)
-    c = min(f + 1, len(values) - 1)
-    if f == c:
-        return values[f]
-    d0 = values[f] * (c - k)
-    d1 = values[c] * (k - f)
-    return d0 + d1
+@dataclass
+class ClientStats:
+    """Counters shared by every flow task in this process."""
+
+    latency: LatencyHistogram
+    errors: int = 0
 
 
 @dataclass
 class FlowResult:
     flow_id: int
     operations: int
-    latencies_us: List[float]
     errors: int
     ground_truth: Optional[List[Tuple[int, int]]] = None
 
 
-MS_FNV64_OFFSET = 1469598103934665603
-MS_FNV64_PRIME = 1099511628211
-
-
-def _fnv64_mix(h: int, data: int) -> int:
-    h ^= (data & 0xFFFFFFFFFFFFFFFF)
-    h = (h * MS_FNV64_PRIME) & 0xFFFFFFFFFFFFFFFF
-    return h
-
-
-def _ipv4_be32(addr: str) -> int:
-    return struct.unpack("I", socket.inet_aton(addr))[0]
-
-
-def compute_ms_flow_id_v4(src_ip: str, dst_ip: str, src_port: int, dst_port: int, proto: int = 6, direction: int = 0) -> int:
-    """Match bpf/micro_sentinel_kern.bpf.c::hash_flow_tuple() for IPv4.
-
-    Note: kernel stores IPv4 addrs in network byte order (be32) without ntohl.
-    Ports are stored in host order (after bpf_ntohs).
-    """
-    h = MS_FNV64_OFFSET
-    h = _fnv64_mix(h, direction)
-    h = _fnv64_mix(h, proto)
-    h = _fnv64_mix(h, ((src_port & 0xFFFF) << 32) | (dst_port & 0xFFFF))
-    h = _fnv64_mix(h, ((_ipv4_be32(src_ip) & 0xFFFFFFFF) << 32) | (_ipv4_be32(dst_ip) & 0xFFFFFFFF))
-    return h if h != 0 else 1
-
-
 async def flow_task(
-    host: str,
-    port: int,
-    duration: int,
+    conn: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]],
+    deadline: float,
     payload: bytes,
     flow_id: int,
     truth_buffer: Optional[List[Tuple[int, int]]],
-    per_flow_interval: float = 0.0,
+    stats: ClientStats,
+    pacer: Optional[arrivals.SharedRate] = None,
+    scheduler: Optional[arrivals.OpenLoopScheduler] = None,
 ) -> FlowResult:
-    deadline = time.monotonic() + duration
-    latencies: List[float] = []
+    latency = stats.latency
     operations = 0
     errors = 0
 
-    try:
-        reader, writer = await asyncio.open_connection(host, port)
-    except Exception:
-        return FlowResult(flow_id, 0, [], 1, truth_buffer)
+    if conn is None:
+        stats.errors += 1
+        return FlowResult(flow_id, 0, 1, truth_buffer)
+    reader, writer = conn
 
     sockname = writer.get_extra_info("sockname")
     peername = writer.get_extra_info("peername")
-    # Best-effort: only compute when we have IPv4 tuples.
+    # Best-effort: fall back to the flow index if the tuple can't be hashed.
     computed_flow_id = flow_id
     tuple_info: Optional[Dict[str, object]] = None
     try:
@@ -105,43 +73,51 @@ async def flow_task(
             # captured in the server host's artifact logs via the SSH wrapper.
             _log(f"[lb-client] connected flow_index={flow_id} src={src_ip}:{src_port} dst={dst_ip}:{dst_port}")
 
-            if ":" not in src_ip and ":" not in dst_ip:
-                computed_flow_id = compute_ms_flow_id_v4(src_ip, dst_ip, src_port, dst_port, proto=6, direction=0)
-                tuple_info = {
-                    "src_ip": src_ip,
-                    "src_port": src_port,
-                    "dst_ip": dst_ip,
-                    "dst_port": dst_port,
-                    "proto": 6,
-                    "direction": 0,
-                }
-            
+            computed_flow_id = ms_flow_id(src_ip, dst_ip, src_port, dst_port, proto=6, direction=0)
+            tuple_info = {
+                "src_ip": src_ip,
+                "src_port": src_port,
+                "dst_ip": dst_ip,
+                "dst_port": dst_port,
+                "proto": 6,
+                "direction": 0,
+            }
     except Exception:
         pass
 
     try:
-        # Simple per-flow pacing using a next-send timestamp. If per_flow_interval
-        # is 0.0 then operate as fast as possible.
-        next_send = time.monotonic()
+        # Closed loop: with a rate, wait for the next globally shared send
+        # slot; without one, operate as fast as possible. Open loop: take the
+        # next arrival from the scheduler and measure latency from its
+        # intended send time.
         while time.monotonic() < deadline:
+            intended = 0
+            if scheduler is not None:
+                intended = await scheduler.next()
+                if intended is None:
+                    break
+            elif pacer is not None:
+                wait_ns = pacer.claim() - time.monotonic_ns()
+                if wait_ns > 0:
+                    await asyncio.sleep(wait_ns / 1e9)
+                    if time.monotonic() >= deadline:
+                        break
             start = time.monotonic_ns()
             start_unix = time.time_ns()
+            if scheduler is not None:
+                scheduler.sent(intended, start)
             writer.write(payload)
             await writer.drain()
             await reader.readexactly(len(payload))
             end = time.monotonic_ns()
             end_unix = time.time_ns()
-            latencies.append((end - start) / 1_000.0)
+            latency.record(end - (intended or start))
             operations += 1
             if truth_buffer is not None:
                 truth_buffer.append((start, end, start_unix, end_unix))
-            if per_flow_interval and per_flow_interval > 0.0:
-                next_send += per_flow_interval
-                to_sleep = next_send - time.monotonic()
-                if to_sleep > 0:
-                    await asyncio.sleep(to_sleep)
     except Exception:
         errors += 1
+        stats.errors += 1
     finally:
         writer.close()
         try:
@@ -149,32 +125,22 @@ async def flow_task(
         except Exception:
             pass
 
-    result = FlowResult(computed_flow_id, operations, latencies, errors, truth_buffer)
+    result = FlowResult(computed_flow_id, operations, errors, truth_buffer)
     # Attach tuple info out-of-band by stashing it on the instance (for JSON writer).
     setattr(result, "tuple_info", tuple_info)
     return result
 
 
-def aggregate(results: Iterable[FlowResult], duration: int) -> Dict[str, object]:
-    ops = sum(r.operations for r in results)
-    latencies: List[float] = []
-    errors = sum(r.errors for r in results)
-    for r in results:
-        latencies.extend(r.latencies_us)
-    latencies.sort()
-
+def aggregate(ops: int, errors: int, duration: int, latency: LatencyHistogram) -> Dict[str, object]:
     payload = {
         "operations": ops,
         "duration_s": duration,
         "throughput_ops_per_s": ops / duration if duration else 0.0,
         "errors": errors,
     }
-    if latencies:
-        payload["latency_us"] = {
-            "p50": percentile(latencies, 50),
-            "p95": percentile(latencies, 95),
-            "p99": percentile(latencies, 99),
-        }
+    if latency.count:
+        payload["latency_us"] = latency.summary()
+    payload["latency_histogram"] = latency.to_dict()
     return payload
 
 
@@ -185,10 +151,29 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--flows", type=int, default=128, help="Concurrent TCP flows")
     parser.add_argument("--duration", type=int, default=60, help="Test duration in seconds")
     parser.add_argument("--payload", type=int, default=512, help="Bytes per request")
-    parser.add_argument("--rate", type=float, default=0.0, help="Total requests per second across all flows (0 = unlimited)")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=0.0,
+        help=(
+            "Total requests per second across all flows and processes (0 = unlimited); closed-loop flows share "
+            "one send schedule, --load-shape open-loop drives the arrival scheduler"
+        ),
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Fork this many client processes; flows are split across them and start on a shared barrier",
+    )
     parser.add_argument("--metrics-file", help="Optional JSON file to write metrics to")
     parser.add_argument("--ground-truth-log", help="Optional JSON file with per-flow request windows")
-    return parser.parse_args()
+    arrivals.add_arguments(parser)
+    timeseries.add_arguments(parser)
+    args = parser.parse_args()
+    arrivals.resolve_arguments(parser, args)
+    timeseries.resolve_arguments(parser, args)
+    return args
 
 
 def _write_ground_truth(path: str, results: Iterable[FlowResult]) -> None:
@@ -223,37 +208,192 @@ def _write_ground_truth(path: str, results: Iterable[FlowResult]) -> None:
         f.close()
 
 
-async def main() -> None:
-    args = parse_args()
+BARRIER_TIMEOUT_S = 30.0
+
+
+async def run_flows(
+    args,
+    flow_indices: List[int],
+    barrier=None,
+    share: Tuple[int, int] = (0, 1),
+    pacer: Optional[arrivals.SharedRate] = None,
+) -> Dict[str, object]:
+    """Drive `flow_indices` for `args.duration` seconds; returns this process's part.
+
+    Flows connect before the (optional) cross-process barrier, so every
+    process's measurement window starts at the same moment. In open-loop
+    mode this process schedules its `share = (index, count)` of the rate.
+    """
     payload = b"m" * args.payload
-    truth_buffers: Optional[List[List[Tuple[int, int]]]] = None
-    if args.ground_truth_log:
-        truth_buffers = [[] for _ in range(args.flows)]
+    truth_buffers = [[] for _ in flow_indices] if args.ground_truth_log else None
+
+    async def connect():
+        try:
+            return await asyncio.open_connection(args.host, args.port)
+        except Exception:
+            return None
+
+    conns = await asyncio.gather(*(connect() for _ in flow_indices))
+    if barrier is not None:
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait, BARRIER_TIMEOUT_S)
 
-    per_flow_interval = 0.0
-    if args.rate and args.rate > 0.0 and args.flows:
-        _log(f"[lb-client] throttling total_rate={args.rate} req/s flows={args.flows}")
-        per_flow_rate = float(args.rate) / float(args.flows)
-        if per_flow_rate > 0.0:
-            per_flow_interval = 1.0 / per_flow_rate
+    scheduler = None
+    if args.load_shape == "open-loop":
+        index, count = share
+        scheduler = arrivals.OpenLoopScheduler(
+            args.rate / count, args.arrivals, seed=index, phase=index / count, max_backlog=args.max_backlog
+        )
+    elif pacer is not None:
+        pacer.start()
+
+    stats = ClientStats(LatencyHistogram())
+    series = None
+    if args.timeseries_file:
+        series = timeseries.IntervalRecorder(
+            args.timeseries_file, args.interval_ms, stats.latency, "lb_client", errors=lambda: stats.errors
+        )
+        series.start()
 
+    deadline = time.monotonic() + args.duration
     tasks = [
         asyncio.create_task(
             flow_task(
-                args.host,
-                args.port,
-                args.duration,
+                conn,
+                deadline,
                 payload,
                 idx,
-                truth_buffers[idx] if truth_buffers is not None else None,
-                per_flow_interval,
+                truth_buffers[pos] if truth_buffers is not None else None,
+                stats,
+                pacer,
+                scheduler,
             )
         )
-        for idx in range(args.flows)
+        for pos, (idx, conn) in enumerate(zip(flow_indices, conns))
     ]
 
+    if scheduler is not None:
+        scheduler.start()
+        await asyncio.sleep(args.duration)
+        await scheduler.stop(release=len(tasks))
     results = await asyncio.gather(*tasks, return_exceptions=False)
-    summary = aggregate(results, args.duration)
+    if series is not None:
+        await series.stop()
+    return {
+        "operations": sum(r.operations for r in results),
+        "errors": sum(r.errors for r in results),
+        "latency_histogram": stats.latency.to_dict(),
+        "open_loop": scheduler.stats() if scheduler is not None else None,
+        "rate_control": pacer.stats() if pacer is not None else None,
+        "results": results,
+    }
+
+
+def _truth_part(path: str, index: int) -> str:
+    return f"{path}.p{index}"
+
+
+def _process_main(args, flow_indices: List[int], barrier, share: Tuple[int, int], pacer, results) -> None:
+    try:
+        part = asyncio.run(run_flows(args, flow_indices, barrier, share, pacer))
+        if args.ground_truth_log:
+            # Per-request truth can be large; hand it over as a file, not through the queue.
+            _write_ground_truth(_truth_part(args.ground_truth_log, share[0]), part["results"])
+    except BaseException as exc:
+        # Release the siblings instead of letting them wait out the barrier timeout.
+        barrier.abort()
+        results.put({"error": f"{type(exc).__name__}: {exc}"})
+        return
+    part.pop("results")
+    results.put(part)
+
+
+def _merge_ground_truth(path: str, count: int) -> None:
+    events = []
+    for idx in range(count):
+        part = Path(_truth_part(path, idx))
+        if part.exists():
+            events.extend(json.loads(part.read_text(encoding="utf-8")))
+            part.unlink()
+    if events:
+        Path(path).write_text(json.dumps(events, indent=2), encoding="utf-8")
+
+
+def run_processes(args, pacer: Optional[arrivals.SharedRate]) -> List[Dict[str, object]]:
+    """Fork `args.processes` workers behind one start barrier and collect their parts."""
+    ctx = multiprocessing.get_context("fork")
+    count = max(1, min(args.processes, args.flows))
+    barrier = ctx.Barrier(count)
+    results = ctx.Queue()
+    procs = []
+    for idx in range(count):
+        flow_indices = list(range(idx, args.flows, count))
+        proc = ctx.Process(
+            target=_process_main, args=(args, flow_indices, barrier, (idx, count), pacer, results), daemon=True
+        )
+        proc.start()
+        procs.append(proc)
+
+    parts = []
+    errors = []
+    deadline = time.monotonic() + args.duration + BARRIER_TIMEOUT_S + 30.0
+    for _ in procs:
+        try:
+            part = results.get(timeout=max(1.0, deadline - time.monotonic()))
+        except queue.Empty:
+            errors.append("timed out waiting for worker results")
+            break
+        if "error" in part:
+            errors.append(part["error"])
+            continue
+        parts.append(part)
+    for proc in procs:
+        proc.join(timeout=5.0)
+    if errors:
+        raise SystemExit(f"lb_client: {len(errors)} worker process(es) failed: {errors[0]}")
+    if args.ground_truth_log:
+        _merge_ground_truth(args.ground_truth_log, count)
+    return parts
+
+
+def main() -> None:
+    args = parse_args()
+    processes = max(1, min(args.processes, args.flows))
+    if args.load_shape == "open-loop":
+        _log(
+            f"[lb-client] open-loop {args.arrivals} arrivals rate={args.rate} req/s flows={args.flows} "
+            f"processes={processes}"
+        )
+    elif args.rate and args.rate > 0.0 and args.flows:
+        _log(f"[lb-client] throttling total_rate={args.rate} req/s flows={args.flows} processes={processes}")
+    pacer = None
+    if args.load_shape != "open-loop" and args.rate and args.rate > 0.0:
+        pacer = arrivals.SharedRate(args.rate)
+    if args.timeseries_file:
+        timeseries.create(args.timeseries_file)
+
+    if processes > 1:
+        parts = run_processes(args, pacer)
+    else:
+        part = asyncio.run(run_flows(args, list(range(args.flows)), pacer=pacer))
+        if args.ground_truth_log:
+            _write_ground_truth(args.ground_truth_log, part.pop("results"))
+        parts = [part]
+
+    latency = LatencyHistogram()
+    for part in parts:
+        latency.merge(LatencyHistogram.from_dict(part["latency_histogram"]))
+    summary = aggregate(
+        sum(part["operations"] for part in parts), sum(part["errors"] for part in parts), args.duration, latency
+    )
+    summary["processes"] = processes
+    summary["load_shape"] = args.load_shape
+    if args.load_shape == "open-loop":
+        summary["open_loop"] = arrivals.merge_stats(part["open_loop"] for part in parts)
+    if pacer is not None:
+        summary["rate_control"] = arrivals.merge_rate_stats(part["rate_control"] for part in parts)
+    if args.timeseries_file:
+        steady = timeseries.steady_state(timeseries.load(args.timeseries_file), args.trim_start_s, args.trim_end_s)
+        timeseries.apply_steady_state(summary, steady, args.timeseries_file)
 
     output = json.dumps(summary, indent=2)
     if args.metrics_file:
@@ -264,9 +404,7 @@ async def main() -> None:
         metrics_path.write_text(output, encoding="utf-8")
     else:
         print(output)
-    if args.ground_truth_log:
-        _write_ground_truth(args.ground_truth_log, results)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -2,28 +2,70 @@
 import argparse
 import asyncio
 import json
+import sys
 import time
-from collections import defaultdict
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
 
 from truth_log import TruthRecorder
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.data_objects import buffer_address, publish  # noqa: E402
 
-class TokenBucket:
-    def __init__(self, rate: float, burst: float):
+
+class TenantBuckets:
+    """Per-tenant token buckets stored as (tokens, last_ts) pairs in one array.
+
+    Keeping every bucket in a single preallocated buffer gives the limiter's
+    hot state one stable address range for data-object attribution, so the
+    table never grows. Tenants beyond `max_tenants` share the last slot's
+    bucket; they are counted in `overflow_tenants` and the first one is
+    logged, since their drops are no longer per-tenant.
+    """
+
+    def __init__(self, rate: float, burst: float, max_tenants: int = 1024):
         self.rate = rate
         self.capacity = burst
-        self.tokens = burst
-        self.last = time.time()
+        self._max = max(1, max_tenants)
+        self._slots: Dict[str, int] = {}
+        self._state = array("d", [burst, 0.0]) * self._max
+        self.overflow_tenants = 0
 
-    def consume(self, cost: float) -> bool:
+    def _slot(self, tenant: str) -> int:
+        slot = self._slots.get(tenant)
+        if slot is None:
+            slot = len(self._slots)
+            if slot < self._max:
+                # Only a fresh bucket starts its refill clock now.
+                self._state[2 * slot + 1] = time.time()
+            else:
+                slot = self._max - 1
+                self.overflow_tenants += 1
+                if self.overflow_tenants == 1:
+                    print(
+                        f"[rate-limiter] more than {self._max} tenants; extra tenants share bucket {slot} "
+                        "(raise --max-tenants)",
+                        flush=True,
+                    )
+            self._slots[tenant] = slot
+        return slot
+
+    def consume(self, tenant: str, cost: float) -> Tuple[bool, float]:
+        """Charge `cost` tokens to `tenant`; returns (allowed, tokens_remaining)."""
+        state = self._state
+        base = 2 * self._slot(tenant)
         now = time.time()
-        delta = now - self.last
-        self.last = now
-        self.tokens = min(self.capacity, self.tokens + delta * self.rate)
-        if self.tokens >= cost:
-            self.tokens -= cost
-            return True
-        return False
+        tokens = min(self.capacity, state[base] + (now - state[base + 1]) * self.rate)
+        state[base + 1] = now
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        state[base] = tokens
+        return allowed, tokens
+
+    def data_regions(self) -> List[Tuple[str, int, int]]:
+        return [("nfv_tenant_buckets", buffer_address(self._state), len(self._state) * self._state.itemsize)]
 
 
 class RateLimiterProtocol(asyncio.DatagramProtocol):
@@ -34,13 +76,14 @@ class RateLimiterProtocol(asyncio.DatagramProtocol):
         next_port: int,
         truth: TruthRecorder,
         stage_name: str,
+        max_tenants: int = 1024,
     ):
         super().__init__()
         self.next_host = next_host
         self.next_port = next_port
         self.rate_per_tenant = rate_per_tenant
         self.transport = None
-        self.buckets = defaultdict(lambda: TokenBucket(rate_per_tenant, rate_per_tenant))
+        self.buckets = TenantBuckets(rate_per_tenant, rate_per_tenant, max_tenants)
         self.dropped = 0
         self.forwarded = 0
         self.truth = truth
@@ -53,9 +96,8 @@ class RateLimiterProtocol(asyncio.DatagramProtocol):
         pkt = json.loads(data.decode())
         tenant = pkt.get("tenant", "default")
         size = pkt.get("size", 64)
-        bucket = self.buckets[tenant]
-        cost = size / 64.0
-        if bucket.consume(cost):
+        allowed, tokens_remaining = self.buckets.consume(tenant, size / 64.0)
+        if allowed:
             self.forwarded += 1
             self.transport.sendto(data, (self.next_host, self.next_port))
             action = "forward"
@@ -69,7 +111,7 @@ class RateLimiterProtocol(asyncio.DatagramProtocol):
                 "tenant": tenant,
                 "size": size,
                 "action": action,
-                "tokens_remaining": bucket.tokens,
+                "tokens_remaining": tokens_remaining,
             }
         )
 
@@ -82,6 +124,7 @@ def parse_args():
     parser.add_argument("--next-port", type=int, default=9003)
     parser.add_argument("--rate", type=float, default=20000.0, help="tokens per second")
     parser.add_argument("--name", default="rate_limiter")
+    parser.add_argument("--max-tenants", type=int, default=1024, help="Bucket table size (extra tenants share the last slot)")
     parser.add_argument("--truth-log", help="Optional JSON file for limiter decisions")
     parser.add_argument("--truth-limit", type=int, default=4096)
     return parser.parse_args()
@@ -90,7 +133,8 @@ def parse_args():
 async def main():
     args = parse_args()
     truth = TruthRecorder(args.truth_log, args.truth_limit)
-    protocol = RateLimiterProtocol(args.rate, args.next_host, args.next_port, truth, args.name)
+    protocol = RateLimiterProtocol(args.rate, args.next_host, args.next_port, truth, args.name, args.max_tenants)
+    publish(args.name, protocol.buckets.data_regions())
     loop = asyncio.get_running_loop()
     transport, _ = await loop.create_datagram_endpoint(
         lambda: protocol, local_addr=(args.listen_host, args.listen_port)
@@ -101,6 +145,8 @@ async def main():
     finally:
         transport.close()
         truth.dump()
+        if protocol.buckets.overflow_tenants:
+            print(f"Rate limiter: {protocol.buckets.overflow_tenants} tenants overflowed --max-tenants", flush=True)
 
 
 if __name__ == "__main__":
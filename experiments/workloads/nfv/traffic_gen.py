@@ -3,12 +3,17 @@ import argparse
 import asyncio
 import json
 import random
+import sys
 import time
 from itertools import cycle
 from pathlib import Path
 
 from truth_log import TruthRecorder
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import timeseries  # noqa: E402
+from common.histogram import LatencyHistogram  # noqa: E402
+
 
 async def traffic_loop(args, truth: TruthRecorder):
     transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
@@ -20,6 +25,15 @@ async def traffic_loop(args, truth: TruthRecorder):
     start = time.time()
     sent = 0
     rate_history = []
+    # UDP has no reply path, so record how late each packet left relative to
+    # when the pacing loop asked to be woken up.
+    send_lag = LatencyHistogram()
+    due_ns = time.monotonic_ns()
+    series = None
+    if args.timeseries_file:
+        timeseries.create(args.timeseries_file)
+        series = timeseries.IntervalRecorder(args.timeseries_file, args.interval_ms, send_lag, "traffic_gen")
+        series.start()
     while time.time() - start < args.duration:
         rate = next(rate_cycle)
         rate_history.append(rate)
@@ -31,6 +45,7 @@ async def traffic_loop(args, truth: TruthRecorder):
             "src": f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}",
         }
         data = json.dumps(pkt).encode()
+        send_lag.record(time.monotonic_ns() - due_ns)
         transport.sendto(data)
         sent += 1
         truth.record(
@@ -42,8 +57,11 @@ async def traffic_loop(args, truth: TruthRecorder):
                 "src": pkt["src"],
             }
         )
+        due_ns = time.monotonic_ns() + int(interval * 1e9)
         await asyncio.sleep(interval)
     transport.close()
+    if series is not None:
+        await series.stop()
     duration = time.time() - start
     avg_rate = sent / duration if duration > 0 else 0
     return {
@@ -52,6 +70,8 @@ async def traffic_loop(args, truth: TruthRecorder):
         "avg_rate_pps": avg_rate,
         "rate_sequence": rate_history,
         "packet_sizes": packet_sizes,
+        "send_lag_us": send_lag.summary(),
+        "send_lag_histogram": send_lag.to_dict(),
     }
 
 
@@ -67,7 +87,10 @@ def parse_args():
     parser.add_argument("--truth-log", help="Optional JSON file for emitted packet metadata")
     parser.add_argument("--truth-limit", type=int, default=8192)
     parser.add_argument("--metrics-file", help="Optional JSON file for aggregate generator stats")
-    return parser.parse_args()
+    timeseries.add_arguments(parser)
+    args = parser.parse_args()
+    timeseries.resolve_arguments(parser, args)
+    return args
 
 
 def parse_int_list(value: str):
@@ -82,6 +105,17 @@ async def main():
     args.dst_ports = parse_int_list(args.dst_ports)
     truth = TruthRecorder(args.truth_log, args.truth_limit)
     summary = await traffic_loop(args, truth)
+    if args.timeseries_file:
+        steady = timeseries.steady_state(timeseries.load(args.timeseries_file), args.trim_start_s, args.trim_end_s)
+        timeseries.apply_steady_state(
+            summary,
+            steady,
+            args.timeseries_file,
+            ops_key="packets",
+            rate_key="avg_rate_pps",
+            latency_key="send_lag_us",
+            histogram_key="send_lag_histogram",
+        )
     truth.dump()
     if args.metrics_file:
         metrics_path = Path(args.metrics_file).expanduser()